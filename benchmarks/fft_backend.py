@@ -0,0 +1,67 @@
+"""
+Benchmark of FFT backends for the spectral workflows.
+
+Runs the Fourier transforms of the profile and areal PSD and of the areal
+ACF of random nonperiodic maps (see `topobank_statistics.spectral`) with
+each FFT backend and reports wall-clock times and the speedup relative to
+numpy.fft. Usage:
+
+    python benchmarks/fft_backend.py [--sizes 4096 8192] [--workers 8]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from topobank_statistics.fft_backend import backend_functions
+
+
+def spectral_workload(fft, h):
+    nx, ny = h.shape
+    np.abs(fft.fft(h, axis=0)) ** 2
+    np.abs(fft.fft(h, axis=1)) ** 2
+    np.abs(fft.fft2(h)) ** 2
+    fft.ifft2(np.abs(fft.fft2(h, s=(2 * nx - 1, 2 * ny - 1))) ** 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4096, 8192])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    backends = ["numpy", "scipy"]
+    try:
+        import pyfftw  # noqa: F401
+
+        backends += ["pyfftw"]
+    except ImportError:
+        pass
+
+    print(f"{'size':>12} {'backend':>8} {'workers':>8} {'time (s)':>10} {'speedup':>8}")
+    for size in args.sizes:
+        np.random.seed(0)
+        h = np.random.normal(size=(size, size))
+        reference = None
+        for backend in backends:
+            workers = 1 if backend == "numpy" else args.workers
+            fft = backend_functions(backend, workers)
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                spectral_workload(fft, h)
+                times.append(time.perf_counter() - start)
+            elapsed = min(times)
+            if reference is None:
+                reference = elapsed
+            print(
+                f"{size:>5}x{size:<6} {backend:>8} {workers:>8} {elapsed:>10.2f} "
+                f"{reference / elapsed:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
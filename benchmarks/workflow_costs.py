@@ -0,0 +1,117 @@
+"""
+Calibration of the cost models of the statistics workflows.
+
+Runs the topography implementation of every workflow on self-affine line
+scans and maps of increasing size, measures CPU time and peak memory and
+fits the cost model of `topobank_statistics.cost` to the measurements. The
+fitted coefficients are printed and, with `--output`, written to a JSON file
+that can be used via the `TOPOBANK_STATISTICS_COST_MODELS` setting. Django
+is set up with the settings of the test suite (`statistics_test_settings`)
+unless `DJANGO_SETTINGS_MODULE` is set. Usage:
+
+    python benchmarks/workflow_costs.py [--output costs.json] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import django
+import numpy as np
+from scipy.optimize import nnls
+
+# The workflows import topobank's models and hence need configured apps
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "statistics_test_settings")
+django.setup()
+
+from topobank.testing.utils import (AnalysisResultMock,  # noqa: E402
+                                    FakeTopographyModel)
+
+from topobank_statistics.cost import CostModel  # noqa: E402
+from topobank_statistics.testing.synthetic import self_affine_topography  # noqa: E402
+from topobank_statistics.workflows import statistics_workflows  # noqa: E402
+
+SIZES = {
+    1: [2**12, 2**14, 2**16, 2**18],
+    2: [128, 256, 512, 1024],
+}
+
+
+def measure(workflow, topography, repeat):
+    """Return minimum CPU time and peak memory of a workflow."""
+    analysis = AnalysisResultMock(FakeTopographyModel(topography))
+    times = []
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.process_time()
+        try:
+            workflow.topography_implementation(analysis)
+        finally:
+            times.append(time.process_time() - start)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return min(times), peak
+
+
+def fit(nb_grid_pts, times, peaks):
+    """Fit a `CostModel` to measurements; errors are weighted relative to
+    the measured values."""
+    n = np.asarray(nb_grid_pts, dtype=float)
+    times = np.asarray(times)
+    peaks = np.asarray(peaks, dtype=float)
+    A = np.stack([np.ones_like(n), n, n * np.log2(n)], axis=1)
+    time_coeffs, _ = nnls(A / times[:, None], np.ones_like(times))
+    memory_coeffs, _ = nnls(A[:, :2] / peaks[:, None], np.ones_like(peaks))
+    return CostModel(*time_coeffs, *memory_coeffs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="JSON file for the fitted coefficients")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    from topobank.analysis.registry import get_implementation
+
+    models = {}
+    print(f"{'workflow':>48} {'dim':>3} {'points':>10} {'time (s)':>10} {'peak (MB)':>10}")
+    for name in statistics_workflows():
+        workflow = get_implementation(name=name)()
+        models[name] = {}
+        for dim, sizes in SIZES.items():
+            nb_grid_pts, times, peaks = [], [], []
+            for size in sizes:
+                topography = self_affine_topography((size,) * dim)
+                elapsed, peak = measure(workflow, topography, args.repeat)
+                nb_grid_pts.append(np.prod(topography.nb_grid_pts))
+                times.append(elapsed)
+                peaks.append(peak)
+                print(
+                    f"{name:>48} {dim:>3} {nb_grid_pts[-1]:>10} {elapsed:>10.3f} "
+                    f"{peak / 1024**2:>10.1f}"
+                )
+            models[name][dim] = fit(nb_grid_pts, times, peaks)
+
+    print()
+    for name, dims in models.items():
+        for dim, model in dims.items():
+            print(f"{name} ({dim}D): {model}")
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    name: {str(dim): model.to_list() for dim, model in dims.items()}
+                    for name, dims in models.items()
+                },
+                f,
+                indent=4,
+            )
+
+
+if __name__ == "__main__":
+    main()
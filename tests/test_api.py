@@ -11,3 +11,14 @@ def test_api():
         )
         == "/plugins/statistics/card/roughness-parameters/abc"
     )
+    assert (
+        reverse(
+            "topobank_statistics:card-roughness-parameters-async",
+            kwargs=dict(workflow="abc"),
+        )
+        == "/plugins/statistics/card/roughness-parameters-async/abc"
+    )
+    assert (
+        reverse("topobank_statistics:progress", kwargs=dict(workflow="abc"))
+        == "/plugins/statistics/progress/abc"
+    )
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+from SurfaceTopography import Topography
+from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
+
+from topobank_statistics.binning import (check_binning, robust_histogram,
+                                         sample_values)
+from topobank_statistics.moments import Moments
+from topobank_statistics.workflows import (HeightDistribution,
+                                           SlopeDistribution)
+
+
+def _contaminated(size=100000):
+    """Normal values with a few extreme outliers."""
+    np.random.seed(0)
+    values = np.random.normal(size=size)
+    values[::1000] = 1e4
+    return values
+
+
+def test_sample_values():
+    arr = np.ma.masked_array(
+        np.arange(1000.0).reshape(100, 10), mask=np.arange(1000) % 3 == 0
+    )
+    values = np.ma.compressed(arr)
+    sample = sample_values(arr, len(values), size=50, block_size=7)
+    assert_array_equal(sample, values[:: len(values) // 50])
+
+    # Strides are not aligned with the rows of maps
+    arr = np.broadcast_to(np.arange(256.0), (512, 256))
+    sample = sample_values(arr, arr.size, size=arr.size // 2, block_size=1000)
+    assert len(sample) <= arr.size // 2
+    assert_array_equal(np.unique(sample), np.arange(256.0))
+
+
+def test_robust_histogram():
+    values = _contaminated()
+    moments = Moments.from_array(values)
+    hist, bin_edges, nb_below, nb_above = robust_histogram(values, moments, 100)
+
+    assert len(hist) <= 100
+    width = bin_edges[1] - bin_edges[0]
+    # All values are accounted for
+    nb_in_range = np.sum(hist) * width * moments.count
+    assert_allclose(nb_in_range + nb_below + nb_above, moments.count)
+    # Counts equal those of np.histogram on the same edges
+    expected, _ = np.histogram(values, bins=bin_edges)
+    assert_allclose(hist * width * moments.count, expected)
+    # Outliers are outside of the range, which covers the normal values
+    assert nb_above >= 100
+    assert bin_edges[-1] < 10
+    assert bin_edges[0] > -10
+    assert np.count_nonzero(hist) > 0.8 * len(hist)
+
+    # Uniform binning leaves almost all bins empty
+    uniform, _ = np.histogram(values, bins=100)
+    assert np.count_nonzero(uniform) < 10
+
+
+def test_robust_histogram_degenerate():
+    values = np.ones(100)
+    hist, bin_edges, nb_below, nb_above = robust_histogram(
+        values, Moments.from_array(values), 10
+    )
+    assert bin_edges[0] < 1 < bin_edges[-1]
+    assert nb_below == nb_above == 0
+    assert_allclose(np.sum(hist) * (bin_edges[1] - bin_edges[0]), 1)
+
+
+def test_check_binning():
+    check_binning("uniform")
+    check_binning("robust")
+    with pytest.raises(ValueError):
+        check_binning("quantile")
+    with pytest.raises(ValueError):
+        HeightDistribution(binning="quantile")
+
+
+def test_robust_binning_workflows():
+    heights = np.resize(_contaminated(64 * 48), (64, 48)) * 1e-3
+    t = Topography(np.cumsum(heights, axis=0), (2, 3), unit="nm")
+    analysis = AnalysisResultMock(FakeTopographyModel(t))
+
+    uniform = SlopeDistribution().topography_implementation(analysis)
+    robust = SlopeDistribution(binning="robust").topography_implementation(analysis)
+
+    assert "Values above histogram range (x direction)" not in uniform["scalars"]
+    assert robust["scalars"]["Values above histogram range (x direction)"]["value"] > 0
+    assert "Values below histogram range (y direction)" in robust["scalars"]
+    # Moments are independent of binning
+    for key, scalar in uniform["scalars"].items():
+        assert_allclose(robust["scalars"][key]["value"], scalar["value"])
+
+    result = HeightDistribution(binning="robust").topography_implementation(analysis)
+    assert "Values below histogram range" in result["scalars"]
+
+    with pytest.raises(ValueError):
+        HeightDistribution(binning="quantile").topography_implementation(analysis)
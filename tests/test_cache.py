@@ -0,0 +1,218 @@
+import datetime
+import os
+import time
+
+import numpy as np
+from SurfaceTopography import NonuniformLineScan, Topography
+from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
+
+from topobank_statistics import cache
+from topobank_statistics.cache import (TOPOGRAPHY_NAME_PLACEHOLDER,
+                                       ResultStore, refresh_result,
+                                       result_key, topography_fingerprint)
+from topobank_statistics.workflows import HeightDistribution, RoughnessParameters
+
+
+class TopographyModel(FakeTopographyModel):
+    """Stand-in for the topobank topography model with the fields that
+    identify its height field, counting loads of the topography."""
+
+    def __init__(self, t, pk=1, name="topography"):
+        super().__init__(t, name=name)
+        self.pk = pk
+        self.modification_time = datetime.datetime(2025, 1, 1)
+        self.detrend_mode = "center"
+        self.fill_undefined_data_mode = "do-not-fill"
+        self.is_periodic = t.is_periodic
+        self.unit = t.unit
+        self.height_scale = 1.0
+        self.resolution_x = self.resolution_y = None
+        self.size_x = self.size_y = 1.0
+        self.nb_loads = 0
+
+    def topography(self):
+        self.nb_loads += 1
+        return super().topography()
+
+
+def test_topography_fingerprint():
+    heights = np.arange(12.0).reshape(3, 4)
+    t = Topography(heights, (3, 4), unit="nm")
+
+    assert topography_fingerprint(t) == topography_fingerprint(
+        Topography(heights.copy(), (3, 4), unit="nm")
+    )
+    assert topography_fingerprint(t) != topography_fingerprint(
+        Topography(heights, (3, 4), unit="um")
+    )
+    assert topography_fingerprint(t) != topography_fingerprint(
+        Topography(heights, (3, 5), unit="nm")
+    )
+    assert topography_fingerprint(t) != topography_fingerprint(
+        Topography(heights, (3, 4), unit="nm", periodic=True)
+    )
+    assert topography_fingerprint(t) != topography_fingerprint(
+        Topography(heights + 1e-12, (3, 4), unit="nm")
+    )
+    masked = np.ma.masked_array(heights, mask=heights > 10)
+    assert topography_fingerprint(t) != topography_fingerprint(
+        Topography(masked, (3, 4), unit="nm")
+    )
+
+    x = np.array([0.0, 1.0, 3.0])
+    h = np.array([1.0, 2.0, 0.0])
+    assert topography_fingerprint(NonuniformLineScan(x, h)) != topography_fingerprint(
+        NonuniformLineScan(x * 2, h)
+    )
+
+
+def test_result_key_depends_on_workflow_and_parameters():
+    subject = TopographyModel(Topography(np.arange(12.0).reshape(3, 4), (3, 4)))
+    key = result_key("a", HeightDistribution.Parameters(bins=10), subject)
+    assert key == result_key("a", HeightDistribution.Parameters(bins=10), subject)
+    assert key != result_key("b", HeightDistribution.Parameters(bins=10), subject)
+    assert key != result_key("a", HeightDistribution.Parameters(bins=11), subject)
+    # The key identifies the topography by its model, without loading it
+    assert subject.nb_loads == 0
+    subject.modification_time = datetime.datetime(2025, 1, 2)
+    assert key != result_key("a", HeightDistribution.Parameters(bins=10), subject)
+
+
+def test_result_key_depends_on_version(monkeypatch):
+    subject = TopographyModel(Topography(np.arange(12.0).reshape(3, 4), (3, 4)))
+    key = result_key("a", HeightDistribution.Parameters(bins=10), subject)
+    monkeypatch.setattr(cache, "__version__", "0.0.0+upgrade")
+    assert key != result_key("a", HeightDistribution.Parameters(bins=10), subject)
+
+
+def test_result_key_depends_on_numerics_settings(settings):
+    subject = TopographyModel(Topography(np.arange(12.0).reshape(3, 4), (3, 4)))
+    parameters = HeightDistribution.Parameters(bins=10)
+    key = result_key("a", parameters, subject)
+
+    # The global precision applies to workflows without explicit precision
+    settings.TOPOBANK_STATISTICS_PRECISION = "float32"
+    assert result_key("a", parameters, subject) != key
+    settings.TOPOBANK_STATISTICS_PRECISION = "float64"
+    assert result_key("a", parameters, subject) == key
+
+    settings.TOPOBANK_STATISTICS_FFT_BACKEND = "scipy"
+    scipy_key = result_key("a", parameters, subject)
+    assert scipy_key != key
+    settings.TOPOBANK_STATISTICS_FFT_WORKERS = 4
+    assert result_key("a", parameters, subject) not in [key, scipy_key]
+    settings.TOPOBANK_STATISTICS_FFT_BACKEND = "numpy"
+    # Threads of the numpy backend do not matter
+    assert result_key("a", parameters, subject) == key
+
+    settings.TOPOBANK_STATISTICS_SPECTRAL_CACHE_SIZE = 2**20
+    assert result_key("a", parameters, subject) != key
+
+
+def test_result_store_get_put(tmp_path):
+    store = ResultStore(str(tmp_path))
+    assert store.get("abcd") is None
+    store.put("abcd", dict(x=np.arange(3)))
+    np.testing.assert_array_equal(store.get("abcd")["x"], np.arange(3))
+
+    result = dict(
+        series=[
+            dict(name="a", x=np.linspace(0, 1, 5), y=np.ma.masked_less(np.arange(5), 2))
+        ],
+        scalars={"Mean": dict(value=np.float64(1.5), unit="nm")},
+        alerts=[],
+        nan=np.nan,
+    )
+    store.put("abcd", result)
+    stored = store.get("abcd")
+    np.testing.assert_array_equal(stored["series"][0]["x"], np.linspace(0, 1, 5))
+    np.testing.assert_array_equal(
+        np.ma.getmaskarray(stored["series"][0]["y"]), [True, True, False, False, False]
+    )
+    assert stored["scalars"] == {"Mean": dict(value=1.5, unit="nm")}
+    assert stored["alerts"] == [] and np.isnan(stored["nan"])
+    # Entries are loaded without unpickling
+    with np.load(tmp_path / "ab" / "abcd.npz", allow_pickle=False) as data:
+        assert "result" in data.files
+
+    # Results that cannot be serialized are not stored
+    store.put("abce", dict(x=object()))
+    assert store.get("abce") is None
+
+
+def test_result_store_eviction(tmp_path):
+    store = ResultStore(str(tmp_path), max_age=3600, max_size=10**9)
+    for key in ["aa01", "aa02", "aa03"]:
+        store.put(key, np.zeros(100))
+    old = time.time() - 7200
+    os.utime(os.path.join(tmp_path, "aa", "aa01.npz"), (old, old))
+    store.evict()
+    assert store.get("aa01") is None
+    assert store.get("aa02") is not None
+
+    # Only the most recently used entry fits
+    size = os.path.getsize(os.path.join(tmp_path, "aa", "aa03.npz"))
+    store = ResultStore(str(tmp_path), max_age=3600, max_size=size)
+    older = time.time() - 10
+    os.utime(os.path.join(tmp_path, "aa", "aa02.npz"), (older, older))
+    store.evict()
+    assert store.get("aa02") is None
+    assert store.get("aa03") is not None
+
+
+def test_cached_workflow_result_is_reused(tmp_path, settings):
+    settings.TOPOBANK_STATISTICS_RESULT_CACHE_DIR = str(tmp_path)
+    heights = np.sin(np.arange(200.0) / 7).reshape(10, 20)
+
+    topography = TopographyModel(Topography(heights, (10, 20), unit="nm"))
+    result = RoughnessParameters().topography_implementation(
+        AnalysisResultMock(topography)
+    )
+    assert len(list(tmp_path.glob("*/*.npz"))) == 1
+    assert topography.nb_loads == 1
+
+    # A hit does not load the topography; the name is filled in after the
+    # lookup
+    topography.name = "renamed"
+    (path,) = tmp_path.glob("*/*.npz")
+    store = ResultStore(str(tmp_path))
+    key = path.stem
+    store.put(key, [dict(message=f"Alert for {TOPOGRAPHY_NAME_PLACEHOLDER}")])
+    assert RoughnessParameters().topography_implementation(
+        AnalysisResultMock(topography)
+    ) == [dict(message="Alert for renamed")]
+    assert topography.nb_loads == 1
+
+    # Modified topographies are computed again
+    topography.modification_time = datetime.datetime(2025, 1, 2)
+    modified_result = RoughnessParameters().topography_implementation(
+        AnalysisResultMock(topography)
+    )
+    assert topography.nb_loads == 2
+    assert len(list(tmp_path.glob("*/*.npz"))) == 2
+    assert [r["quantity"] for r in modified_result] == [r["quantity"] for r in result]
+
+    # Other numerics settings are computed again
+    settings.TOPOBANK_STATISTICS_PRECISION = "float32"
+    RoughnessParameters().topography_implementation(AnalysisResultMock(topography))
+    assert topography.nb_loads == 3
+    assert len(list(tmp_path.glob("*/*.npz"))) == 3
+
+
+def test_refresh_result(tmp_path, settings):
+    settings.TOPOBANK_STATISTICS_RESULT_CACHE_DIR = str(tmp_path)
+    heights = np.sin(np.arange(200.0) / 7).reshape(10, 20)
+    analysis = AnalysisResultMock(
+        TopographyModel(Topography(heights, (10, 20), unit="nm"))
+    )
+
+    assert refresh_result(HeightDistribution(), analysis)
+    assert not refresh_result(HeightDistribution(), analysis)
+    (path,) = tmp_path.glob("*/*.npz")
+    ResultStore(str(tmp_path)).put(path.stem, "stale")
+    assert refresh_result(HeightDistribution(), analysis, force=True)
+    assert HeightDistribution().topography_implementation(analysis) != "stale"
+
+    # Other parameters are a different result
+    assert refresh_result(HeightDistribution(bins=7), analysis)
+    assert len(list(tmp_path.glob("*/*.npz"))) == 2
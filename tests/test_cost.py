@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+from numpy.testing import assert_allclose
+
+from topobank_statistics.cost import (DEFAULT_COST_MODELS, CostModel,
+                                      cost_models, estimate_cost)
+from topobank_statistics.workflows import statistics_workflows
+
+PSD = "topobank_statistics.power_spectral_density"
+ROUGHNESS = "topobank_statistics.roughness_parameters"
+
+
+def test_cost_models_for_all_workflows():
+    models = cost_models()
+    for name in statistics_workflows():
+        assert name in DEFAULT_COST_MODELS
+        for dim in [1, 2]:
+            model = models[name][dim]
+            # Cost grows with the number of grid points
+            assert model.cpu_seconds(2**20) > model.cpu_seconds(2**10) > 0
+            assert model.peak_memory(2**20) > model.peak_memory(2**10) > 0
+
+
+def test_cost_models_from_settings(tmp_path, settings):
+    path = tmp_path / "costs.json"
+    path.write_text(json.dumps({PSD: {"2": [1, 0, 0, 1024, 8]}}))
+    settings.TOPOBANK_STATISTICS_COST_MODELS = str(path)
+    models = cost_models()
+    assert models[PSD][2].cpu_seconds(100) == 1
+    assert models[PSD][2].peak_memory(100) == 1024 + 800
+    assert models[PSD][1].to_list() == DEFAULT_COST_MODELS[PSD][1]
+
+
+def test_estimate_cost():
+    models = {
+        PSD: {1: CostModel(1, 0, 0, 0, 1), 2: CostModel(0, 1, 0, 0, 8)},
+        ROUGHNESS: {1: CostModel(2, 0, 0, 0, 1), 2: CostModel(0, 0, 1, 0, 8)},
+    }
+    topographies = [(1, (100,)), (1, (10, 20)), (2, (30, 40))]
+    estimates = estimate_cost(
+        [PSD, ROUGHNESS], topographies, surface_workflows=[PSD], models=models
+    )
+
+    psd = estimates[PSD]["topography"]
+    assert psd.nb_tasks == 3
+    assert_allclose(psd.cpu_seconds, 1 + 200 + 1200)
+    assert_allclose(psd.cpu_hours, 1401 / 3600)
+    assert psd.peak_memory == 8 * 1200
+    surface = estimates[PSD]["surface"]
+    assert surface.nb_tasks == 2
+    assert_allclose(surface.cpu_seconds, psd.cpu_seconds)
+    assert surface.peak_memory == psd.peak_memory
+
+    roughness = estimates[ROUGHNESS]
+    assert "surface" not in roughness
+    assert_allclose(
+        roughness["topography"].cpu_seconds,
+        2 + 200 * np.log2(200) + 1200 * np.log2(1200),
+    )
+
+    with pytest.raises(ValueError):
+        estimate_cost(["topobank_statistics.unknown"], topographies, models=models)
+
+
+@pytest.mark.django_db
+def test_estimate_statistics_cost_command(two_topos, capsys):  # noqa: F811
+    call_command("estimate_statistics_cost", PSD, surfaces=True)
+    out = capsys.readouterr().out
+    assert "CPU-hours" in out
+    assert "surface" in out
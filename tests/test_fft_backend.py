@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from SurfaceTopography import Topography
+from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
+
+from topobank_statistics.fft_backend import (FFT_FUNCTIONS, backend_functions,
+                                             fft_functions)
+from topobank_statistics.spectral import spectral_cache
+from topobank_statistics.workflows import PowerSpectralDensity
+
+
+@pytest.mark.parametrize("backend", ["numpy", "scipy", "pyfftw"])
+def test_backend_functions(backend):
+    # Uses scipy.fft if pyFFTW is not installed
+    originals = {name: getattr(np.fft, name) for name in FFT_FUNCTIONS}
+    h = np.random.normal(size=(16, 8))
+    fft = backend_functions(backend, 2)
+    assert_allclose(fft.fft2(h), np.fft.fft2(h))
+    assert_allclose(fft.ifft2(fft.fft2(h)).real, h)
+    assert_allclose(fft.irfft(fft.rfft(h, axis=0), n=16, axis=0), h)
+    # numpy.fft is left untouched
+    for name, func in originals.items():
+        assert getattr(np.fft, name) is func
+
+
+def test_backend_functions_unknown():
+    with pytest.raises(ValueError):
+        backend_functions("unknown")
+
+
+def test_fft_functions_from_settings(settings):
+    settings.TOPOBANK_STATISTICS_FFT_BACKEND = "numpy"
+    assert fft_functions() is np.fft
+    settings.TOPOBANK_STATISTICS_FFT_BACKEND = "scipy"
+    settings.TOPOBANK_STATISTICS_FFT_WORKERS = 2
+    assert fft_functions().fft.keywords == dict(workers=2)
+    assert fft_functions(workers=4).fft.keywords == dict(workers=4)
+
+
+@pytest.mark.parametrize("segment_length", [None, 16])
+def test_power_spectrum_with_scipy_backend(settings, segment_length):
+    # Transforms are only computed by the plugin with the spectral cache or
+    # for segmented spectra
+    settings.TOPOBANK_STATISTICS_SPECTRAL_CACHE_SIZE = 2**20
+    np.random.seed(0)
+    t = Topography(np.random.normal(size=(32, 24)), (3, 2), unit="nm")
+    topography = FakeTopographyModel(t)
+    workflow = PowerSpectralDensity(segment_length=segment_length)
+
+    settings.TOPOBANK_STATISTICS_FFT_BACKEND = "numpy"
+    expected = workflow.topography_implementation(AnalysisResultMock(topography))
+    settings.TOPOBANK_STATISTICS_FFT_BACKEND = "scipy"
+    settings.TOPOBANK_STATISTICS_FFT_WORKERS = 2
+    spectral_cache().clear()
+    result = workflow.topography_implementation(AnalysisResultMock(topography))
+
+    for s, s_expected in zip(result["series"], expected["series"]):
+        assert s["name"] == s_expected["name"]
+        assert_allclose(np.asarray(s["y"]), np.asarray(s_expected["y"]))
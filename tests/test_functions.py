@@ -4,10 +4,12 @@ import numpy as np
 import pint
 import pytest
 from numpy.testing import assert_allclose
-from SurfaceTopography import NonuniformLineScan, Topography
+from SurfaceTopography import NonuniformLineScan, Topography, UniformLineScan
 from topobank.analysis.registry import get_workflow_names
 from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
 
+from topobank_statistics.moments import Moments
+from topobank_statistics.nonuniform import height_values
 from topobank_statistics.workflows import (Autocorrelation,
                                            CurvatureDistribution,
                                            HeightDistribution,
@@ -75,11 +77,21 @@ def test_height_distribution_simple_line_scan():
     assert len(result["series"]) == 2
 
     exp_bins = np.array([-1, 1])  # expected values for height bins
-    exp_height_dist_values = [1.0 / 6, 2.0 / 6]  # expected values
+    # Heights of the linear profile are uniformly distributed
+    exp_height_dist_values = [1.0 / 4, 1.0 / 4]  # expected values
     series0 = result["series"][0]
     np.testing.assert_almost_equal(series0["x"], exp_bins)
     np.testing.assert_almost_equal(series0["y"], exp_height_dist_values)
 
+    # Each segment is spread over all bins covered by its heights, not only
+    # over the bin of its midpoint
+    result = HeightDistribution(bins=4).topography_implementation(
+        AnalysisResultMock(topography)
+    )
+    series0 = result["series"][0]
+    np.testing.assert_almost_equal(series0["x"], [-1.5, -0.5, 0.5, 1.5])
+    np.testing.assert_almost_equal(series0["y"], [1.0 / 4] * 4)
+
     # not testing gauss values yet since number of points is unknown
     # proposal: use a well tested function instead of own formula
 
@@ -198,6 +210,29 @@ def test_power_spectrum_simple_nonuniform_linescan():
     # TODO Also check values here as integration test?
 
 
+def test_power_spectrum_segmented_uniform_linescan():
+    np.random.seed(0)
+    t = UniformLineScan(np.random.normal(size=10000), 100, unit="nm")
+    topography = FakeTopographyModel(t)
+
+    full = PowerSpectralDensity().topography_implementation(
+        AnalysisResultMock(topography)
+    )
+    segmented = PowerSpectralDensity(
+        segment_length=512, segment_overlap=0.5
+    ).topography_implementation(AnalysisResultMock(topography))
+
+    assert sorted(segmented.keys()) == sorted(full.keys())
+    assert [s["name"] for s in segmented["series"]] == [
+        s["name"] for s in full["series"]
+    ]
+    # White noise: flat spectrum at the level pixel size × variance
+    # Bins without data are masked
+    y = np.ma.compressed(segmented["series"][0]["y"])
+    assert len(y) > 0
+    assert_allclose(y, 0.01, rtol=0.5)
+
+
 def test_autocorrelation_simple_nonuniform_topography():
     x = np.arange(5)
     h = 2 * x
@@ -774,6 +809,62 @@ def test_variable_bandwidth_for_surface(simple_surface):
     assert_allclose(expected_result["series"][0]["y"], y_actual, rtol=1e-6)
 
 
+@pytest.mark.parametrize(
+    "workflow,quantity,labels",
+    [
+        (HeightDistribution, "height", [""]),
+        (SlopeDistribution, "slope", [" (x direction)", " (y direction)"]),
+        (CurvatureDistribution, "curvature", [""]),
+    ],
+)
+def test_distribution_for_surface(simple_surface, workflow, quantity, labels):
+    """Distributions for a surface merge histograms of all topographies."""
+    result = workflow(bins=20).surface_implementation(
+        AnalysisResultMock(simple_surface)
+    )
+
+    Quantity = quantity.capitalize()
+    assert result["name"] == f"{Quantity} distribution"
+    assert result["xlabel"] == Quantity
+    assert result["alerts"] == []
+
+    series = {s["name"]: s for s in result["series"]}
+    for label in labels:
+        distribution = series[f"{Quantity} distribution{label}"]
+        x = np.asarray(distribution["x"])
+        y = np.asarray(distribution["y"])
+        assert len(x) <= 20
+        # Bins are of equal width and the density is normalized
+        width = x[1] - x[0]
+        assert_allclose(np.diff(x), width)
+        assert_allclose(np.sum(y) * width, 1)
+        assert f"Gaussian fit{label}" in series
+        assert f"Mean {Quantity}{label}" in result["scalars"]
+        assert f"RMS {Quantity}{label}" in result["scalars"]
+
+    if quantity == "height":
+        # Statistics of the heights of all topographies in a common unit; the
+        # heights of the nonuniform line scan are weighted by length
+        unit = result["xunit"]
+        moments = Moments()
+        for t in simple_surface.topography_set.all():
+            t = t.topography().to_unit(unit)
+            if t.is_uniform:
+                moments.merge(Moments.from_array(t.heights()))
+            else:
+                moments.merge(height_values(*t.positions_and_heights())[-1])
+        scalars = result["scalars"]
+        assert_allclose(scalars["Mean Height"]["value"], moments.mean)
+        assert_allclose(scalars["RMS Height"]["value"], moments.std)
+
+
+def test_distribution_for_surface_with_bin_edges(simple_surface):
+    with pytest.raises(ValueError, match="bin edges"):
+        CurvatureDistribution(bins=[-1, 0, 1]).surface_implementation(
+            AnalysisResultMock(simple_surface)
+        )
+
+
 def test_scale_dependent_slope_for_surface(simple_surface):
     """Testing scale-dependent slope for an artificial surface."""
 
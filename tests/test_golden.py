@@ -0,0 +1,203 @@
+"""
+Golden-result regression tests with performance budgets.
+
+Every workflow is run on a set of deterministic self-affine topographies and
+the results are compared to the references in `golden/references.json`.
+
+CPU time and peak memory (as traced by `tracemalloc`) depend on the machine
+and are only compared to the budgets in `golden/budgets.json` if
+`TOPOBANK_STATISTICS_BUDGET_TEST=1`; run the budget tests with
+
+    TOPOBANK_STATISTICS_BUDGET_TEST=1 pytest -m budget tests/test_golden.py
+
+Time budgets can be scaled for slow machines with the
+`TOPOBANK_STATISTICS_BUDGET_FACTOR` environment variable. After an intended
+change of results, regenerate references and budgets with
+
+    TOPOBANK_STATISTICS_UPDATE_GOLDEN=1 TOPOBANK_STATISTICS_BUDGET_TEST=1 \\
+        pytest tests/test_golden.py
+"""
+
+import json
+import math
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
+
+from topobank_statistics.testing.synthetic import (masked_topography,
+                                                  self_affine_topography)
+from topobank_statistics.workflows import (Autocorrelation,
+                                           CurvatureDistribution,
+                                           HeightDistribution,
+                                           PowerSpectralDensity,
+                                           RoughnessParameters,
+                                           ScaleDependentCurvature,
+                                           ScaleDependentSlope,
+                                           SlopeDistribution,
+                                           VariableBandwidth)
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "golden")
+REFERENCES = os.path.join(GOLDEN_DIR, "references.json")
+BUDGETS = os.path.join(GOLDEN_DIR, "budgets.json")
+
+UPDATE = os.environ.get("TOPOBANK_STATISTICS_UPDATE_GOLDEN", "0") == "1"
+BUDGETS_ENABLED = os.environ.get("TOPOBANK_STATISTICS_BUDGET_TEST", "0") == "1"
+BUDGET_FACTOR = float(os.environ.get("TOPOBANK_STATISTICS_BUDGET_FACTOR", "1"))
+
+# Number of values of each array stored in the references
+NB_SAMPLES = 16
+
+WORKFLOWS = [
+    HeightDistribution,
+    SlopeDistribution,
+    CurvatureDistribution,
+    PowerSpectralDensity,
+    Autocorrelation,
+    VariableBandwidth,
+    ScaleDependentSlope,
+    ScaleDependentCurvature,
+    RoughnessParameters,
+]
+
+
+CASES = {
+    "line_scan": lambda: self_affine_topography((4096,), (4e-6,), hurst=0.8, seed=1),
+    "map": lambda: self_affine_topography((256, 192), (2e-6, 1.5e-6), hurst=0.7, seed=2),
+    "masked_map": lambda: masked_topography(
+        (256, 192), physical_sizes=(2e-6, 1.5e-6), hurst=0.7, fraction=0.05, seed=2
+    ),
+}
+
+# Spectral workflows require topographies without undefined data
+SPECTRAL_WORKFLOWS = [PowerSpectralDensity, Autocorrelation, VariableBandwidth]
+
+PARAMETERS = [
+    pytest.param(workflow, case, id=f"{workflow.Meta.name.split('.')[1]}-{case}")
+    for workflow in WORKFLOWS
+    for case in CASES
+    if not (case == "masked_map" and workflow in SPECTRAL_WORKFLOWS)
+]
+
+
+def _digest(value):
+    """JSON-compatible summary of a result; arrays are represented by their
+    shape, sum and `NB_SAMPLES` evenly spaced values."""
+    if isinstance(value, dict):
+        return {str(k): _digest(v) for k, v in value.items()}
+    if isinstance(value, np.ndarray) or (
+        isinstance(value, (list, tuple))
+        and len(value) > 0
+        and all(isinstance(v, (int, float, np.number)) for v in value)
+    ):
+        arr = np.ma.filled(np.ma.asarray(value, dtype=float), np.nan).ravel()
+        indices = np.unique(np.linspace(0, len(arr) - 1, NB_SAMPLES).astype(int))
+        return dict(
+            shape=list(np.shape(value)),
+            sum=float(np.nansum(arr)),
+            samples=arr[indices].tolist() if len(arr) > 0 else [],
+        )
+    if isinstance(value, (list, tuple)):
+        return [_digest(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _compare(actual, expected, path=""):
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict), path
+        assert sorted(actual.keys()) == sorted(expected.keys()), path
+        for key in expected:
+            _compare(actual[key], expected[key], f"{path}/{key}")
+    elif isinstance(expected, list):
+        assert isinstance(actual, list) and len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            _compare(a, e, f"{path}/{i}")
+    elif isinstance(expected, float) or (
+        isinstance(expected, int) and not isinstance(expected, bool)
+    ):
+        a = np.nan if actual is None else actual
+        e = np.nan if expected is None else expected
+        assert_allclose(a, e, rtol=1e-6, atol=0, equal_nan=True, err_msg=path)
+    else:
+        assert actual == expected, path
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _store(path, key, value):
+    data = _load(path) if os.path.exists(path) else {}
+    data[key] = value
+    with open(path, "w") as f:
+        json.dump(dict(sorted(data.items())), f, indent=1)
+        f.write("\n")
+
+
+@pytest.fixture(scope="module")
+def topographies():
+    return {name: case() for name, case in CASES.items()}
+
+
+@pytest.mark.parametrize("workflow,case", PARAMETERS)
+def test_golden(topographies, workflow, case):
+    key = f"{workflow.Meta.name}/{case}"
+    analysis = AnalysisResultMock(FakeTopographyModel(topographies[case]))
+    result = workflow().topography_implementation(analysis)
+    # Round trip through JSON, as the stored reference
+    digest = json.loads(json.dumps(_digest(result)))
+
+    if UPDATE:
+        _store(REFERENCES, key, digest)
+    else:
+        _compare(digest, _load(REFERENCES)[key])
+
+
+@pytest.mark.budget
+@pytest.mark.skipif(
+    not BUDGETS_ENABLED,
+    reason="Set TOPOBANK_STATISTICS_BUDGET_TEST=1 to run budget tests",
+)
+@pytest.mark.parametrize("workflow,case", PARAMETERS)
+def test_golden_budget(topographies, workflow, case):
+    key = f"{workflow.Meta.name}/{case}"
+    analysis = AnalysisResultMock(FakeTopographyModel(topographies[case]))
+
+    tracemalloc.start()
+    start = time.process_time()
+    try:
+        workflow().topography_implementation(analysis)
+        cpu_seconds = time.process_time() - start
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    if UPDATE:
+        _store(
+            BUDGETS,
+            key,
+            dict(
+                cpu_seconds=math.ceil(max(4 * cpu_seconds, 0.5) * 10) / 10,
+                peak_memory=math.ceil(1.5 * peak_memory / 1024**2) * 1024**2,
+            ),
+        )
+        return
+
+    budget = _load(BUDGETS)[key]
+    assert cpu_seconds <= BUDGET_FACTOR * budget["cpu_seconds"], (
+        f"{key} took {cpu_seconds:.2f} s of CPU time; the budget is "
+        f"{budget['cpu_seconds']} s"
+    )
+    assert peak_memory <= budget["peak_memory"], (
+        f"{key} used {peak_memory / 1024**2:.1f} MB of memory; the budget is "
+        f"{budget['peak_memory'] / 1024**2:.0f} MB"
+    )
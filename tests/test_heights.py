@@ -0,0 +1,82 @@
+import numpy as np
+from numpy.testing import assert_allclose
+from SurfaceTopography import Topography, UniformLineScan
+from SurfaceTopography.Uniform.Detrending import DetrendedUniformTopography
+from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
+
+from topobank_statistics.cache import topography_fingerprint
+from topobank_statistics.heights import (static_topography,
+                                         transposed_topography)
+from topobank_statistics.workflows import RoughnessParameters
+
+TIP_RADIUS_INFO = dict(
+    instrument=dict(parameters=dict(tip_radius=dict(value=1, unit="nm")))
+)
+
+
+def test_static_topography():
+    np.random.seed(0)
+    t = Topography(
+        np.random.normal(size=(8, 6)), (2, 3), unit="nm", info=TIP_RADIUS_INFO
+    )
+    assert static_topography(t) is t
+
+    pipeline = t.detrend("height")
+    static = static_topography(pipeline)
+    assert isinstance(static, Topography)
+    assert_allclose(static.heights(), pipeline.heights())
+    assert static.physical_sizes == pipeline.physical_sizes
+    assert static.info == pipeline.info
+
+    line_scan = UniformLineScan(np.arange(5.0), 2).detrend("height")
+    assert isinstance(static_topography(line_scan), UniformLineScan)
+
+
+def test_transposed_topography_is_shared_view():
+    np.random.seed(0)
+    t = Topography(
+        np.random.normal(size=(8, 6)), (2, 3), unit="nm", info=TIP_RADIUS_INFO
+    )
+    transposed = transposed_topography(t)
+
+    assert transposed_topography(t) is transposed
+    assert np.shares_memory(transposed.heights(), t.heights())
+    assert_allclose(transposed.heights(), t.transpose().heights())
+    assert transposed.physical_sizes == t.transpose().physical_sizes
+    assert (
+        transposed.short_reliability_cutoff()
+        == t.transpose().short_reliability_cutoff()
+    )
+    assert_allclose(
+        transposed.rms_slope_from_profile(), t.transpose().rms_slope_from_profile()
+    )
+    # Fingerprint of the view, which differs from that of the original
+    assert topography_fingerprint(transposed) != topography_fingerprint(t)
+
+
+def test_roughness_parameters_evaluate_pipeline_once(monkeypatch):
+    np.random.seed(0)
+    t = Topography(np.random.normal(size=(16, 12)), (2, 3), unit="nm").detrend(
+        "height"
+    )
+    expected = RoughnessParameters().topography_implementation(
+        AnalysisResultMock(FakeTopographyModel(t))
+    )
+
+    nb_calls = 0
+    heights = DetrendedUniformTopography.heights
+
+    def counting_heights(self):
+        nonlocal nb_calls
+        nb_calls += 1
+        return heights(self)
+
+    monkeypatch.setattr(DetrendedUniformTopography, "heights", counting_heights)
+    result = RoughnessParameters().topography_implementation(
+        AnalysisResultMock(FakeTopographyModel(t))
+    )
+
+    # The height field is computed once; x- and y-direction statistics work
+    # on it and on a view of it
+    assert nb_calls == 1
+    assert [r["value"] for r in result] == [r["value"] for r in expected]
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+from SurfaceTopography.Exceptions import ReentrantDataError
+
+from topobank_statistics.histograms import (MergeableHistogram,
+                                            aligned_bin_width,
+                                            merge_histograms)
+from topobank_statistics.nonuniform import (height_values, segment_histogram,
+                                            weighted_moments)
+
+
+def test_aligned_bin_width():
+    assert aligned_bin_width(0, 1, 4) == 0.25
+    assert aligned_bin_width(0, 1, 3) == 0.5
+    assert aligned_bin_width(-3, 5, 100) == 0.125
+    # Constant values
+    assert aligned_bin_width(2, 2, 4) == 0.5
+
+
+def test_histogram_matches_numpy():
+    np.random.seed(0)
+    values = np.random.normal(size=1000)
+    histogram = MergeableHistogram.from_values(values, nb_bins=20)
+
+    assert len(histogram.counts) <= 21
+    assert histogram.nb_values == len(values)
+    hist, _ = np.histogram(values, bins=histogram.bin_edges, density=True)
+    assert_allclose(histogram.density, hist)
+    assert_allclose(histogram.mean, values.mean())
+    assert_allclose(histogram.rms, np.sqrt(np.mean(values**2)))
+    assert_allclose(histogram.std, values.std())
+
+
+def test_masked_and_invalid_values():
+    values = np.ma.masked_array([1.0, 2.0, 100.0], mask=[False, False, True])
+    assert MergeableHistogram.from_values(values, nb_bins=4).nb_values == 2
+    with pytest.raises(ReentrantDataError):
+        MergeableHistogram.from_values(np.array([1.0, np.inf]), nb_bins=4)
+    with pytest.raises(ReentrantDataError):
+        MergeableHistogram.from_values(np.array([]), nb_bins=4)
+
+
+def test_rebin():
+    values = np.array([-1.1, -0.3, 0.2, 0.6, 0.7, 1.9])
+    histogram = MergeableHistogram.from_values(values, width=0.25)
+    coarse = histogram.rebin(1.0)
+    assert_array_equal(coarse.counts, [1, 1, 3, 1])
+    assert_array_equal(coarse.bin_edges, [-2, -1, 0, 1, 2])
+    assert_array_equal(
+        coarse.counts, MergeableHistogram.from_values(values, width=1.0).counts
+    )
+    with pytest.raises(ValueError):
+        histogram.rebin(0.75)
+
+
+def test_merge_equals_histogram_of_all_values():
+    np.random.seed(1)
+    parts = [
+        np.random.normal(size=200),
+        5 + 0.1 * np.random.normal(size=50),
+        np.random.uniform(-20, -10, size=300),
+    ]
+    nb_bins = 32
+    histograms = [MergeableHistogram.from_values(p, nb_bins=nb_bins) for p in parts]
+
+    merged = merge_histograms(histograms, nb_bins)
+    expected = MergeableHistogram.from_values(
+        np.concatenate(parts), width=merged.width
+    )
+    assert len(merged.counts) <= nb_bins
+    assert merged.offset == expected.offset
+    assert_array_equal(merged.counts, expected.counts)
+    assert_allclose(merged.mean, expected.mean)
+    assert_allclose(merged.std, expected.std)
+
+    # Independent of the order of merging
+    for order in [(2, 1, 0), (1, 2, 0), (0, 2, 1)]:
+        other = merge_histograms([histograms[i] for i in order], nb_bins)
+        assert other.width == merged.width
+        assert other.offset == merged.offset
+        assert_array_equal(other.counts, merged.counts)
+
+    assert merge_histograms([None]) is None
+
+
+def test_weighted_histogram():
+    np.random.seed(2)
+    values = np.random.normal(size=500)
+    weights = np.random.uniform(0.5, 2, size=500)
+    histogram = MergeableHistogram.from_weighted_values(
+        values, weights, weighted_moments(values, weights), nb_bins=16
+    )
+
+    assert_allclose(histogram.nb_values, weights.sum())
+    hist, _ = np.histogram(
+        values, bins=histogram.bin_edges, weights=weights, density=True
+    )
+    assert_allclose(histogram.density, hist)
+    assert_allclose(histogram.mean, np.average(values, weights=weights))
+
+    # Weighted histograms merge with counted ones
+    counted = MergeableHistogram.from_values(values[:100], nb_bins=16)
+    merged = histogram.merge(counted, 16)
+    assert_allclose(merged.nb_values, weights.sum() + 100)
+    assert_allclose(np.sum(merged.density) * merged.width, 1)
+
+
+def test_segment_histogram():
+    x = np.concatenate([np.linspace(0, 1, 101), np.linspace(1, 2, 11)[1:]])
+    lower, upper, weights, moments = height_values(x, x**2)
+    histogram = MergeableHistogram.from_segments(
+        lower, upper, weights, moments, nb_bins=16
+    )
+
+    assert_allclose(histogram.nb_values, 2)
+    hist, _ = segment_histogram(
+        lower, upper, weights, histogram.bin_edges, None
+    )
+    assert_allclose(histogram.density, hist)
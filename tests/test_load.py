@@ -0,0 +1,146 @@
+"""
+Load test of the roughness parameters card endpoint.
+
+Seeds a collection of completed roughness parameters analyses and requests
+the card for the whole collection from concurrent clients, reporting median
+(p50) and 99th percentile (p99) latency and the number of database queries
+per request. The test is skipped unless `TOPOBANK_STATISTICS_LOAD_TEST=1`;
+run it with
+
+    TOPOBANK_STATISTICS_LOAD_TEST=1 pytest -s -m load tests/test_load.py
+
+The test settings use the database in `DATABASE_URL`; without a PostgreSQL
+server, use e.g. `DATABASE_URL=sqlite:////tmp/topobank-load.sqlite3`.
+The scenario is configured by the environment variables
+
+    TOPOBANK_STATISTICS_LOAD_NB_ANALYSES   number of analyses (Default: 2000)
+    TOPOBANK_STATISTICS_LOAD_NB_REQUESTS   number of requests (Default: 100)
+    TOPOBANK_STATISTICS_LOAD_CONCURRENCY   concurrent clients (Default: 8)
+    TOPOBANK_STATISTICS_LOAD_MAX_P99       fail if the p99 latency in seconds
+                                           exceeds this value (Default: none)
+    TOPOBANK_STATISTICS_LOAD_MAX_QUERIES   fail if a request makes more
+                                           queries (Default: none)
+"""
+
+import copy
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from topobank.manager.utils import subjects_to_base64
+from topobank.testing.factories import (SurfaceFactory, Topography2DFactory,
+                                        TopographyAnalysisFactory)
+from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
+
+from topobank_statistics.testing.synthetic import self_affine_topography
+from topobank_statistics.workflows import RoughnessParameters
+
+ENABLED = os.environ.get("TOPOBANK_STATISTICS_LOAD_TEST", "0") == "1"
+NB_ANALYSES = int(os.environ.get("TOPOBANK_STATISTICS_LOAD_NB_ANALYSES", "2000"))
+NB_REQUESTS = int(os.environ.get("TOPOBANK_STATISTICS_LOAD_NB_REQUESTS", "100"))
+CONCURRENCY = int(os.environ.get("TOPOBANK_STATISTICS_LOAD_CONCURRENCY", "8"))
+MAX_P99 = os.environ.get("TOPOBANK_STATISTICS_LOAD_MAX_P99")
+MAX_QUERIES = os.environ.get("TOPOBANK_STATISTICS_LOAD_MAX_QUERIES")
+
+WORKFLOW = "topobank_statistics.roughness_parameters"
+
+pytestmark = [
+    pytest.mark.load,
+    pytest.mark.skipif(
+        not ENABLED, reason="Set TOPOBANK_STATISTICS_LOAD_TEST=1 to run load tests"
+    ),
+]
+
+
+@pytest.fixture
+def roughness_collection(mocker, user_with_plugin, handle_usage_statistics, settings):
+    """Topographies with completed roughness parameters analyses."""
+    settings.DELETE_EXISTING_FILES = True
+
+    # All analyses get the (realistic) result of a map
+    result = RoughnessParameters().topography_implementation(
+        AnalysisResultMock(
+            FakeTopographyModel(self_affine_topography((128, 128), (1e-6, 1e-6)))
+        )
+    )
+    m = mocker.patch(
+        "topobank.analysis.models.Workflow.eval",
+        new_callable=mocker.PropertyMock,
+    )
+    m.return_value = lambda *args, **kwargs: copy.deepcopy(result)
+
+    surface = SurfaceFactory(created_by=user_with_plugin)
+    topographies = []
+    for _ in range(NB_ANALYSES):
+        topography = Topography2DFactory(size_x=1, size_y=1, surface=surface)
+        TopographyAnalysisFactory(subject_topography=topography, workflow_name=WORKFLOW)
+        topographies.append(topography)
+    return topographies, len(result)
+
+
+def _get(client, url, params):
+    start = time.perf_counter()
+    response = client.get(url, params)
+    return time.perf_counter() - start, response.status_code
+
+
+@pytest.mark.urls("test_urls")
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("view", ["card-roughness-parameters", "card-roughness-parameters-async"])
+def test_roughness_parameters_card_load(roughness_collection, user_with_plugin, view):
+    topographies, nb_rows = roughness_collection
+    url = reverse(f"topobank_statistics:{view}", kwargs={"workflow": WORKFLOW})
+    params = {"workflow": WORKFLOW, "subjects": subjects_to_base64(topographies)}
+
+    client = APIClient()
+    client.force_authenticate(user_with_plugin)
+
+    # Queries of a single request, also warms up caches
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params)
+    assert response.status_code == 200
+    assert len(response.json()["tableData"]) == nb_rows * len(topographies)
+    nb_queries = len(queries)
+
+    def worker(nb_requests):
+        worker_client = APIClient()
+        worker_client.force_authenticate(user_with_plugin)
+        try:
+            return [_get(worker_client, url, params) for _ in range(nb_requests)]
+        finally:
+            # Every thread has its own database connection
+            connection.close()
+
+    requests_per_worker = np.diff(np.linspace(0, NB_REQUESTS, CONCURRENCY + 1).astype(int))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        samples = [
+            sample
+            for samples in executor.map(worker, requests_per_worker)
+            for sample in samples
+        ]
+    wall_time = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in samples])
+    status_codes = [status_code for _, status_code in samples]
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(
+        f"\n{view}: {NB_ANALYSES} analyses, {len(samples)} requests from "
+        f"{CONCURRENCY} clients in {wall_time:.1f} s ({len(samples) / wall_time:.1f} "
+        f"requests/s); latency p50 {p50:.3f} s, p99 {p99:.3f} s; "
+        f"{nb_queries} queries per request"
+    )
+
+    assert status_codes == [200] * len(samples)
+    if MAX_P99 is not None:
+        assert p99 <= float(MAX_P99), f"p99 latency {p99:.3f} s exceeds {MAX_P99} s"
+    if MAX_QUERIES is not None:
+        assert nb_queries <= int(MAX_QUERIES), (
+            f"{nb_queries} queries per request exceed {MAX_QUERIES}"
+        )
@@ -0,0 +1,164 @@
+import datetime
+import os
+
+import numpy as np
+import pytest
+from SurfaceTopography import NonuniformLineScan, Topography, UniformLineScan
+from topobank.testing.utils import AnalysisResultMock
+
+from topobank_statistics import memmap
+from topobank_statistics.memmap import (cache_key, evict, memmapped_topography,
+                                        read_topography)
+from topobank_statistics.workflows import HeightDistribution
+
+
+class CountingTopographyModel:
+    """Minimal stand-in for the topobank topography model."""
+
+    def __init__(self, t, pk=1, name="topography"):
+        self._t = t
+        self.pk = pk
+        self.name = name
+        self.nb_loads = 0
+        self.modification_time = datetime.datetime(2025, 1, 1)
+        self.detrend_mode = "center"
+        self.fill_undefined_data_mode = "do-not-fill"
+        self.is_periodic = False
+        self.unit = "nm"
+        self.height_scale = 1.0
+        self.resolution_x = self.resolution_y = None
+        self.size_x = self.size_y = 1.0
+
+    def topography(self):
+        self.nb_loads += 1
+        return self._t
+
+
+@pytest.mark.parametrize(
+    "t",
+    [
+        Topography(np.arange(20.0).reshape(4, 5), (2, 3), unit="nm"),
+        UniformLineScan(np.sin(np.arange(17.0)), 4, periodic=True, unit="um"),
+    ],
+)
+def test_memmapped_topography_roundtrip(tmp_path, t):
+    subject = CountingTopographyModel(t.detrend("center"))
+
+    t1 = memmapped_topography(subject, str(tmp_path))
+    t2 = memmapped_topography(subject, str(tmp_path))
+
+    # The height field is only materialized once
+    assert subject.nb_loads == 1
+    for mapped in [t1, t2]:
+        assert isinstance(mapped.heights(), np.memmap)
+        assert not mapped.heights().flags.writeable
+        np.testing.assert_allclose(mapped.heights(), subject._t.heights())
+        assert mapped.physical_sizes == subject._t.physical_sizes
+        assert mapped.is_periodic == subject._t.is_periodic
+        assert mapped.unit == subject._t.unit
+
+
+def test_memmapped_topography_masked(tmp_path):
+    heights = np.ma.masked_array(
+        np.arange(12.0).reshape(3, 4), mask=np.arange(12).reshape(3, 4) % 5 == 0
+    )
+    subject = CountingTopographyModel(Topography(heights, (1, 1)))
+
+    t = memmapped_topography(subject, str(tmp_path))
+
+    assert t.has_undefined_data
+    np.testing.assert_array_equal(np.ma.getmaskarray(t.heights()), heights.mask)
+    np.testing.assert_allclose(np.ma.compressed(t.heights()), heights.compressed())
+
+
+def test_memmapped_topography_nonuniform_is_not_cached(tmp_path):
+    t = NonuniformLineScan(np.array([0.0, 1.0, 3.0]), np.array([1.0, 2.0, 0.0]))
+    subject = CountingTopographyModel(t)
+
+    assert memmapped_topography(subject, str(tmp_path)) is t
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cache_key_changes_with_model():
+    t = Topography(np.zeros((2, 2)), (1, 1))
+    subject = CountingTopographyModel(t)
+    key = cache_key(subject)
+    subject.detrend_mode = "height"
+    assert cache_key(subject) != key
+    assert cache_key(CountingTopographyModel(t, pk=2)) != key
+    subject.detrend_mode = "center"
+    subject.modification_time = datetime.datetime(2025, 1, 2)
+    assert cache_key(subject) != key
+
+    # Fields missing on the model are an error, not part of a stale key
+    del subject.height_scale
+    with pytest.raises(AttributeError):
+        cache_key(subject)
+
+
+def test_memmap_cache_evicts_least_recently_used(tmp_path, settings, monkeypatch):
+    monkeypatch.setattr(memmap, "_last_eviction", {})
+    subjects = [
+        CountingTopographyModel(Topography(np.full((8, 8), float(pk)), (1, 1)), pk=pk)
+        for pk in range(3)
+    ]
+    for i, subject in enumerate(subjects):
+        memmapped_topography(subject, str(tmp_path))
+        # Distinct times of last use
+        for path in tmp_path.glob(f"{cache_key(subject)}.*"):
+            os.utime(path, (1000 + i, 1000 + i))
+    entry_size = sum(
+        p.stat().st_size for p in tmp_path.glob(f"{cache_key(subjects[0])}.*")
+    )
+
+    # Using an entry marks it as recently used
+    memmapped_topography(subjects[0], str(tmp_path))
+    assert subjects[0].nb_loads == 1
+    evict(str(tmp_path), 2 * entry_size)
+    remaining = {p.name.split(".")[0] for p in tmp_path.iterdir()}
+    assert remaining == {cache_key(subjects[0]), cache_key(subjects[2])}
+
+    # Evicted entries are materialized again
+    t = memmapped_topography(subjects[1], str(tmp_path))
+    assert subjects[1].nb_loads == 2
+    np.testing.assert_array_equal(t.heights(), 1.0)
+
+    # Materializing beyond the configured size evicts entries
+    settings.TOPOBANK_STATISTICS_MEMMAP_CACHE_MAX_SIZE = 0
+    monkeypatch.setattr(memmap, "_last_eviction", {})
+    t = memmapped_topography(
+        CountingTopographyModel(Topography(np.ones((8, 8)), (1, 1)), pk=3),
+        str(tmp_path),
+    )
+    np.testing.assert_array_equal(t.heights(), 1.0)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_read_topography_setting(tmp_path, settings):
+    t = Topography(np.arange(6.0).reshape(2, 3), (1, 1), unit="nm")
+    subject = CountingTopographyModel(t)
+
+    settings.TOPOBANK_STATISTICS_MEMMAP_CACHE_DIR = None
+    assert read_topography(subject) is t
+
+    settings.TOPOBANK_STATISTICS_MEMMAP_CACHE_DIR = str(tmp_path)
+    assert isinstance(read_topography(subject).heights(), np.memmap)
+
+
+def test_height_distribution_with_memmap(tmp_path, settings):
+    t = Topography(np.arange(50.0).reshape(5, 10), (5, 10), unit="nm").detrend(
+        "center"
+    )
+    subject = CountingTopographyModel(t)
+
+    settings.TOPOBANK_STATISTICS_MEMMAP_CACHE_DIR = None
+    expected = HeightDistribution(bins=10).topography_implementation(
+        AnalysisResultMock(subject)
+    )
+    settings.TOPOBANK_STATISTICS_MEMMAP_CACHE_DIR = str(tmp_path)
+    result = HeightDistribution(bins=10).topography_implementation(
+        AnalysisResultMock(subject)
+    )
+
+    assert result["scalars"] == expected["scalars"]
+    np.testing.assert_allclose(result["series"][0]["y"], expected["series"][0]["y"])
@@ -0,0 +1,109 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+from SurfaceTopography import Topography
+from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
+
+from topobank_statistics.moments import Moments, histogram, iter_blocks
+from topobank_statistics.workflows import (CurvatureDistribution,
+                                           HeightDistribution)
+
+
+def _masked_array(shape=(300, 200), mean=0):
+    np.random.seed(0)
+    return np.ma.masked_array(
+        np.random.normal(mean, 1, size=shape), mask=np.random.rand(*shape) < 0.3
+    )
+
+
+@pytest.mark.parametrize("block_size", [1, 1000, 2**20])
+def test_moments(block_size):
+    arr = _masked_array(mean=1e6)
+    for a in [arr, arr.data, arr[:, 5:-3].T, arr.astype(np.float32)]:
+        values = np.ma.compressed(a).astype(np.float64)
+        moments = Moments.from_array(a, block_size=block_size)
+        assert moments.count == values.size
+        assert_allclose(moments.mean, values.mean(), rtol=1e-14)
+        assert_allclose(moments.std, values.std(), rtol=1e-9)
+        assert_allclose(moments.rms, np.sqrt(np.mean(values**2)))
+        assert moments.min == values.min()
+        assert moments.max == values.max()
+
+
+def test_moments_merge_and_special_values():
+    arr = _masked_array()
+    merged = Moments.from_array(arr[:100]).merge(Moments.from_array(arr[100:]))
+    expected = Moments.from_array(arr)
+    assert merged.count == expected.count
+    assert_allclose(merged.mean, expected.mean)
+    assert_allclose(merged.std, expected.std)
+
+    empty = Moments.from_array(np.ma.masked_all((3, 4)))
+    assert empty.count == 0
+    assert np.isnan(empty.mean)
+
+    assert np.isnan(Moments.from_array(np.array([1.0, np.nan])).min)
+    assert Moments.from_array(np.float64(2)).mean == 2
+
+
+def test_histogram_matches_numpy():
+    arr = _masked_array()
+    values = np.ma.compressed(arr)
+    for bins in [30, "auto", "fd", np.linspace(-2, 2, 11)]:
+        for hist_range in [None, (values.min(), values.max()), (-1, 1)]:
+            # Edges are identical for all blocks, also for bin width
+            # estimators and without explicit range
+            hist, bin_edges = histogram(arr, bins, hist_range, block_size=999)
+            expected_hist, expected_edges = np.histogram(
+                values, bins=bins, range=hist_range, density=True
+            )
+            assert_array_equal(hist, expected_hist)
+            assert_array_equal(bin_edges, expected_edges)
+
+
+def test_blocks_are_views():
+    arr = _masked_array()
+    for data, valid in iter_blocks(arr, block_size=1000):
+        assert np.shares_memory(data, arr.data)
+        assert valid.shape == data.shape
+
+
+def test_moments_memory_bounded():
+    arr = _masked_array(shape=(2048, 1024))
+    tracemalloc.start()
+    try:
+        Moments.from_array(arr, block_size=2**14)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # A compressed copy would allocate 70 % of the array
+    assert peak < arr.data.nbytes / 10
+
+
+@pytest.mark.parametrize("workflow", [HeightDistribution, CurvatureDistribution])
+def test_masked_distributions_without_compressed_copy(monkeypatch, workflow):
+    t = Topography(_masked_array(shape=(64, 48)), (2, 3), unit="nm")
+    if workflow is HeightDistribution:
+        quantity = "Height"
+        values = np.ma.compressed(t.heights())
+    else:
+        quantity = "Curvature"
+        curv_x, curv_y = t.derivative(n=2)
+        values = np.ma.compressed((curv_x + curv_y) / 2)
+
+    def compressed(*args, **kwargs):
+        raise AssertionError("np.ma.compressed should not be called")
+
+    monkeypatch.setattr(np.ma, "compressed", compressed)
+    result = workflow().topography_implementation(
+        AnalysisResultMock(FakeTopographyModel(t))
+    )
+
+    assert_allclose(result["scalars"][f"Mean {quantity}"]["value"], values.mean())
+    distribution = result["series"][0]
+    expected_hist, _ = np.histogram(
+        values, bins=len(distribution["x"]), density=True
+    )
+    assert_allclose(distribution["y"], expected_hist)
@@ -0,0 +1,182 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from SurfaceTopography import NonuniformLineScan
+from SurfaceTopography.Exceptions import ReentrantDataError
+from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
+
+from topobank_statistics.nonuniform import (curvature_values, height_values,
+                                            robust_segment_histogram,
+                                            robust_weighted_histogram,
+                                            segment_histogram, slope_values,
+                                            weighted_histogram,
+                                            weighted_moments)
+from topobank_statistics.testing.synthetic import (nonuniform_line_scan,
+                                                  reentrant_line_scan)
+from topobank_statistics.workflows import (CurvatureDistribution,
+                                           HeightDistribution,
+                                           SlopeDistribution)
+
+
+def _clustered_line_scan():
+    """Line scan with dense sampling of its first half and sparse sampling of
+    its second half."""
+    x = np.concatenate([np.linspace(0, 1, 1001), np.linspace(1, 2, 11)[1:]])
+    return x, x**2
+
+
+def test_height_values():
+    x, h = _clustered_line_scan()
+    lower, upper, weights, moments = height_values(x, h)
+    assert len(lower) == len(upper) == len(weights) == len(x) - 1
+    assert np.all(lower <= upper)
+    assert_allclose(np.sum(weights), 2)
+    t = NonuniformLineScan(x, h)
+    assert_allclose(moments.mean, t.mean())
+    assert_allclose(moments.std, t.rms_height_from_profile())
+    assert moments.min == 0 and moments.max == 4
+    # Unweighted moments of the data points are biased by the clustering
+    assert abs(np.mean(h) - t.mean()) > 0.05
+
+
+def test_slope_and_curvature_values():
+    x, h = _clustered_line_scan()
+    t = NonuniformLineScan(x, h)
+    slopes, weights = slope_values(x, h)
+    assert_allclose(slopes, t.derivative(n=1))
+    assert_allclose(weights, np.diff(x))
+    # The mean slope is the height difference over the length
+    assert_allclose(weighted_moments(slopes, weights).mean, (h[-1] - h[0]) / 2)
+
+    curvatures, weights = curvature_values(x, h)
+    assert_allclose(curvatures, t.derivative(n=2))
+    assert_allclose(np.sum(weights), x[-2] - x[1] + (x[1] - x[0] + x[-1] - x[-2]) / 2)
+
+
+def test_reentrant_values():
+    x, h = reentrant_line_scan(100).positions_and_heights()
+    with pytest.raises(ReentrantDataError):
+        slope_values(x, h)
+    with pytest.raises(ReentrantDataError):
+        curvature_values(x, h)
+    # Vertical steps do not contribute to the height distribution
+    lower, upper, weights, moments = height_values(x, h)
+    assert np.all(weights[np.diff(x) == 0] == 0)
+    assert np.isfinite(moments.std)
+
+
+def test_weighted_histograms():
+    values = np.array([0.0, 1.0, 2.0, 3.0])
+    weights = np.array([1.0, 1.0, 1.0, 5.0])
+    hist, bin_edges = weighted_histogram(values, weights, 2, (0, 3))
+    assert_allclose(hist, [1 / 6, 1 / 2])
+    assert_allclose(np.sum(hist * np.diff(bin_edges)), 1)
+
+    np.random.seed(0)
+    values = np.random.normal(size=10000)
+    values[:10] = 1e3
+    weights = np.random.uniform(0.5, 1.5, size=len(values))
+    hist, bin_edges, nb_below, nb_above = robust_weighted_histogram(
+        values, weights, weighted_moments(values, weights), 100
+    )
+    assert bin_edges[-1] < 10
+    assert nb_above >= 10
+    assert np.sum(hist * np.diff(bin_edges)) < 1
+
+
+def test_segment_histograms():
+    # The length of a segment is spread over all bins it covers
+    lower, upper, weights, moments = height_values(
+        np.array([0.0, 10.0]), np.array([0.0, 10.0])
+    )
+    hist, bin_edges = segment_histogram(lower, upper, weights, 10, (0, 10))
+    assert_allclose(hist * np.diff(bin_edges), np.full(10, 0.1))
+
+    # Same distribution as the heights of the densely sampled profile
+    np.random.seed(0)
+    x = np.sort(np.random.uniform(0, 1, size=50))
+    h = np.random.normal(size=50)
+    # Segment of constant height
+    h[11] = h[10]
+    lower, upper, weights, moments = height_values(x, h)
+    x_dense = np.linspace(x[0], x[-1], 1000001)
+    h_dense = np.interp(x_dense, x, h)
+    for bins in [7, np.array([-3, -0.5, 0, 0.1, 3])]:
+        hist, bin_edges = segment_histogram(
+            lower, upper, weights, bins, (moments.min, moments.max)
+        )
+        expected, _ = np.histogram(h_dense, bins=bin_edges, density=True)
+        assert_allclose(hist, expected, atol=1e-4)
+
+    hist, bin_edges, nb_below, nb_above = robust_segment_histogram(
+        lower, upper, weights, moments, 20
+    )
+    expected, _ = np.histogram(h_dense, bins=bin_edges)
+    assert_allclose(hist * np.diff(bin_edges), expected / len(h_dense), atol=1e-5)
+    assert nb_below == np.count_nonzero(lower < bin_edges[0])
+    assert nb_above == np.count_nonzero(upper > bin_edges[-1])
+
+
+def test_length_weighted_distributions():
+    x, h = _clustered_line_scan()
+    t = NonuniformLineScan(x, h, unit="nm")
+    analysis = AnalysisResultMock(FakeTopographyModel(t))
+
+    result = HeightDistribution(bins=10).topography_implementation(analysis)
+    assert_allclose(result["scalars"]["Mean Height"]["value"], t.mean())
+    # Same distribution as the densely and uniformly sampled, piecewise
+    # linear profile
+    x_uniform = np.linspace(0, 2, 200001)
+    expected, _ = np.histogram(np.interp(x_uniform, x, h), bins=10, density=True)
+    assert_allclose(result["series"][0]["y"], expected, rtol=1e-3)
+
+    result = SlopeDistribution().topography_implementation(analysis)
+    assert_allclose(result["scalars"]["Mean Slope (x direction)"]["value"], 2)
+    assert_allclose(
+        result["scalars"]["RMS Slope (x direction)"]["value"],
+        t.rms_slope_from_profile(),
+    )
+
+    result = CurvatureDistribution().topography_implementation(analysis)
+    assert_allclose(result["scalars"]["Mean Curvature"]["value"], 2)
+
+
+def test_length_weighted_distributions_for_surface():
+    x, h = _clustered_line_scan()
+    t = NonuniformLineScan(x, h, unit="nm")
+
+    class Surface:
+        class topography_set:
+            @staticmethod
+            def all():
+                return [FakeTopographyModel(t)]
+
+    analysis = AnalysisResultMock(Surface())
+
+    result = HeightDistribution(bins=16).surface_implementation(analysis)
+    assert_allclose(result["scalars"]["Mean Height"]["value"], t.mean())
+    # Same distribution as the densely and uniformly sampled, piecewise
+    # linear profile
+    series = result["series"][0]
+    width = series["x"][1] - series["x"][0]
+    bin_edges = np.append(series["x"] - width / 2, series["x"][-1] + width / 2)
+    x_uniform = np.linspace(0, 2, 200001)
+    expected, _ = np.histogram(np.interp(x_uniform, x, h), bins=bin_edges, density=True)
+    assert_allclose(series["y"], expected, rtol=1e-3, atol=1e-4)
+
+    result = SlopeDistribution().surface_implementation(analysis)
+    assert_allclose(result["scalars"]["Mean Slope (x direction)"]["value"], 2)
+
+    result = CurvatureDistribution().surface_implementation(analysis)
+    assert_allclose(result["scalars"]["Mean Curvature"]["value"], 2)
+
+
+@pytest.mark.parametrize("binning", ["uniform", "robust"])
+def test_nonuniform_distributions(binning):
+    t = nonuniform_line_scan(1000, unit="nm", seed=3)
+    analysis = AnalysisResultMock(FakeTopographyModel(t))
+    for workflow in [HeightDistribution, SlopeDistribution, CurvatureDistribution]:
+        result = workflow(binning=binning).topography_implementation(analysis)
+        series = result["series"][0]
+        assert np.all(np.isfinite(series["y"]))
+        assert np.all(series["y"] >= 0)
@@ -0,0 +1,63 @@
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from topobank_statistics.outliers import outlier_statistics, stack_samples
+
+
+def _values():
+    np.random.seed(0)
+    values = np.random.uniform(-1, 1, size=(3, 2000))
+    values[0, [10, 500]] = [40, -35]
+    values[2, 1000] = 25
+    return values
+
+
+def test_outlier_statistics_matches_rows():
+    values = _values()
+    stats = outlier_statistics(values)
+    assert_array_equal(stats.nb_outliers, [2, 0, 1])
+    for row in range(len(values)):
+        single = outlier_statistics(values[row : row + 1])
+        assert_array_equal(stats.mask[row], single.mask[0])
+        assert_allclose(stats.median[row], np.median(values[row]))
+        assert_allclose(
+            stats.mad[row], np.median(np.abs(values[row] - np.median(values[row])))
+        )
+        assert_allclose(stats.rms_full[row], np.sqrt(np.mean(values[row] ** 2)))
+        assert_allclose(
+            stats.rms_trimmed[row],
+            np.sqrt(np.mean(values[row][~stats.mask[row]] ** 2)),
+        )
+    assert stats.report(1) is None
+    report = stats.report(0)
+    assert report["n_outliers"] == 2
+    assert report["rms_trimmed"] < report["rms_full"]
+
+
+def test_outlier_statistics_masked_and_ragged():
+    values = _values()
+    mask = np.zeros_like(values, dtype=bool)
+    # Masking the first spike leaves one outlier in the first row
+    mask[0, :100] = True
+    stats = outlier_statistics(np.ma.masked_array(values, mask=mask))
+    assert_array_equal(stats.count, [1900, 2000, 2000])
+    assert_array_equal(stats.nb_outliers, [1, 0, 1])
+    assert not np.any(stats.mask[mask])
+    compressed = outlier_statistics(values[:1, 100:])
+    assert_allclose(stats.median[0], compressed.median[0])
+    assert_allclose(stats.z_c[0], compressed.z_c[0])
+    assert_allclose(stats.rms_trimmed[0], compressed.rms_trimmed[0])
+
+    # Arrays of different shapes (e.g. derivatives along different axes)
+    ragged = stack_samples([values[0], values[2, :500].reshape(20, 25)])
+    assert ragged.shape == (2, 2000)
+    stats = outlier_statistics([values[0], values[2, :500].reshape(20, 25)])
+    assert_array_equal(stats.count, [2000, 500])
+    assert_array_equal(stats.nb_outliers, [2, 0])
+
+
+def test_outlier_statistics_degenerate_rows():
+    stats = outlier_statistics([np.array([1.0, 2.0]), np.full(100, 3.0)])
+    assert_array_equal(stats.nb_outliers, [0, 0])
+    assert np.all(np.isnan(stats.z_c))
+    assert stats.report(0) is None and stats.report(1) is None
@@ -0,0 +1,139 @@
+import functools
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from SurfaceTopography import NonuniformLineScan, Topography, UniformLineScan
+from topobank.testing.utils import AnalysisResultMock
+
+from topobank_statistics.parallel import map_topographies
+from topobank_statistics.workflows import (PowerSpectralDensity,
+                                           SlopeDistribution)
+
+
+class _Model:
+    def __init__(self, t):
+        self._t = t
+
+    def topography(self):
+        return self._t
+
+
+class _Queryset:
+    def __init__(self, models):
+        self._models = models
+
+    def all(self):
+        return self._models
+
+
+class _Surface:
+    name = "surface"
+
+    def __init__(self, topographies):
+        self.topography_set = _Queryset([_Model(t) for t in topographies])
+
+
+def _topographies():
+    np.random.seed(0)
+    heights = np.random.normal(size=(64, 48))
+    masked = np.ma.masked_array(heights, mask=heights > 2)
+    x = np.sort(np.random.uniform(0, 10, size=100))
+    return [
+        Topography(heights, (2, 3), unit="um"),
+        Topography(masked, (2, 3), unit="um"),
+        UniformLineScan(np.cumsum(np.random.normal(size=200)), 5, unit="nm"),
+        NonuniformLineScan(x, np.sin(x), unit="nm"),
+    ]
+
+
+def _summary(topography):
+    heights = topography.heights()
+    return topography.unit, topography.nb_grid_pts, np.ma.count(heights), heights.sum()
+
+
+def _fail(topography):
+    raise RuntimeError("Failure in worker")
+
+
+def _rendezvous(barrier, topography):
+    # Only passes if two topographies are evaluated concurrently
+    barrier.wait()
+    return topography.nb_grid_pts
+
+
+def _map_in_daemonic_process(queue):
+    barrier = threading.Barrier(2, timeout=10)
+    try:
+        queue.put(
+            map_topographies(
+                functools.partial(_rendezvous, barrier), _topographies(), workers=2
+            )
+        )
+    except Exception as exc:
+        queue.put(exc)
+
+
+def test_map_topographies():
+    topographies = _topographies()
+    progress = []
+    sequential = map_topographies(_summary, topographies, unit="nm", workers=1)
+    parallel = map_topographies(
+        _summary,
+        topographies,
+        unit="nm",
+        workers=2,
+        progress_callback=lambda i, n: progress.append((i, n)),
+    )
+    assert len(parallel) == len(topographies)
+    for (unit, nb_grid_pts, count, total), expected in zip(parallel, sequential):
+        assert unit == expected[0] == "nm"
+        assert nb_grid_pts == expected[1]
+        assert count == expected[2]
+        assert_allclose(total, expected[3])
+    assert progress[-1] == (4, 4)
+
+
+def test_map_topographies_failure():
+    with pytest.raises(RuntimeError):
+        map_topographies(_fail, _topographies(), workers=2)
+
+
+def test_map_topographies_is_concurrent_in_daemonic_processes():
+    # Children of Celery's prefork pool are daemonic and cannot start
+    # processes; worker threads evaluate topographies concurrently anyway
+    expected = [t.nb_grid_pts for t in _topographies()]
+    context = multiprocessing.get_context(
+        "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    )
+    queue = context.Queue()
+    process = context.Process(target=_map_in_daemonic_process, args=(queue,))
+    process.daemon = True
+    process.start()
+    result = queue.get(timeout=60)
+    process.join()
+    assert result == expected
+
+
+@pytest.mark.parametrize("workflow", [PowerSpectralDensity, SlopeDistribution])
+def test_parallel_surface_workflows(settings, workflow):
+    analysis = AnalysisResultMock(_Surface(_topographies()))
+    settings.TOPOBANK_STATISTICS_SURFACE_WORKERS = 1
+    sequential = workflow().surface_implementation(analysis)
+    settings.TOPOBANK_STATISTICS_SURFACE_WORKERS = 2
+    parallel = workflow().surface_implementation(analysis)
+
+    assert parallel["alerts"] == sequential["alerts"]
+    scalars = sequential.get("scalars", {})
+    assert parallel.get("scalars", {}).keys() == scalars.keys()
+    for key, scalar in scalars.items():
+        assert_allclose(parallel["scalars"][key]["value"], scalar["value"])
+    assert len(parallel["series"]) == len(sequential["series"]) > 0
+    for parallel_series, sequential_series in zip(
+        parallel["series"], sequential["series"]
+    ):
+        assert parallel_series["name"] == sequential_series["name"]
+        assert_allclose(parallel_series["x"], sequential_series["x"])
+        assert_allclose(parallel_series["y"], sequential_series["y"])
@@ -0,0 +1,155 @@
+import gc
+import tracemalloc
+import weakref
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from SurfaceTopography import Topography, UniformLineScan
+from SurfaceTopography.Generation import fourier_synthesis
+from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
+
+from topobank_statistics.precision import (ReducedPrecisionTopography,
+                                           compute_dtype, reduced_precision)
+from topobank_statistics.workflows import (CurvatureDistribution,
+                                           HeightDistribution,
+                                           RoughnessParameters,
+                                           SlopeDistribution)
+
+RMS_PARAMETERS_1D = [
+    "rms_height_from_profile",
+    "rms_slope_from_profile",
+    "rms_curvature_from_profile",
+]
+RMS_PARAMETERS_2D = RMS_PARAMETERS_1D + [
+    "rms_height_from_area",
+    "rms_gradient",
+    "rms_curvature_from_area",
+]
+
+
+def _topographies(periodic):
+    np.random.seed(0)
+    heights = np.random.normal(size=(32, 24))
+    return [
+        Topography(heights, (2, 3), periodic=periodic),
+        UniformLineScan(heights[:, 0], 2, periodic=periodic),
+    ]
+
+
+@pytest.mark.parametrize("periodic", [False, True])
+def test_derivatives_match_surface_topography(periodic):
+    for t in _topographies(periodic):
+        field = ReducedPrecisionTopography(t, dtype=np.float64)
+        for n in (1, 2):
+            expected = t.derivative(n)
+            derivative = field.derivative(n)
+            if t.dim == 1:
+                expected, derivative = [expected], [derivative]
+            for e, d in zip(expected, derivative):
+                assert d.shape == e.shape
+                assert_allclose(d, e)
+        for name in RMS_PARAMETERS_2D if t.dim == 2 else RMS_PARAMETERS_1D:
+            assert_allclose(getattr(field, name)(), getattr(t, name)())
+        if t.dim == 2:
+            # Shares the height array and matches transpose()
+            transposed = field.transpose()
+            assert np.shares_memory(transposed.heights(), field.heights())
+            for name in RMS_PARAMETERS_1D:
+                assert_allclose(
+                    getattr(transposed, name)(), getattr(t.transpose(), name)()
+                )
+
+
+@pytest.mark.parametrize("periodic", [False, True])
+def test_float32_relative_error(periodic):
+    for t in _topographies(periodic):
+        field = ReducedPrecisionTopography(t)
+        assert field.heights().dtype == np.float32
+        assert field.derivative(1)[0].dtype == np.float32
+        for name in RMS_PARAMETERS_2D if t.dim == 2 else RMS_PARAMETERS_1D:
+            value = getattr(field, name)()
+            assert value.dtype == np.float64
+            assert_allclose(value, getattr(t, name)(), rtol=1e-6)
+
+
+def test_reduced_precision_fallbacks(settings):
+    t = Topography(np.arange(12.0).reshape(4, 3), (1, 1))
+    assert reduced_precision(t) is t
+    assert reduced_precision(t, "float64") is t
+    assert isinstance(reduced_precision(t, "float32"), ReducedPrecisionTopography)
+
+    # Undefined data is evaluated in double precision
+    masked = Topography(
+        np.ma.masked_array(t.heights(), mask=t.heights() > 10), (1, 1)
+    )
+    assert reduced_precision(masked, "float32") is masked
+
+    settings.TOPOBANK_STATISTICS_PRECISION = "float32"
+    assert compute_dtype() is np.float32
+    assert isinstance(reduced_precision(t), ReducedPrecisionTopography)
+
+    with pytest.raises(ValueError):
+        compute_dtype("float16")
+    with pytest.raises(ValueError):
+        HeightDistribution(precision="float16")
+
+
+def test_float32_releases_float64_heights():
+    np.random.seed(0)
+    # Heights with a large mean
+    t = Topography(100 + np.random.normal(size=(512, 512)), (2, 1))
+    expected = {name: getattr(t, name)() for name in RMS_PARAMETERS_2D}
+    bandwidth = t.bandwidth()
+
+    field = reduced_precision(t, "float32")
+    ref = weakref.ref(t)
+    del t
+    gc.collect()
+    # No reference to the float64 topography is kept
+    assert ref() is None
+    assert field.bandwidth() == bandwidth
+
+    for name, value in expected.items():
+        tracemalloc.start()
+        assert_allclose(getattr(field, name)(), value, rtol=1e-6)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if name.startswith("rms_height"):
+            # No float64 temporaries of the size of the height field
+            assert peak < 1.5 * field.heights().nbytes
+
+
+def _scalars(result):
+    if isinstance(result, list):
+        # Roughness parameters
+        return {
+            (r["quantity"], r["direction"], r["from"]): r["value"] for r in result
+        }
+    return {key: value["value"] for key, value in result["scalars"].items()}
+
+
+@pytest.mark.parametrize(
+    "workflow",
+    [HeightDistribution, SlopeDistribution, CurvatureDistribution, RoughnessParameters],
+)
+@pytest.mark.parametrize("dim", [1, 2])
+def test_float32_workflows(workflow, dim):
+    nb_grid_pts = (256,) if dim == 1 else (128, 64)
+    physical_sizes = (2.0,) if dim == 1 else (2.0, 1.0)
+    t = fourier_synthesis(nb_grid_pts, physical_sizes, 0.8, rms_slope=0.1)
+    t = t.detrend("height")
+    analysis = AnalysisResultMock(FakeTopographyModel(t))
+
+    expected = _scalars(workflow().topography_implementation(analysis))
+    result = _scalars(
+        workflow(precision="float32").topography_implementation(analysis)
+    )
+
+    assert result.keys() == expected.keys()
+    for key, value in expected.items():
+        atol = 0
+        if isinstance(key, str) and key.startswith("Mean"):
+            # Mean values are (close to) zero after detrending
+            atol = 1e-6 * expected[key.replace("Mean", "RMS")]
+        assert_allclose(result[key], value, rtol=1e-5, atol=atol)
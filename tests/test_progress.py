@@ -0,0 +1,219 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from topobank_statistics.progress import (ProgressAggregator, ProgressRelay,
+                                          get_progress, get_progress_many,
+                                          progress_relay, publish_progress)
+from topobank_statistics.views import _progress_events
+
+
+class RecordingProgressRecorder:
+    def __init__(self):
+        self.calls = []
+
+    def set_progress(self, current, total):
+        self.calls.append((current, total))
+
+
+def test_progress_relay_throttles_database_writes(settings):
+    settings.TOPOBANK_STATISTICS_PROGRESS_PUBLISH_INTERVAL = 0
+    settings.TOPOBANK_STATISTICS_PROGRESS_DB_INTERVAL = 3600
+    settings.TOPOBANK_STATISTICS_PROGRESS_MIN_DELTA = 0
+    recorder = RecordingProgressRecorder()
+    relay = ProgressRelay(1234, recorder)
+
+    for i in range(100):
+        relay.set_progress(i, 100)
+        # Every callback is published to the cache...
+        assert get_progress(1234) == dict(current=i, total=100)
+    relay.set_progress(100, 100)
+
+    # ...but only the first and the final one hit the database
+    assert recorder.calls == [(0, 100), (100, 100)]
+    assert get_progress(1234) == dict(current=100, total=100)
+
+
+def test_progress_relay_without_analysis_id(settings):
+    settings.TOPOBANK_STATISTICS_PROGRESS_DB_INTERVAL = 0
+    recorder = RecordingProgressRecorder()
+    relay = ProgressRelay(None, recorder)
+    relay.set_progress(1, 2)
+    relay.set_progress(2, 2)
+    assert recorder.calls == [(1, 2), (2, 2)]
+
+
+def test_progress_relay_throttles_small_increments(settings):
+    settings.TOPOBANK_STATISTICS_PROGRESS_PUBLISH_INTERVAL = 0
+    settings.TOPOBANK_STATISTICS_PROGRESS_DB_INTERVAL = 0
+    settings.TOPOBANK_STATISTICS_PROGRESS_MIN_DELTA = 0.25
+    recorder = RecordingProgressRecorder()
+    relay = ProgressRelay(1234, recorder)
+
+    for i in range(10):
+        relay.set_progress(i, 10)
+    assert recorder.calls == [(0, 10), (3, 10), (6, 10), (9, 10)]
+    assert get_progress(1234) == dict(current=9, total=10)
+
+
+def test_progress_relay_flush(settings):
+    settings.TOPOBANK_STATISTICS_PROGRESS_PUBLISH_INTERVAL = 3600
+    settings.TOPOBANK_STATISTICS_PROGRESS_DB_INTERVAL = 3600
+    recorder = RecordingProgressRecorder()
+    relay = ProgressRelay(1234, recorder)
+
+    relay.flush()
+    assert recorder.calls == []
+    relay.set_progress(1, 10)
+    relay.set_progress(7, 10)
+    assert recorder.calls == [(1, 10)]
+    assert get_progress(1234) == dict(current=1, total=10)
+
+    # Progress held back by the throttling is written once
+    relay.flush()
+    relay.flush()
+    assert recorder.calls == [(1, 10), (7, 10)]
+    assert get_progress(1234) == dict(current=7, total=10)
+
+
+def test_progress_relay_context_flushes_on_error(settings):
+    settings.TOPOBANK_STATISTICS_PROGRESS_DB_INTERVAL = 3600
+    recorder = RecordingProgressRecorder()
+
+    class Analysis:
+        id = 1234
+
+    with pytest.raises(RuntimeError):
+        with progress_relay(Analysis(), recorder) as relay:
+            relay.set_progress(1, 10)
+            relay.set_progress(5, 10)
+            raise RuntimeError
+    assert recorder.calls == [(1, 10), (5, 10)]
+
+    with progress_relay(None, None) as relay:
+        assert relay is None
+
+
+async def _collect(generator):
+    return [event async for event in generator]
+
+
+def test_progress_events_finish_with_done_event(settings):
+    settings.TOPOBANK_STATISTICS_PROGRESS_POLL_INTERVAL = 0
+    publish_progress(1, 3, 6)
+    task_states = {1: "su", 2: "fa"}
+
+    events = async_to_sync(_collect)(_progress_events(task_states, dict))
+
+    assert len(events) == 2
+    assert events[0].startswith("data: ")
+    assert json.loads(events[0][len("data: "):]) == [
+        dict(id=1, task_state="su", progress=dict(current=3, total=6)),
+        dict(id=2, task_state="fa", progress=None),
+    ]
+    assert events[1].startswith("event: done")
+
+
+def test_progress_events_stop_after_max_duration(settings):
+    settings.TOPOBANK_STATISTICS_PROGRESS_POLL_INTERVAL = 0
+    settings.TOPOBANK_STATISTICS_PROGRESS_STREAM_DURATION = 0
+    events = async_to_sync(_collect)(_progress_events({3: "st"}, dict))
+
+    assert len(events) == 1
+    assert json.loads(events[0][len("data: "):])[0]["task_state"] == "st"
+
+
+def test_progress_events_refresh_pending_task_states(settings):
+    settings.TOPOBANK_STATISTICS_PROGRESS_POLL_INTERVAL = 0
+    settings.TOPOBANK_STATISTICS_PROGRESS_STATE_INTERVAL = 0
+    queries = []
+
+    def fetch_task_states(ids):
+        # A single query for all pending analyses per refresh
+        queries.append(sorted(ids))
+        return {analysis_id: "su" for analysis_id in ids}
+
+    events = async_to_sync(_collect)(
+        _progress_events({4: "su", 5: "st", 6: "pe"}, fetch_task_states)
+    )
+
+    assert queries == [[5, 6]]
+    assert [state["task_state"] for state in json.loads(events[0][len("data: "):])] == [
+        "su",
+        "su",
+        "su",
+    ]
+    assert events[-1].startswith("event: done")
+
+
+def test_get_progress_many():
+    publish_progress(7, 1, 2)
+    publish_progress(8, 2, 2)
+    assert get_progress_many([7, 8, 9]) == {
+        7: dict(current=1, total=2),
+        8: dict(current=2, total=2),
+    }
+
+
+def test_progress_aggregator_clamps_and_is_monotonic():
+    recorder = RecordingProgressRecorder()
+    progress = ProgressAggregator(recorder, 2)
+    callback = progress.callback()
+
+    callback(0, 4)
+    callback(2, 4)
+    callback(1, 4)  # going backwards is not reported
+    callback(5, 4)  # more than 100% is clamped
+
+    assert recorder.calls == [(0, 2), (1, 2), (2, 2)]
+
+
+def test_progress_aggregator_nested_phases():
+    recorder = RecordingProgressRecorder()
+    progress = ProgressAggregator(recorder, 3)
+
+    for _ in range(3):
+        direction = progress.phase(total=2)
+        reliable, unreliable = direction.phase(), direction.phase()
+        reliable(1, 2)
+        reliable(2, 2)
+        unreliable(1, 2)
+        unreliable(2, 2)
+
+    assert recorder.calls == [
+        (0.25, 3),
+        (0.5, 3),
+        (0.75, 3),
+        (1.0, 3),
+        (1.25, 3),
+        (1.5, 3),
+        (1.75, 3),
+        (2.0, 3),
+        (2.25, 3),
+        (2.5, 3),
+        (2.75, 3),
+        (3.0, 3),
+    ]
+
+
+def test_progress_aggregator_does_not_throttle(settings):
+    settings.TOPOBANK_STATISTICS_PROGRESS_PUBLISH_INTERVAL = 3600
+    recorder = RecordingProgressRecorder()
+    progress = ProgressAggregator(recorder, 1)
+    callback = progress.callback()
+
+    for i in range(1001):
+        callback(i, 1000)
+
+    # Throttling is left to the `ProgressRelay` wrapping the recorder
+    assert len(recorder.calls) == 1001
+    assert recorder.calls[-1] == (1, 1)
+
+
+def test_progress_aggregator_without_recorder():
+    progress = ProgressAggregator(None, 2)
+    assert progress.callback() is None
+    progress.phase()(1, 2)
+    progress.finish()
+    assert progress.reported is None
@@ -0,0 +1,108 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from topobank.manager.models import Topography
+from topobank.testing.factories import TopographyAnalysisFactory
+
+from topobank_statistics.management.commands import recompute_statistics
+from topobank_statistics.models import RecomputeCheckpoint
+from topobank_statistics.version import __version__
+from topobank_statistics.workflows import RoughnessParameters
+
+WORKFLOW = "topobank_statistics.roughness_parameters"
+
+
+@pytest.fixture
+def renewed(monkeypatch):
+    """Records analyses renewed by the command instead of submitting tasks."""
+    renewed = []
+
+    def renew_existing_analysis(analysis, use_default_kwargs=False):
+        assert not use_default_kwargs
+        renewed.append((analysis.pk, analysis.kwargs))
+
+    monkeypatch.setattr(
+        recompute_statistics, "renew_existing_analysis", renew_existing_analysis
+    )
+    return renewed
+
+
+@pytest.fixture
+def analyses(two_topos):  # noqa: F811
+    return [
+        TopographyAnalysisFactory(subject_topography=topography, workflow_name=WORKFLOW)
+        for topography in Topography.objects.order_by("pk")
+    ]
+
+
+@pytest.mark.django_db
+def test_recompute_statistics(analyses, renewed):
+    call_command("recompute_statistics", WORKFLOW, run="test", batch_size=1)
+    checkpoint = RecomputeCheckpoint.objects.get(run="test", workflow=WORKFLOW)
+    assert checkpoint.finished
+    assert checkpoint.nb_computed == len(analyses)
+    assert [pk for pk, _ in renewed] == [analysis.pk for analysis in analyses]
+
+    # A finished run is not repeated
+    call_command("recompute_statistics", WORKFLOW, run="test")
+    assert len(renewed) == len(analyses)
+
+    # Resume an interrupted run after the first analysis
+    RecomputeCheckpoint.objects.filter(run="test").update(
+        finished=False, last_pk=analyses[0].pk
+    )
+    call_command("recompute_statistics", WORKFLOW, run="test")
+    checkpoint.refresh_from_db()
+    assert checkpoint.finished
+    assert [pk for pk, _ in renewed[len(analyses):]] == [
+        analysis.pk for analysis in analyses[1:]
+    ]
+
+
+@pytest.mark.django_db
+def test_recompute_statistics_selects_outdated_analyses(
+    analyses, renewed, monkeypatch
+):
+    monkeypatch.setattr(
+        recompute_statistics, "_plugin_version", lambda analysis: __version__
+    )
+    current = RoughnessParameters.Parameters().model_dump()
+    for analysis in analyses:
+        analysis.kwargs = current
+        analysis.save()
+    # Parameters of the first analysis predate the current workflow
+    analyses[0].kwargs = {}
+    analyses[0].save()
+
+    call_command("recompute_statistics", WORKFLOW, run="test")
+    checkpoint = RecomputeCheckpoint.objects.get(run="test", workflow=WORKFLOW)
+    assert checkpoint.nb_computed == 1
+    assert checkpoint.nb_skipped == len(analyses) - 1
+    # Renewed with its own parameters, completed by the current defaults
+    assert renewed == [(analyses[0].pk, current)]
+
+    # All analyses are renewed with `--force`
+    call_command("recompute_statistics", WORKFLOW, run="forced", force=True)
+    assert len(renewed) == 1 + len(analyses)
+
+
+@pytest.mark.django_db
+def test_recompute_statistics_after_upgrade(analyses, renewed, monkeypatch):
+    call_command("recompute_statistics", WORKFLOW, run="test")
+    assert len(renewed) == len(analyses)
+
+    # Runs of an older version start over
+    monkeypatch.setattr(recompute_statistics, "__version__", "99.0.0")
+    call_command("recompute_statistics", WORKFLOW, run="test")
+    checkpoint = RecomputeCheckpoint.objects.get(run="test", workflow=WORKFLOW)
+    assert checkpoint.version == "99.0.0"
+    assert checkpoint.finished
+    assert len(renewed) == 2 * len(analyses)
+
+
+@pytest.mark.django_db
+def test_recompute_statistics_errors():
+    with pytest.raises(CommandError):
+        call_command("recompute_statistics", "topobank_statistics.unknown")
+    with pytest.raises(CommandError):
+        call_command("recompute_statistics", WORKFLOW, batch_size=0)
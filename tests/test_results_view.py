@@ -1,12 +1,18 @@
+import json
+
 import numpy as np
 import pytest
+from asgiref.sync import async_to_sync
 from topobank.analysis.models import Workflow
 from topobank.manager.utils import subjects_to_base64
 from topobank.testing.factories import (SurfaceFactory, Topography2DFactory,
                                         TopographyAnalysisFactory)
 
+from topobank_statistics.sparse import histogram_series
 from topobank_statistics.views import (NUM_SIGNIFICANT_DIGITS_RMS_VALUES,
-                                       roughness_parameters_card_view)
+                                       distribution_card_view,
+                                       roughness_parameters_card_view,
+                                       roughness_parameters_card_view_async)
 
 
 @pytest.mark.urls("test_urls")
@@ -156,3 +162,134 @@ def test_roughness_params_rounded(
     # assert b"0.9" in response.content
     # assert b"-1.5679" in response.content
     # assert b"NaN" in response.content
+
+
+@pytest.mark.urls("test_urls")
+@pytest.mark.django_db(transaction=True)
+def test_roughness_params_async_view_matches_sync_view(
+    api_rf, mocker, user_with_plugin, handle_usage_statistics, settings
+):
+    settings.DELETE_EXISTING_FILES = True
+
+    def myfunc(*args, **kwargs):
+        return [
+            {
+                "quantity": "RMS Height",
+                "direction": None,
+                "from": "area (2D)",
+                "symbol": "Sq",
+                "value": np.float32(1.2345678),
+                "unit": "m",
+            },
+            {
+                "quantity": "RMS Slope",
+                "direction": "y",
+                "from": "profile (1D)",
+                "symbol": "S&Delta;q",
+                "value": np.float32("nan"),
+                "unit": 1,
+            },
+        ]
+
+    m = mocker.patch(
+        "topobank.analysis.models.Workflow.eval",
+        new_callable=mocker.PropertyMock,
+    )
+    m.return_value = myfunc
+
+    surf = SurfaceFactory(created_by=user_with_plugin)
+    topos = [Topography2DFactory(size_x=1, size_y=1, surface=surf) for _ in range(3)]
+
+    func = Workflow(name="topobank_statistics.roughness_parameters")
+    for topo in topos:
+        TopographyAnalysisFactory(subject_topography=topo, workflow_name=func.name)
+
+    def make_request():
+        request = api_rf.get(
+            f"/plugins/statistics/card/roughness-parameters/{func.name}",
+            {"workflow": func.name, "subjects": subjects_to_base64(topos)},
+        )
+        request.user = user_with_plugin
+        request.session = {}
+        return request
+
+    sync_response = roughness_parameters_card_view(make_request())
+    assert sync_response.status_code == 200
+
+    async_response = async_to_sync(roughness_parameters_card_view_async)(
+        make_request()
+    )
+    assert async_response.status_code == 200
+    assert async_response["Content-Type"] == "application/json"
+
+    async_data = json.loads(async_response.content)
+    assert len(async_data["tableData"]) == 2 * len(topos)
+    assert sorted(async_data["tableData"], key=json.dumps) == sorted(
+        json.loads(json.dumps(sync_response.data["tableData"])), key=json.dumps
+    )
+    assert async_data.keys() == sync_response.data.keys()
+
+
+@pytest.mark.urls("test_urls")
+@pytest.mark.django_db
+def test_roughness_params_async_view_uses_drf_handling(api_rf, user_with_plugin):
+    func = Workflow(name="topobank_statistics.roughness_parameters")
+    url = f"/plugins/statistics/card/roughness-parameters-async/{func.name}"
+
+    # Only GET is allowed
+    request = api_rf.post(url, {"workflow": func.name})
+    request.user = user_with_plugin
+    request.session = {}
+    response = async_to_sync(roughness_parameters_card_view_async)(request)
+    assert response.status_code == 405
+
+
+@pytest.mark.urls("test_urls")
+@pytest.mark.django_db
+def test_distribution_card_view_expands_sparse_series(
+    api_rf, mocker, user_with_plugin, handle_usage_statistics, settings
+):
+    settings.DELETE_EXISTING_FILES = True
+
+    bin_edges = np.linspace(-1, 1, 1001)
+    hist = np.zeros(1000)
+    hist[[3, 500, 998]] = [0.1, 2.0, 0.3]
+
+    def myfunc(*args, **kwargs):
+        return dict(
+            name="Height distribution",
+            scalars={},
+            series=[
+                histogram_series("Height distribution", bin_edges, hist, sparse=True)
+            ],
+            alerts=[],
+        )
+
+    m = mocker.patch(
+        "topobank.analysis.models.Workflow.eval",
+        new_callable=mocker.PropertyMock,
+    )
+    m.return_value = myfunc
+
+    surf = SurfaceFactory(created_by=user_with_plugin)
+    topo = Topography2DFactory(size_x=1, size_y=1, surface=surf)
+
+    func = Workflow(name="topobank_statistics.height_distribution")
+    TopographyAnalysisFactory(subject_topography=topo, workflow_name=func.name)
+
+    request = api_rf.get(
+        f"/plugins/statistics/card/distribution/{func.name}",
+        {"workflow": func.name, "subjects": subjects_to_base64([topo])},
+    )
+    request.user = user_with_plugin
+    request.session = {}
+
+    response = distribution_card_view(request)
+    assert response.status_code == 200
+
+    (result,) = response.data["results"]
+    assert result["subject_name"] == topo.name
+    (series,) = result["series"]
+    assert "bins" not in series and "edges" not in series
+    np.testing.assert_allclose(series["x"], (bin_edges[:-1] + bin_edges[1:]) / 2)
+    np.testing.assert_allclose(series["y"], hist)
@@ -0,0 +1,136 @@
+import pickle
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from SurfaceTopography import Topography
+from SurfaceTopography.Generation import fourier_synthesis
+
+from topobank_statistics.reducers import (Gradient, HalfLaplacian, MeanSquareX,
+                                          MeanSquareY, Reducer, get_reducer)
+from topobank_statistics.scale_dependent import (DEFAULT_MULTIGRID_TOLERANCE,
+                                                 coarsen,
+                                                 scale_dependent_statistics)
+
+REFERENCE_REDUCERS = [
+    (MeanSquareX(), lambda x, y: np.mean(x * x)),
+    (MeanSquareY(), lambda x, y: np.mean(y * y)),
+    (Gradient(), lambda x, y: np.mean(x * x + y * y)),
+    (HalfLaplacian(), lambda x, y: np.mean((x + y) ** 2 / 4)),
+]
+
+
+@pytest.mark.parametrize("nb_grid_pts", [(64, 48), (128,)])
+@pytest.mark.parametrize("n", [1, 2])
+@pytest.mark.parametrize("tip_radius", [None, 2])
+def test_scale_dependent_statistics_matches_separate_evaluation(
+    nb_grid_pts, n, tip_radius
+):
+    info = {}
+    if tip_radius is not None:
+        info = dict(
+            instrument=dict(
+                parameters=dict(tip_radius=dict(value=tip_radius, unit="um"))
+            )
+        )
+    np.random.seed(0)
+    t = fourier_synthesis(
+        nb_grid_pts, nb_grid_pts, 0.8, rms_height=1, unit="um", info=info,
+        periodic=False
+    )
+    if t.dim == 2:
+        funcs = [
+            lambda x, y=None: np.mean(x * x),
+            lambda x, y: np.mean(y * y),
+            lambda x, y: np.mean(x * x + y * y),
+        ]
+    else:
+        funcs = [lambda x, y=None: np.mean(x * x)]
+
+    distances, values, reliable = scale_dependent_statistics(
+        t, funcs, n=n, nb_points_per_decade=10
+    )
+
+    assert len(values) == len(funcs)
+    if tip_radius is None:
+        assert reliable.all()
+    else:
+        assert 0 < reliable.sum() < len(reliable)
+    for func, v in zip(funcs, values):
+        d, expected = t.scale_dependent_statistical_property(
+            func, n=n, reliable=False, nb_points_per_decade=10
+        )
+        assert_allclose(distances, d)
+        assert_allclose(v, expected)
+        d, expected = t.scale_dependent_statistical_property(
+            func, n=n, nb_points_per_decade=10
+        )
+        assert_allclose(distances[reliable], d)
+        assert_allclose(v[reliable], expected)
+
+
+@pytest.mark.parametrize("reducer,reference", REFERENCE_REDUCERS)
+def test_reducers_match_reference(reducer, reference):
+    np.random.seed(1)
+    x = np.random.normal(size=(13, 7))
+    y = np.random.normal(size=(13, 7))
+    assert_allclose(reducer(x, y), reference(x, y))
+
+    # Masked derivatives: only points defined in both directions contribute
+    # to combined reducers
+    x = np.ma.masked_array(x, mask=np.random.random(x.shape) < 0.2)
+    y = np.ma.masked_array(y, mask=np.random.random(y.shape) < 0.2)
+    assert_allclose(reducer(x, y), reference(x, y))
+
+    # SurfaceTopography passes NaN for distances without data
+    assert np.isnan(reducer(np.nan, np.nan))
+
+
+def test_reducers_are_picklable_and_named():
+    for reducer, _ in REFERENCE_REDUCERS:
+        assert pickle.loads(pickle.dumps(reducer)) == reducer
+        assert get_reducer(reducer.name) == reducer
+    assert MeanSquareX()(np.array([1.0, 3.0])) == 5.0
+    with pytest.raises(ValueError):
+        get_reducer("unknown")
+    with pytest.raises(TypeError):
+        Reducer()
+
+
+def test_coarsen():
+    t = Topography(np.arange(16.0).reshape(4, 4), (2, 3), periodic=True, unit="nm")
+    c = coarsen(t)
+    assert c.nb_grid_pts == (2, 2)
+    assert c.physical_sizes == t.physical_sizes
+    assert c.is_periodic
+    assert_allclose(c.heights(), [[2.5, 4.5], [10.5, 12.5]])
+    assert coarsen(Topography(np.zeros((4, 3)), (1, 1))) is None
+
+
+@pytest.mark.parametrize("nb_grid_pts", [(256, 256), (4096,)])
+def test_scale_dependent_statistics_multigrid(nb_grid_pts):
+    np.random.seed(0)
+    t = fourier_synthesis(
+        nb_grid_pts, nb_grid_pts, 0.8, rms_height=1, unit="um", periodic=False,
+        short_cutoff=8
+    )
+    funcs = [MeanSquareX(), MeanSquareY(), Gradient()] if t.dim == 2 else [MeanSquareX()]
+    distances, values, _ = scale_dependent_statistics(t, funcs)
+    progress = []
+    mg_distances, mg_values, _ = scale_dependent_statistics(
+        t, funcs, multigrid=True, progress_callback=lambda i, n: progress.append(i / n)
+    )
+    assert_allclose(mg_distances, distances)
+    # Within tolerance away from the scan size
+    short = distances < nb_grid_pts[0] / 4
+    for v, mg_v in zip(values, mg_values):
+        assert_allclose(mg_v[short], v[short], rtol=DEFAULT_MULTIGRID_TOLERANCE)
+    assert progress == sorted(progress)
+    assert progress[-1] == 1
+
+    # Coarsening is rejected if it violates the tolerance
+    _, mg_values, _ = scale_dependent_statistics(
+        t, funcs, multigrid=True, multigrid_tolerance=0
+    )
+    for v, mg_v in zip(values, mg_values):
+        assert_allclose(mg_v, v)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+from SurfaceTopography import Topography
+from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
+
+from topobank_statistics.sparse import (decode_bin_edges, encode_bin_edges,
+                                        expand_result, expand_series,
+                                        histogram_series, is_sparse)
+from topobank_statistics.workflows import (CurvatureDistribution,
+                                           HeightDistribution,
+                                           SlopeDistribution)
+
+
+@pytest.mark.parametrize(
+    "bin_edges",
+    [
+        np.histogram_bin_edges(np.random.normal(size=100), bins=50),
+        np.array([-1e3, -1.0, 0.0, 0.5, 2.0]),
+        np.arange(-3, 5) * 0.125,
+    ],
+)
+def test_bin_edges_roundtrip(bin_edges):
+    assert_array_equal(decode_bin_edges(encode_bin_edges(bin_edges)), bin_edges)
+
+
+def test_expand_series():
+    bin_edges = np.linspace(-1, 1, 1001)
+    hist = np.zeros(1000)
+    hist[[3, 500, 998]] = [0.1, 2.0, 0.3]
+
+    dense = histogram_series("Distribution", bin_edges, hist)
+    sparse = histogram_series("Distribution", bin_edges, hist, sparse=True)
+    assert not is_sparse(dense)
+    assert is_sparse(sparse)
+    assert len(sparse["x"]) == len(sparse["y"]) == 3
+    assert isinstance(sparse["edges"], dict)
+
+    expanded = expand_series(sparse)
+    assert not is_sparse(expanded)
+    assert expanded["name"] == "Distribution"
+    assert_array_equal(expanded["x"], dense["x"])
+    assert_array_equal(expanded["y"], dense["y"])
+    assert expand_series(dense) is dense
+
+    # Results without series (e.g. roughness parameters) are left unchanged
+    result = [dict(quantity="RMS height", value=1.0)]
+    assert expand_result(result) is result
+
+
+@pytest.mark.parametrize(
+    "workflow,bins",
+    [
+        (HeightDistribution, 1000),
+        (SlopeDistribution, 1000),
+        (CurvatureDistribution, 1000),
+        (CurvatureDistribution, list(np.linspace(-1e3, 1e3, 5001))),
+    ],
+)
+def test_sparse_distribution_workflows(workflow, bins):
+    np.random.seed(0)
+    heights = np.random.normal(size=(32, 24))
+    heights[3, 4] = 100
+    t = Topography(heights, (2, 3), unit="nm")
+    analysis = AnalysisResultMock(FakeTopographyModel(t))
+
+    dense = workflow(bins=bins).topography_implementation(analysis)
+    sparse = workflow(bins=bins, sparse=True).topography_implementation(analysis)
+
+    assert dense["scalars"] == sparse["scalars"]
+    for dense_series, sparse_series in zip(dense["series"], sparse["series"]):
+        assert len(sparse_series["y"]) <= len(dense_series["y"])
+    expanded = expand_result(sparse)
+    for dense_series, expanded_series in zip(dense["series"], expanded["series"]):
+        assert dense_series["name"] == expanded_series["name"]
+        assert_allclose(expanded_series["x"], dense_series["x"])
+        assert_array_equal(expanded_series["y"], dense_series["y"])
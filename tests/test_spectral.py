@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+from SurfaceTopography.Generation import fourier_synthesis
+
+from topobank_statistics import spectral
+
+TIP_RADIUS_INFO = dict(
+    instrument=dict(parameters=dict(tip_radius=dict(value=2, unit="um")))
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_spectral_cache():
+    yield
+    cache = spectral.spectral_cache()
+    if cache is not None:
+        cache.clear()
+
+
+@pytest.mark.parametrize("periodic", [True, False])
+@pytest.mark.parametrize("nb_grid_pts", [(64, 48), (127,)])
+@pytest.mark.parametrize("info", [{}, TIP_RADIUS_INFO])
+@pytest.mark.parametrize("reliable", [True, False])
+def test_spectral_matches_surface_topography(
+    settings, periodic, nb_grid_pts, info, reliable
+):
+    settings.TOPOBANK_STATISTICS_SPECTRAL_CACHE_SIZE = 2**20
+    np.random.seed(0)
+    t = fourier_synthesis(
+        nb_grid_pts, nb_grid_pts, 0.8, rms_height=1, unit="um", info=info,
+        periodic=periodic
+    )
+    names = ["autocorrelation_from_profile"]
+    if t.dim == 2:
+        names += ["autocorrelation_from_area"]
+    for name in names:
+        r, A = getattr(spectral, name)(t, reliable=reliable)
+        r_ref, A_ref = getattr(t, name)(reliable=reliable)
+        assert_allclose(r, r_ref)
+        assert_allclose(A, A_ref, atol=1e-12)
+
+    names = ["power_spectrum_from_profile"]
+    if t.dim == 2:
+        names += ["power_spectrum_from_area"]
+    for name in names:
+        for window in [None, "None", "hann"]:
+            q, C = getattr(spectral, name)(t, window=window, reliable=reliable)
+            q_ref, C_ref = getattr(t, name)(window=window, reliable=reliable)
+            assert_allclose(q, q_ref)
+            assert_allclose(C, C_ref)
+
+
+@pytest.mark.parametrize("periodic", [True, False])
+@pytest.mark.parametrize("nb_grid_pts", [(64, 48), (127,)])
+def test_spectral_without_cache_calls_surface_topography(
+    monkeypatch, periodic, nb_grid_pts
+):
+    np.random.seed(0)
+    t = fourier_synthesis(
+        nb_grid_pts, nb_grid_pts, 0.8, rms_height=1, periodic=periodic
+    )
+    names = ["power_spectrum_from_profile", "autocorrelation_from_profile"]
+    if t.dim == 2:
+        names += ["power_spectrum_from_area", "autocorrelation_from_area"]
+    for name in names:
+        x_ref, y_ref = getattr(t, name)(reliable=False)
+        calls = []
+
+        def upstream(*args, _func=getattr(t, name), **kwargs):
+            calls.append(kwargs)
+            return _func(*args, **kwargs)
+
+        monkeypatch.setattr(t, name, upstream)
+        x, y = getattr(spectral, name)(t, reliable=False)
+        assert len(calls) == 1
+        assert_array_equal(x, x_ref)
+        assert_array_equal(y, y_ref)
+
+
+def test_spectral_transforms_are_reused(monkeypatch, settings):
+    settings.TOPOBANK_STATISTICS_SPECTRAL_CACHE_SIZE = 2**20
+    np.random.seed(0)
+    t = fourier_synthesis((32, 16), (1, 1), 0.8, rms_height=1, periodic=True)
+
+    nb_calls = {"fft": 0, "fft2": 0}
+    for name in nb_calls:
+        func = getattr(np.fft, name)
+
+        def counting(*args, _name=name, _func=func, **kwargs):
+            nb_calls[_name] += 1
+            return _func(*args, **kwargs)
+
+        monkeypatch.setattr(np.fft, name, counting)
+
+    for reliable in [True, False]:
+        spectral.power_spectrum_from_profile(t, reliable=reliable)
+        spectral.power_spectrum_from_area(t, reliable=reliable)
+    assert nb_calls == {"fft": 1, "fft2": 1}
+
+    # ACF of a periodic topography is derived from the same transforms
+    for reliable in [True, False]:
+        spectral.autocorrelation_from_profile(t, reliable=reliable)
+        spectral.autocorrelation_from_area(t, reliable=reliable)
+    assert nb_calls == {"fft": 1, "fft2": 1}
+
+    # Identical heights in a different object hit the cache
+    spectral.power_spectrum_from_profile(t.scale(1.0))
+    assert nb_calls == {"fft": 1, "fft2": 1}
+
+
+def test_spectral_cache_bounded_and_disabled(settings):
+    # Disabled by default
+    assert spectral.spectral_cache() is None
+
+    cache = spectral.SpectralCache(100)
+    cache.get_or_compute("a", lambda: np.zeros(8))
+    cache.get_or_compute("b", lambda: np.zeros(8))
+    assert len(cache) == 1
+    # Entries larger than the cache are not stored
+    value = cache.get_or_compute("c", lambda: np.zeros(100))
+    assert len(value) == 100
+    assert len(cache) == 1
+    # Cached arrays are read-only
+    with pytest.raises(ValueError):
+        cache.get_or_compute("b", lambda: None)[0] = 1
+
+    settings.TOPOBANK_STATISTICS_SPECTRAL_CACHE_SIZE = 100
+    assert spectral.spectral_cache() is not None
+    settings.TOPOBANK_STATISTICS_SPECTRAL_CACHE_SIZE = 0
+    assert spectral.spectral_cache() is None
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+from SurfaceTopography.Exceptions import ReentrantDataError
+from topobank.testing.utils import AnalysisResultMock, FakeTopographyModel
+
+from topobank_statistics.testing.synthetic import (masked_topography,
+                                                  nonuniform_line_scan,
+                                                  reentrant_line_scan,
+                                                  self_affine_topography,
+                                                  synthetic_surface)
+from topobank_statistics.workflows import (HeightDistribution,
+                                           RoughnessParameters,
+                                           SlopeDistribution)
+
+
+@pytest.mark.parametrize("nb_grid_pts", [(1024,), (64, 48)])
+def test_self_affine_topography(nb_grid_pts):
+    np.random.seed(123)
+    state = np.random.get_state()
+    t = self_affine_topography(nb_grid_pts, hurst=0.7, rms_height=2e-9, seed=4)
+    # The global random state is not modified
+    assert_array_equal(np.random.get_state()[1], state[1])
+
+    assert t.nb_grid_pts == nb_grid_pts
+    assert t.unit == "m"
+    assert_allclose(t.physical_sizes, [1e-9 * n for n in nb_grid_pts])
+    assert_array_equal(
+        t.heights(), self_affine_topography(nb_grid_pts, hurst=0.7, rms_height=2e-9, seed=4).heights()
+    )
+    assert not np.array_equal(
+        t.heights(), self_affine_topography(nb_grid_pts, hurst=0.7, seed=5).heights()
+    )
+
+
+def test_hurst_exponent():
+    # Smaller Hurst exponents are rougher on small scales
+    smooth = self_affine_topography((256, 256), hurst=0.9)
+    rough = self_affine_topography((256, 256), hurst=0.3)
+    assert rough.rms_gradient() > smooth.rms_gradient()
+
+
+def test_masked_topography():
+    t = masked_topography((64, 48), fraction=0.1)
+    heights = t.heights()
+    assert_allclose(np.ma.count_masked(heights) / heights.size, 0.1, atol=0.01)
+
+
+def test_nonuniform_and_reentrant_line_scans():
+    t = nonuniform_line_scan(500, length=2e-6)
+    assert not t.is_uniform
+    assert len(t.positions()) == 500
+    assert_allclose(t.physical_sizes, [2e-6])
+    assert np.all(np.diff(t.positions()) > 0)
+
+    reentrant = reentrant_line_scan(500, nb_steps=2)
+    assert len(reentrant.positions()) == 502
+    with pytest.raises(ReentrantDataError):
+        SlopeDistribution().topography_implementation(
+            AnalysisResultMock(FakeTopographyModel(reentrant))
+        )
+
+
+def test_synthetic_surface():
+    surface = synthetic_surface(3, (32, 24))
+    topographies = surface.topography_set.all()
+    assert len(topographies) == 3
+    assert not np.array_equal(
+        topographies[0].topography().heights(), topographies[1].topography().heights()
+    )
+
+    result = HeightDistribution(bins=10).surface_implementation(
+        AnalysisResultMock(surface)
+    )
+    assert result["alerts"] == []
+    result = RoughnessParameters().topography_implementation(
+        AnalysisResultMock(topographies[0])
+    )
+    assert len(result) > 0
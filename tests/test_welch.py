@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from SurfaceTopography import Topography, UniformLineScan
+from SurfaceTopography.Generation import fourier_synthesis
+
+import topobank_statistics.welch
+from topobank_statistics.welch import welch_power_spectrum
+
+
+def test_welch_single_segment_matches_power_spectrum():
+    np.random.seed(0)
+    h = np.random.normal(size=257)
+    t = UniformLineScan(h, 2.57, unit="um")
+
+    q, C = welch_power_spectrum(t, 256, overlap=0)
+
+    segment = h[:256] - h[:256].mean()
+    q_ref, C_ref = UniformLineScan(segment, 2.56, unit="um").power_spectrum_from_profile(
+        window="hann"
+    )
+    assert_allclose(q, q_ref)
+    assert_allclose(C, C_ref)
+
+
+def test_welch_short_topography_falls_back():
+    t = UniformLineScan(np.sin(np.arange(100.0)), 10, periodic=True)
+    q, C = welch_power_spectrum(t, 128)
+    q_ref, C_ref = t.power_spectrum_from_profile()
+    assert_allclose(q, q_ref)
+    assert_allclose(C, C_ref)
+
+
+def test_welch_agrees_with_full_power_spectrum(monkeypatch):
+    np.random.seed(0)
+    t = fourier_synthesis(
+        (2**16,), (2**16,), 0.8, rms_height=1, periodic=False, long_cutoff=2**10
+    )
+    q_ref, C_ref = t.power_spectrum_from_profile()
+    q, C = welch_power_spectrum(t, 2**10)
+
+    # Averaged spectrum is statistically equivalent away from the lowest
+    # (segment-size) wavevectors
+    mask = q > 10 * q[0]
+    assert_allclose(C[mask], np.interp(q[mask], q_ref, C_ref), rtol=0.3)
+
+    # Parallel processing of chunks yields the same result
+    monkeypatch.setattr(topobank_statistics.welch, "CHUNK_SIZE", 2**12)
+    q_parallel, C_parallel = welch_power_spectrum(t, 2**10, workers=4)
+    assert_allclose(q_parallel, q)
+    assert_allclose(C_parallel, C)
+
+
+def test_welch_map_averages_profiles():
+    np.random.seed(0)
+    h = np.random.normal(size=(1000, 3))
+    q, C = welch_power_spectrum(Topography(h, (10, 3)), 128)
+    profiles = [
+        welch_power_spectrum(UniformLineScan(h[:, i], 10), 128) for i in range(3)
+    ]
+    for q_profile, _ in profiles:
+        assert_allclose(q_profile, q)
+    assert_allclose(C, np.mean([C_profile for _, C_profile in profiles], axis=0))
+
+
+def test_welch_invalid_arguments():
+    t = Topography(np.zeros((64, 4)), (1, 1))
+    with pytest.raises(ValueError):
+        welch_power_spectrum(t, 16, overlap=1)
+    with pytest.raises(ValueError):
+        welch_power_spectrum(t, 1)
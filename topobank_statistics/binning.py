@@ -0,0 +1,166 @@
+"""
+Robust binning of distributions.
+
+With uniform binning (the default), histograms span the full range of the
+data. A few extreme values (e.g. slopes at overhangs, see
+`_chauvenet_outlier_mask` in `workflows`) then stretch the range such that
+almost all values fall into a few bins. Robust binning instead spans the
+range between the `ROBUST_QUANTILE` and `1 - ROBUST_QUANTILE` quantiles of
+the valid values with bins of the Freedman-Diaconis width (bounded by a
+maximum number of bins), and counts values outside this range as underflow
+and overflow. Quantiles are estimated from a deterministic sample of at most
+`SAMPLE_SIZE` values, taken with a stride coprime to the row length of maps
+such that all columns are sampled; counts are accumulated in a single
+blockwise pass with `np.bincount`.
+"""
+
+import math
+
+import numpy as np
+
+from .moments import BLOCK_SIZE, iter_blocks
+
+BINNING_STRATEGIES = ["uniform", "robust"]
+
+# Fraction of values below (and above) the range of robust histograms
+ROBUST_QUANTILE = 0.005
+
+# Quantiles determining range and bin width of robust histograms
+ROBUST_QUANTILES = [ROBUST_QUANTILE, 0.25, 0.75, 1 - ROBUST_QUANTILE]
+
+# Maximum number of values used to estimate quantiles
+SAMPLE_SIZE = 2**16
+
+
+def check_binning(binning):
+    """Raise ValueError for unknown binning strategies."""
+    if binning not in BINNING_STRATEGIES:
+        raise ValueError(
+            f"Unknown binning strategy '{binning}'. Available strategies: "
+            f"{', '.join(BINNING_STRATEGIES)}"
+        )
+
+
+def sample_values(arr, count, size=SAMPLE_SIZE, block_size=BLOCK_SIZE):
+    """Return every n-th valid value of `arr` such that at most (about)
+    `size` values are returned.
+
+    For arrays with more than one dimension, n is coprime to the length of
+    the rows, such that the sample is not aligned with the rows and covers
+    all columns.
+
+    Parameters
+    ----------
+    arr: np.ndarray or np.ma.MaskedArray
+        Values
+    count: int
+        Number of valid values in `arr`
+    size: int, optional
+        Approximate number of values to return. (Default: `SAMPLE_SIZE`)
+    block_size: int, optional
+        Approximate number of values per block. (Default: `BLOCK_SIZE`)
+
+    Returns
+    -------
+    np.ndarray
+        Sample of the valid values
+    """
+    stride = max(1, count // size)
+    if np.ndim(arr) > 1:
+        # A stride sharing a divisor with the row length would only sample a
+        # subset of the columns
+        row_length = np.shape(arr)[-1]
+        while math.gcd(stride, row_length) > 1:
+            stride += 1
+    samples = []
+    position = 0
+    for block, valid in iter_blocks(arr, block_size):
+        values = (block if valid is None else block[valid]).ravel()
+        # Continue the stride across block boundaries
+        samples.append(values[(-position) % stride :: stride])
+        position += len(values)
+    return np.concatenate(samples) if samples else np.empty(0)
+
+
+def robust_bins(quantiles, moments, max_nb_bins):
+    """Range and number of bins of a robust histogram.
+
+    Parameters
+    ----------
+    quantiles: np.ndarray
+        Quantiles `ROBUST_QUANTILES` of the values
+    moments: moments.Moments
+        Moments of the values
+    max_nb_bins: int
+        Maximum number of bins
+
+    Returns
+    -------
+    lower: float
+        Lower edge of the first bin
+    upper: float
+        Upper edge of the last bin
+    nb_bins: int
+        Number of bins
+    """
+    lower, q1, q3, upper = quantiles
+    if not upper > lower:
+        # Degenerate distribution
+        lower, upper = moments.min, moments.max
+        if not upper > lower:
+            lower, upper = lower - 0.5, upper + 0.5
+
+    # Freedman-Diaconis width of bins
+    fd_width = 2 * (q3 - q1) / np.cbrt(moments.count)
+    if fd_width > 0:
+        nb_bins = int(np.clip(np.ceil((upper - lower) / fd_width), 1, max_nb_bins))
+    else:
+        nb_bins = max_nb_bins
+    return lower, upper, nb_bins
+
+
+def robust_histogram(arr, moments, max_nb_bins):
+    """Histogram of the valid values of `arr` on a robust range.
+
+    Parameters
+    ----------
+    arr: np.ndarray or np.ma.MaskedArray
+        Values
+    moments: moments.Moments
+        Moments of `arr`
+    max_nb_bins: int
+        Maximum number of bins
+
+    Returns
+    -------
+    hist: np.ndarray
+        Probability density, normalized by the number of all valid values
+        (including those outside of the range)
+    bin_edges: np.ndarray
+        Bin edges
+    nb_below: int
+        Number of values below the range
+    nb_above: int
+        Number of values above the range
+    """
+    sample = sample_values(arr, moments.count)
+    lower, upper, nb_bins = robust_bins(
+        np.quantile(sample, ROBUST_QUANTILES), moments, max_nb_bins
+    )
+    width = (upper - lower) / nb_bins
+
+    # Counts of bins with underflow (first) and overflow (last)
+    counts = np.zeros(nb_bins + 2, dtype=np.int64)
+    for block, valid in iter_blocks(arr):
+        values = block if valid is None else block[valid]
+        indices = np.floor((values - lower) / width)
+        # Upper edge belongs to the last bin, as in `np.histogram`
+        indices[values == upper] = nb_bins - 1
+        np.clip(indices, -1, nb_bins, out=indices)
+        counts += np.bincount(
+            indices.astype(np.int64).ravel() + 1, minlength=nb_bins + 2
+        )
+
+    bin_edges = np.linspace(lower, upper, nb_bins + 1)
+    hist = counts[1:-1] / (moments.count * width)
+    return hist, bin_edges, int(counts[0]), int(counts[-1])
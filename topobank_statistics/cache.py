@@ -0,0 +1,461 @@
+"""
+Versioned cache for results of statistics workflows.
+
+Results are stored in a result store shared by all workers, under a hash of
+everything that determines them:
+
+* the identity and modification fields of the topography model (see
+  `memmap.cache_key`), such that a lookup does not need to load the height
+  field,
+* the name and parameters of the workflow,
+* the settings that change the numerics of the workflows (effective
+  precision, FFT backend, spectral cache and Welch threads), and
+* the version of the plugin, such that upgrades invalidate earlier results.
+
+Results are stored with the name of the topography replaced by a
+placeholder, which is filled in after the lookup. Entries are `.npz` files
+holding the arrays of a result and a JSON document with the remaining
+structure; no pickles are loaded. The store is enabled by the
+`TOPOBANK_STATISTICS_RESULT_CACHE_DIR` setting and evicts entries that
+exceed `TOPOBANK_STATISTICS_RESULT_CACHE_MAX_AGE` (seconds) and, oldest
+first, entries beyond `TOPOBANK_STATISTICS_RESULT_CACHE_MAX_SIZE` (bytes).
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .fft_backend import resolved_backend
+from .memmap import cache_key
+from .precision import compute_dtype
+from .version import __version__
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60  # 30 days
+DEFAULT_MAX_SIZE = 10 * 1024**3  # 10 GiB
+
+# Minimum time between two scans of the store for eviction (per process)
+EVICTION_INTERVAL = 10 * 60
+
+# Version of the key and the file format of entries; increase to invalidate
+# all stored results
+RESULT_CACHE_SCHEMA = 2
+
+# Stands in for the name of the topography in stored results
+TOPOGRAPHY_NAME_PLACEHOLDER = "{{topobank_statistics:topography_name}}"
+
+
+def _update_with_array(h, arr):
+    if arr.flags.f_contiguous and not arr.flags.c_contiguous:
+        # Transposed views are hashed without copying
+        arr, order = arr.T, "F"
+    else:
+        arr, order = np.ascontiguousarray(arr), "C"
+    h.update(str((arr.dtype.str, arr.shape, order)).encode("utf-8"))
+    h.update(memoryview(arr).cast("B"))
+
+
+def topography_fingerprint(topography):
+    """Return a hash of the height data and metadata of a topography.
+
+    Parameters
+    ----------
+    topography: SurfaceTopography topography instance
+        Topography (or line scan) to fingerprint
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-256 digest.
+    """
+    h = hashlib.sha256()
+    if topography.is_uniform:
+        metadata = dict(
+            nb_grid_pts=list(topography.nb_grid_pts),
+            physical_sizes=list(topography.physical_sizes),
+            periodic=topography.is_periodic,
+        )
+    else:
+        metadata = dict(nb_grid_pts=list(topography.nb_grid_pts))
+        _update_with_array(h, topography.positions())
+    metadata.update(
+        dim=topography.dim,
+        unit=topography.unit,
+        # Instrument information determines reliability cutoffs
+        instrument=topography.info.get("instrument"),
+    )
+    h.update(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8"))
+    heights = topography.heights()
+    _update_with_array(h, np.ma.getdata(heights))
+    if np.ma.is_masked(heights):
+        _update_with_array(h, np.ma.getmaskarray(heights))
+    return h.hexdigest()
+
+
+def _parameters_dict(parameters):
+    """Return workflow parameters (a pydantic model) as a dictionary."""
+    if parameters is None:
+        return {}
+    try:
+        return parameters.model_dump()
+    except AttributeError:
+        return dict(parameters)
+
+
+def numerics_settings(parameters):
+    """Return the settings that change the numerics of a workflow.
+
+    Parameters
+    ----------
+    parameters: dict
+        Parameters of the workflow
+
+    Returns
+    -------
+    dict
+        Effective precision and resolved FFT backend, FFT threads, spectral
+        cache and Welch threads
+    """
+    fft_backend = resolved_backend(
+        getattr(settings, "TOPOBANK_STATISTICS_FFT_BACKEND", "numpy")
+    )
+    return dict(
+        precision=np.dtype(compute_dtype(parameters.get("precision"))).name,
+        fft_backend=fft_backend,
+        fft_workers=(
+            None
+            if fft_backend == "numpy"
+            else getattr(settings, "TOPOBANK_STATISTICS_FFT_WORKERS", 1)
+        ),
+        # Without the cache, spectra are computed by SurfaceTopography
+        spectral_cache=bool(
+            getattr(settings, "TOPOBANK_STATISTICS_SPECTRAL_CACHE_SIZE", 0)
+        ),
+        welch_workers=getattr(settings, "TOPOBANK_STATISTICS_WELCH_WORKERS", 1),
+    )
+
+
+def result_key(workflow_name, parameters, subject):
+    """Return the key of a workflow result in the result store.
+
+    The key includes the version of the plugin and of the store and the
+    numerics settings, but not the name of the topography, see
+    `cached_result`. It is computed without loading the topography.
+
+    Parameters
+    ----------
+    workflow_name: str
+        Name of the workflow
+    parameters: WorkflowImplementation.Parameters or dict
+        Parameters of the workflow
+    subject: topobank.manager.models.Topography
+        Topography model the workflow is run on
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-256 digest.
+    """
+    parameters = _parameters_dict(parameters)
+    h = hashlib.sha256()
+    h.update(
+        json.dumps(
+            dict(
+                schema=RESULT_CACHE_SCHEMA,
+                version=__version__,
+                workflow=workflow_name,
+                parameters=parameters,
+                numerics=numerics_settings(parameters),
+                topography=cache_key(subject),
+            ),
+            sort_keys=True,
+            default=str,
+        ).encode("utf-8")
+    )
+    return h.hexdigest()
+
+
+def _encode(obj, arrays):
+    """Return a JSON-serializable copy of `obj` with arrays replaced by
+    references into the list `arrays`."""
+    if isinstance(obj, np.ndarray) and obj.dtype != object:
+        ref = {"__ndarray__": len(arrays)}
+        arrays.append(np.ma.getdata(obj))
+        if isinstance(obj, np.ma.MaskedArray):
+            ref["__mask__"] = len(arrays)
+            arrays.append(np.ma.getmaskarray(obj))
+        return ref
+    if isinstance(obj, np.ndarray):
+        return [_encode(value, arrays) for value in obj.tolist()]
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, dict):
+        return {str(key): _encode(value, arrays) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_encode(value, arrays) for value in obj]
+    return obj
+
+
+def _decode(obj, arrays):
+    """Inverse of `_encode`."""
+    if isinstance(obj, dict):
+        if "__ndarray__" in obj:
+            arr = arrays[obj["__ndarray__"]]
+            if "__mask__" in obj:
+                arr = np.ma.masked_array(arr, mask=arrays[obj["__mask__"]])
+            return arr
+        return {key: _decode(value, arrays) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_decode(value, arrays) for value in obj]
+    return obj
+
+
+def _replace_strings(obj, old, new):
+    """Return a copy of `obj` with `old` replaced by `new` in all strings of
+    (nested) dictionaries and lists."""
+    if isinstance(obj, str):
+        return obj.replace(old, new)
+    if isinstance(obj, dict):
+        return {key: _replace_strings(value, old, new) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_replace_strings(value, old, new) for value in obj)
+    return obj
+
+
+class ResultStore:
+    """File-system store for workflow results.
+
+    Results are (nested) dictionaries and lists of JSON values and numpy
+    arrays.
+
+    Parameters
+    ----------
+    directory: str
+        Directory holding the store (may be shared between machines)
+    max_age: float, optional
+        Entries not accessed for this number of seconds are evicted.
+        (Default: 30 days)
+    max_size: int, optional
+        Total size of the store in bytes; least recently used entries are
+        evicted beyond this size. (Default: 10 GiB)
+    """
+
+    def __init__(self, directory, max_age=DEFAULT_MAX_AGE, max_size=DEFAULT_MAX_SIZE):
+        self._directory = directory
+        self._max_age = max_age
+        self._max_size = max_size
+        self._last_eviction = None
+
+    def _path(self, key):
+        return os.path.join(self._directory, key[:2], f"{key}.npz")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """Return the result stored under `key`, or None."""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = [data[f"a{i}"] for i in range(len(data.files) - 1)]
+                result = _decode(json.loads(data["result"].item()), arrays)
+        except FileNotFoundError:
+            return None
+        except Exception as exc:
+            _log.warning(f"Discarding corrupt result cache entry '{path}': {exc}")
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            return None
+        # Mark as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return result
+
+    def put(self, key, result):
+        """Store `result` under `key`."""
+        arrays = []
+        try:
+            document = json.dumps(_encode(result, arrays))
+        except (TypeError, ValueError) as exc:
+            _log.warning(f"Could not store result in result cache: {exc}")
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    result=np.array(document),
+                    **{f"a{i}": arr for i, arr in enumerate(arrays)},
+                )
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            os.unlink(tmp_path)
+            _log.warning(f"Could not store result in result cache: {exc}")
+            return
+        now = time.monotonic()
+        if self._last_eviction is None or now - self._last_eviction >= EVICTION_INTERVAL:
+            self.evict()
+            self._last_eviction = now
+
+    def evict(self):
+        """Remove entries that are too old and, oldest first, beyond the
+        maximum size of the store."""
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self._directory):
+            for filename in filenames:
+                # Pickles were written by earlier versions of the store
+                if not filename.endswith((".npz", ".pickle")):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        now = time.time()
+        total_size = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if now - mtime <= self._max_age and total_size <= self._max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+@functools.lru_cache(maxsize=None)
+def _result_store(directory, max_age, max_size):
+    return ResultStore(directory, max_age=max_age, max_size=max_size)
+
+
+def result_store():
+    """Return the configured result store, or None if caching is disabled."""
+    directory = getattr(settings, "TOPOBANK_STATISTICS_RESULT_CACHE_DIR", None)
+    if directory is None:
+        return None
+    return _result_store(
+        directory,
+        getattr(settings, "TOPOBANK_STATISTICS_RESULT_CACHE_MAX_AGE", DEFAULT_MAX_AGE),
+        getattr(
+            settings, "TOPOBANK_STATISTICS_RESULT_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE
+        ),
+    )
+
+
+class _PlaceholderSubject:
+    """Proxy for a topography model named by `TOPOGRAPHY_NAME_PLACEHOLDER`."""
+
+    name = TOPOGRAPHY_NAME_PLACEHOLDER
+
+    def __init__(self, subject):
+        self._subject = subject
+
+    def __getattr__(self, name):
+        return getattr(self._subject, name)
+
+
+class _PlaceholderAnalysis:
+    """Proxy for an analysis whose subject is a `_PlaceholderSubject`."""
+
+    def __init__(self, analysis, subject):
+        self._analysis = analysis
+        self.subject = subject
+
+    def __getattr__(self, name):
+        return getattr(self._analysis, name)
+
+
+def _compute_and_store(
+    implementation, workflow, analysis, store, key, name, *args, **kwargs
+):
+    """Compute and store a result; return it with the actual name of the
+    topography."""
+    analysis = _PlaceholderAnalysis(analysis, _PlaceholderSubject(analysis.subject))
+    result = implementation(workflow, analysis, *args, **kwargs)
+    store.put(key, result)
+    return _replace_strings(result, TOPOGRAPHY_NAME_PLACEHOLDER, name)
+
+
+def cached_result(implementation):
+    """Decorator for topography implementations of workflows that looks up
+    results in the result store before computing them.
+
+    The key is computed from the topography model, such that a hit does not
+    load the topography. The name of the topography is filled into the
+    result after the lookup.
+    """
+
+    @functools.wraps(implementation)
+    def wrapper(self, analysis, *args, **kwargs):
+        store = result_store()
+        if store is None:
+            return implementation(self, analysis, *args, **kwargs)
+
+        name = analysis.subject.name
+        key = result_key(self.Meta.name, self.kwargs, analysis.subject)
+        result = store.get(key)
+        if result is not None:
+            return _replace_strings(result, TOPOGRAPHY_NAME_PLACEHOLDER, name)
+        return _compute_and_store(
+            implementation, self, analysis, store, key, name, *args, **kwargs
+        )
+
+    return wrapper
+
+
+def refresh_result(workflow, analysis, force=False):
+    """Compute the result of a topography implementation of a workflow and
+    place it in the result store, unless it is already present.
+
+    Parameters
+    ----------
+    workflow: WorkflowImplementation
+        Workflow (with parameters) whose `topography_implementation` is
+        decorated with `cached_result`
+    analysis: topobank.analysis.models.Analysis or similar
+        Analysis with a topography as subject
+    force: bool, optional
+        Recompute the result even if it is present in the store.
+        (Default: False)
+
+    Returns
+    -------
+    bool
+        True if the result was computed, False if it was already present.
+    """
+    store = result_store()
+    if store is None:
+        raise RuntimeError(
+            "The result store is disabled; set TOPOBANK_STATISTICS_RESULT_CACHE_DIR."
+        )
+    name = analysis.subject.name
+    key = result_key(workflow.Meta.name, workflow.kwargs, analysis.subject)
+    if not force and key in store:
+        return False
+    # Bypass the lookup of `cached_result`
+    _compute_and_store(
+        workflow.topography_implementation.__wrapped__,
+        workflow,
+        analysis,
+        store,
+        key,
+        name,
+    )
+    return True
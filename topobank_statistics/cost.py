@@ -0,0 +1,207 @@
+"""
+Cost estimates of statistics workflows from topography metadata.
+
+The CPU time of the topography implementation of a workflow on a topography
+with `N` grid points is modeled as `t0 + a N + b N log2(N)` and its peak
+memory as `m0 + c N`, with coefficients per workflow and dimension (line
+scan or map) fitted by `benchmarks/workflow_costs.py`. The surface
+implementation of a workflow processes all topographies of a surface in one
+task: its CPU time is the sum and its peak memory the maximum over the
+topographies. CPU time is summed over all threads. The coefficients in
+`DEFAULT_COST_MODELS` were calibrated on a development machine; a JSON file
+written by the benchmark on the production machines can be configured with
+the `TOPOBANK_STATISTICS_COST_MODELS` setting.
+"""
+
+import json
+
+import numpy as np
+from django.conf import settings
+
+
+class CostModel:
+    """CPU time and peak memory of a workflow as a function of the number
+    of grid points.
+
+    Parameters
+    ----------
+    time_offset: float
+        Constant CPU time in seconds
+    time_linear: float
+        CPU time per grid point in seconds
+    time_nlogn: float
+        CPU time per `N log2(N)` in seconds
+    memory_offset: float
+        Constant memory in bytes
+    memory_linear: float
+        Memory per grid point in bytes
+    """
+
+    def __init__(self, time_offset, time_linear, time_nlogn, memory_offset, memory_linear):
+        self.time_offset = time_offset
+        self.time_linear = time_linear
+        self.time_nlogn = time_nlogn
+        self.memory_offset = memory_offset
+        self.memory_linear = memory_linear
+
+    def to_list(self):
+        return [
+            self.time_offset,
+            self.time_linear,
+            self.time_nlogn,
+            self.memory_offset,
+            self.memory_linear,
+        ]
+
+    def cpu_seconds(self, nb_grid_pts):
+        """CPU time in seconds for a topography with `nb_grid_pts` points."""
+        nb_grid_pts = np.asarray(nb_grid_pts, dtype=float)
+        return (
+            self.time_offset
+            + self.time_linear * nb_grid_pts
+            + self.time_nlogn * nb_grid_pts * np.log2(np.maximum(nb_grid_pts, 1))
+        )
+
+    def peak_memory(self, nb_grid_pts):
+        """Peak memory in bytes for a topography with `nb_grid_pts` points."""
+        return self.memory_offset + self.memory_linear * np.asarray(
+            nb_grid_pts, dtype=float
+        )
+
+    def __repr__(self):
+        return f"CostModel({', '.join(f'{c:.4g}' for c in self.to_list())})"
+
+
+# Coefficients (see `CostModel`) per workflow and dimension, fitted with
+# `benchmarks/workflow_costs.py`
+DEFAULT_COST_MODELS = {
+    "topobank_statistics.height_distribution": {
+        1: [0.00163, 1.59e-08, 7.61e-10, 1.28e+05, 10.5],
+        2: [0.00157, 5.65e-10, 1.45e-09, 5.01e+05, 7.68],
+    },
+    "topobank_statistics.slope_distribution": {
+        1: [0.00246, 0, 9.07e-09, 8.28e+03, 72],
+        2: [0.00443, 0, 3.46e-08, 1.5e+05, 143],
+    },
+    "topobank_statistics.curvature_distribution": {
+        1: [0.00347, 0, 1.19e-08, 1.15e+04, 80],
+        2: [0.00611, 0, 7.4e-08, 1.5e+05, 167],
+    },
+    "topobank_statistics.power_spectral_density": {
+        1: [0.00336, 1.61e-08, 6.77e-09, 4.91e+04, 41.7],
+        2: [0.0115, 0, 2.69e-08, 2.58e+04, 122],
+    },
+    "topobank_statistics.autocorrelation": {
+        1: [0.0019, 0, 4.01e-08, 4.24e+03, 80],
+        2: [0.0073, 0, 6.72e-08, 2.57e+03, 176],
+    },
+    "topobank_statistics.variable_bandwidth": {
+        1: [0.0152, 0, 1.27e-07, 1.28e+04, 90],
+        2: [0.0247, 0, 3.11e-07, 3.07e+04, 120],
+    },
+    "topobank_statistics.scale_dependent_slope": {
+        1: [0.0248, 0, 2.13e-07, 0, 496],
+        2: [0, 0, 9.83e-07, 0, 692],
+    },
+    "topobank_statistics.scale_dependent_curvature": {
+        1: [0.0355, 0, 2.86e-07, 0, 471],
+        2: [0, 0, 1.27e-06, 0, 643],
+    },
+    "topobank_statistics.roughness_parameters": {
+        1: [0.00537, 0, 1.93e-08, 1.17e+04, 72],
+        2: [0.0323, 0, 2.9e-07, 1.56e+05, 143],
+    },
+}
+
+
+def cost_models():
+    """Return cost models per workflow name and dimension.
+
+    The defaults are updated from the JSON file (as written by
+    `benchmarks/workflow_costs.py`) given by the
+    `TOPOBANK_STATISTICS_COST_MODELS` setting.
+    """
+    coefficients = {name: dict(dims) for name, dims in DEFAULT_COST_MODELS.items()}
+    path = getattr(settings, "TOPOBANK_STATISTICS_COST_MODELS", None)
+    if path is not None:
+        with open(path) as f:
+            for name, dims in json.load(f).items():
+                coefficients.setdefault(name, {}).update(
+                    {int(dim): values for dim, values in dims.items()}
+                )
+    return {
+        name: {dim: CostModel(*values) for dim, values in dims.items()}
+        for name, dims in coefficients.items()
+    }
+
+
+class CostEstimate:
+    """Accumulated cost of the tasks of a workflow."""
+
+    def __init__(self):
+        self.nb_tasks = 0
+        self.cpu_seconds = 0.0
+        self.peak_memory = 0.0
+
+    @property
+    def cpu_hours(self):
+        return self.cpu_seconds / 3600
+
+    def add(self, cpu_seconds, peak_memory):
+        """Add a task."""
+        self.nb_tasks += 1
+        self.cpu_seconds += cpu_seconds
+        self.peak_memory = max(self.peak_memory, peak_memory)
+
+
+def estimate_cost(workflows, topographies, surface_workflows=(), models=None):
+    """Estimate the cost of running workflows on topographies.
+
+    Parameters
+    ----------
+    workflows: list of str
+        Names of the workflows
+    topographies: iterable of tuple
+        Surface identifier and number of grid points (a tuple of length one
+        for line scans and two for maps) of every topography
+    surface_workflows: list of str, optional
+        Workflows whose surface implementations are also estimated (one task
+        per surface). (Default: none)
+    models: dict, optional
+        Cost models per workflow and dimension. (Default: `cost_models()`)
+
+    Returns
+    -------
+    dict
+        Maps each workflow name to a dictionary with `CostEstimate` instances
+        for the tasks of the topographies ('topography') and of the surfaces
+        ('surface', only for `surface_workflows`)
+    """
+    if models is None:
+        models = cost_models()
+    unknown = [name for name in workflows if name not in models]
+    if unknown:
+        raise ValueError(f"No cost model for workflows: {', '.join(unknown)}")
+
+    estimates = {name: {"topography": CostEstimate()} for name in workflows}
+    # CPU time and peak memory per workflow and surface
+    per_surface = {name: {} for name in workflows if name in surface_workflows}
+    for surface_id, nb_grid_pts in topographies:
+        nb_points = int(np.prod(nb_grid_pts))
+        for name in workflows:
+            model = models[name][len(nb_grid_pts)]
+            cpu_seconds = float(model.cpu_seconds(nb_points))
+            peak_memory = float(model.peak_memory(nb_points))
+            estimates[name]["topography"].add(cpu_seconds, peak_memory)
+            if name in per_surface:
+                cpu, memory = per_surface[name].get(surface_id, (0.0, 0.0))
+                per_surface[name][surface_id] = (
+                    cpu + cpu_seconds,
+                    max(memory, peak_memory),
+                )
+
+    for name, surfaces in per_surface.items():
+        estimates[name]["surface"] = CostEstimate()
+        for cpu_seconds, peak_memory in surfaces.values():
+            estimates[name]["surface"].add(cpu_seconds, peak_memory)
+    return estimates
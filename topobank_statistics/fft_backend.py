@@ -0,0 +1,124 @@
+"""
+Selection of the FFT backend for spectral workflows.
+
+`numpy.fft` is single-threaded. The Fourier transforms computed by this
+plugin (the cached spectra in `spectral` and the segmented spectra in
+`welch`) instead obtain their FFT functions from `fft_functions`, which
+returns those of a multithreaded backend selected with the settings
+
+- `TOPOBANK_STATISTICS_FFT_BACKEND`: 'numpy' (default), 'scipy'
+  (`scipy.fft`) or 'pyfftw' (`pyfftw.interfaces.numpy_fft` with plan
+  caching; falls back to 'scipy' if pyFFTW is not installed)
+- `TOPOBANK_STATISTICS_FFT_WORKERS`: number of threads per transform
+  (default 1; -1 uses all cores with 'scipy')
+
+The functions are passed to the callers explicitly; `numpy.fft` itself is
+never modified, such that other threads of the process (and the transforms
+inside SurfaceTopography) are not affected.
+"""
+
+import functools
+import importlib.util
+import logging
+import types
+
+import numpy as np
+from django.conf import settings
+
+_log = logging.getLogger(__name__)
+
+FFT_FUNCTIONS = [
+    "fft",
+    "ifft",
+    "fft2",
+    "ifft2",
+    "fftn",
+    "ifftn",
+    "rfft",
+    "irfft",
+    "rfft2",
+    "irfft2",
+    "rfftn",
+    "irfftn",
+]
+
+
+def resolved_backend(backend):
+    """Return the FFT backend actually used for a configured backend, i.e.
+    'scipy' for 'pyfftw' if pyFFTW is not installed."""
+    if backend == "pyfftw" and importlib.util.find_spec("pyfftw") is None:
+        return "scipy"
+    return backend
+
+
+def backend_functions(backend, workers=1):
+    """Return the FFT functions of a backend.
+
+    Parameters
+    ----------
+    backend: str
+        'numpy', 'scipy' or 'pyfftw'
+    workers: int, optional
+        Number of threads per transform. (Default: 1)
+
+    Returns
+    -------
+    module or types.SimpleNamespace
+        Namespace with the functions `FFT_FUNCTIONS`, with the same
+        signatures as in `numpy.fft`; `numpy.fft` itself for the 'numpy'
+        backend
+    """
+    if backend == "numpy":
+        return np.fft
+    if backend == "pyfftw":
+        if resolved_backend(backend) == "scipy":
+            _log.warning("pyFFTW is not installed, using scipy.fft instead.")
+            backend = "scipy"
+        else:
+            import pyfftw
+            import pyfftw.interfaces.numpy_fft as pyfftw_fft
+
+            # Keep FFTW plans (and aligned buffers) alive between calls
+            pyfftw.interfaces.cache.enable()
+            return types.SimpleNamespace(
+                **{
+                    name: functools.partial(getattr(pyfftw_fft, name), threads=workers)
+                    for name in FFT_FUNCTIONS
+                }
+            )
+    if backend == "scipy":
+        import scipy.fft
+
+        return types.SimpleNamespace(
+            **{
+                name: functools.partial(getattr(scipy.fft, name), workers=workers)
+                for name in FFT_FUNCTIONS
+            }
+        )
+    raise ValueError(
+        f"Unknown FFT backend '{backend}'. Available backends: numpy, scipy, pyfftw"
+    )
+
+
+def fft_functions(backend=None, workers=None):
+    """Return the FFT functions of the configured backend.
+
+    Parameters
+    ----------
+    backend: str, optional
+        FFT backend. (Default: `TOPOBANK_STATISTICS_FFT_BACKEND` setting or
+        'numpy')
+    workers: int, optional
+        Number of threads per transform. (Default:
+        `TOPOBANK_STATISTICS_FFT_WORKERS` setting or 1)
+
+    Returns
+    -------
+    module or types.SimpleNamespace
+        FFT functions, see `backend_functions`
+    """
+    if backend is None:
+        backend = getattr(settings, "TOPOBANK_STATISTICS_FFT_BACKEND", "numpy")
+    if workers is None:
+        workers = getattr(settings, "TOPOBANK_STATISTICS_FFT_WORKERS", 1)
+    return backend_functions(backend, workers)
@@ -0,0 +1,79 @@
+"""
+Non-copying access to height fields within a workflow run.
+
+The topography returned by the topobank model is a pipeline (e.g. scaled
+and detrended) that recomputes its height field on every call to
+`heights()`. Likewise, SurfaceTopography's `transpose()` returns a new
+pipeline on every call whose heights are recomputed from its parent. The
+workflows hence evaluate the pipeline once and work on a static topography
+and a single, cached transposed view of it that shares the height array.
+"""
+
+import weakref
+
+from SurfaceTopography import Topography, UniformLineScan
+from SurfaceTopography.UniformLineScanAndTopography import \
+    DecoratedUniformTopography
+
+# Transposed views by topography, such that all y-direction statistics of a
+# run share one instance
+_transposed = weakref.WeakKeyDictionary()
+
+
+def static_topography(topography):
+    """Return a topography backed by the evaluated height field of
+    `topography`.
+
+    Parameters
+    ----------
+    topography: SurfaceTopography topography instance
+        Topography, possibly a pipeline
+
+    Returns
+    -------
+    SurfaceTopography topography instance
+        `topography` itself if it is not a uniform pipeline, otherwise a
+        `Topography` or `UniformLineScan` holding its heights.
+    """
+    if not isinstance(topography, DecoratedUniformTopography):
+        return topography
+    kwargs = dict(
+        periodic=topography.is_periodic, unit=topography.unit, info=topography.info
+    )
+    if topography.dim == 1:
+        return UniformLineScan(
+            topography.heights(), topography.physical_sizes[0], **kwargs
+        )
+    return Topography(topography.heights(), topography.physical_sizes, **kwargs)
+
+
+def transposed_topography(topography):
+    """Return the transpose of a static two-dimensional topography.
+
+    The heights of the returned topography are a (stride-swapped) view of
+    the heights of `topography`, and the same instance is returned for
+    repeated calls.
+
+    Parameters
+    ----------
+    topography: SurfaceTopography.Topography
+        Static topography, see `static_topography`
+
+    Returns
+    -------
+    SurfaceTopography.Topography
+    """
+    try:
+        return _transposed[topography]
+    except KeyError:
+        pass
+    sx, sy = topography.physical_sizes
+    transposed = Topography(
+        topography.heights().T,
+        (sy, sx),
+        periodic=topography.is_periodic,
+        unit=topography.unit,
+        info=topography.info,
+    )
+    _transposed[topography] = transposed
+    return transposed
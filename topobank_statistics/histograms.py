@@ -0,0 +1,309 @@
+"""
+Mergeable histograms on fixed, aligned bin edges.
+
+Bin widths are powers of two and bin edges are integer multiples of the
+width. Histograms computed independently (e.g. for the topographies of a
+surface) hence share their edges once brought to the same width, which is
+exact since a bin of width `2 w` is the union of two bins of width `w`.
+Merging then amounts to summing counts, such that histograms can be
+computed in parallel and merged incrementally in any order. Moments are
+accumulated alongside the counts.
+
+Counts may be weights, e.g. the lengths of the segments of nonuniform line
+scans (see `nonuniform`), which are then summed in the same way.
+"""
+
+import numpy as np
+from SurfaceTopography.Exceptions import ReentrantDataError
+
+from .moments import Moments, iter_blocks
+from .nonuniform import segment_counts
+
+
+def aligned_bin_width(lower, upper, nb_bins):
+    """Return the smallest power of two such that `nb_bins` bins of this
+    width span the interval from `lower` to `upper`.
+
+    Parameters
+    ----------
+    lower: float
+        Smallest value
+    upper: float
+        Largest value
+    nb_bins: int
+        Maximum number of bins
+
+    Returns
+    -------
+    float
+        Bin width
+    """
+    span = upper - lower
+    if span <= 0:
+        # All values are identical
+        span = abs(upper) if upper != 0 else 1.0
+    return 2.0 ** np.ceil(np.log2(span / nb_bins))
+
+
+class MergeableHistogram:
+    """Histogram on bins `[(offset + i) * width, (offset + i + 1) * width)`.
+
+    Parameters
+    ----------
+    width: float
+        Bin width, a power of two
+    offset: int
+        Index of the first bin
+    counts: np.ndarray
+        Number of values (or total weight of the values) per bin
+    moments: Moments
+        Moments of the values
+    """
+
+    def __init__(self, width, offset, counts, moments):
+        self.width = width
+        self.offset = offset
+        self.counts = counts
+        self.moments = moments
+
+    @classmethod
+    def from_values(cls, values, width=None, nb_bins=None, quantity="data"):
+        """Histogram (possibly masked) values.
+
+        Parameters
+        ----------
+        values: np.ndarray
+            Values, masked entries are ignored
+        width: float, optional
+            Bin width, a power of two. (Default: chosen from the range of
+            `values` and `nb_bins`, see `aligned_bin_width`)
+        nb_bins: int, optional
+            Maximum number of bins if `width` is not given. (Default: None)
+        quantity: str, optional
+            Name of the quantity for error messages. (Default: 'data')
+
+        Returns
+        -------
+        MergeableHistogram
+        """
+        moments = Moments.from_array(values)
+        width, offset, nb_counts = cls._aligned_bins(moments, width, nb_bins, quantity)
+        counts = np.zeros(nb_counts, dtype=np.int64)
+        for block, valid in iter_blocks(values):
+            block = block if valid is None else block[valid]
+            indices = np.floor(block / width).astype(np.int64) - offset
+            counts += np.bincount(indices.ravel(), minlength=nb_counts)
+        return cls(width, offset, counts, moments)
+
+    @classmethod
+    def from_weighted_values(
+        cls, values, weights, moments, width=None, nb_bins=None, quantity="data"
+    ):
+        """Histogram weighted values.
+
+        Parameters
+        ----------
+        values: np.ndarray
+            Values
+        weights: np.ndarray
+            Weights of the values
+        moments: Moments
+            Weighted moments of the values (see `nonuniform.weighted_moments`)
+        width: float, optional
+            Bin width, a power of two. (Default: chosen from the range of
+            `values` and `nb_bins`, see `aligned_bin_width`)
+        nb_bins: int, optional
+            Maximum number of bins if `width` is not given. (Default: None)
+        quantity: str, optional
+            Name of the quantity for error messages. (Default: 'data')
+
+        Returns
+        -------
+        MergeableHistogram
+        """
+        width, offset, nb_counts = cls._aligned_bins(moments, width, nb_bins, quantity)
+        indices = np.floor(values / width).astype(np.int64) - offset
+        counts = np.bincount(indices, weights=weights, minlength=nb_counts)
+        return cls(width, offset, counts, moments)
+
+    @classmethod
+    def from_segments(
+        cls, lower, upper, weights, moments, width=None, nb_bins=None, quantity="data"
+    ):
+        """Histogram weighted segments, whose weights are distributed
+        uniformly over the bins between `lower` and `upper`.
+
+        Parameters
+        ----------
+        lower: np.ndarray
+            Lower ends of the segments
+        upper: np.ndarray
+            Upper ends of the segments
+        weights: np.ndarray
+            Weights of the segments
+        moments: Moments
+            Moments of the segments (see `nonuniform.height_values`)
+        width: float, optional
+            Bin width, a power of two. (Default: chosen from the range of
+            the segments and `nb_bins`, see `aligned_bin_width`)
+        nb_bins: int, optional
+            Maximum number of bins if `width` is not given. (Default: None)
+        quantity: str, optional
+            Name of the quantity for error messages. (Default: 'data')
+
+        Returns
+        -------
+        MergeableHistogram
+        """
+        width, offset, nb_counts = cls._aligned_bins(moments, width, nb_bins, quantity)
+        bin_edges = (offset + np.arange(nb_counts + 1)) * width
+        counts = segment_counts(lower, upper, weights, bin_edges)
+        return cls(width, offset, counts, moments)
+
+    @staticmethod
+    def _aligned_bins(moments, width, nb_bins, quantity):
+        """Bin width, index of the first bin and number of bins covering the
+        range of `moments`."""
+        if moments.count == 0 or not np.all(np.isfinite([moments.min, moments.max])):
+            raise ReentrantDataError(
+                f"Cannot calculate {quantity} distribution for reentrant measurements."
+            )
+        if width is None:
+            width = aligned_bin_width(moments.min, moments.max, nb_bins)
+        offset = int(np.floor(moments.min / width))
+        nb_counts = int(np.floor(moments.max / width)) - offset + 1
+        return width, offset, nb_counts
+
+    @property
+    def nb_values(self):
+        """Number of values, or their total weight for weighted histograms."""
+        total = self.counts.sum()
+        return int(total) if self.counts.dtype.kind == "i" else float(total)
+
+    @property
+    def bin_edges(self):
+        return (self.offset + np.arange(len(self.counts) + 1)) * self.width
+
+    @property
+    def density(self):
+        """Probability density in each bin, as `np.histogram(density=True)`."""
+        return self.counts / (self.nb_values * self.width)
+
+    @property
+    def mean(self):
+        return self.moments.mean
+
+    @property
+    def rms(self):
+        """Root mean square (about zero)."""
+        return self.moments.rms
+
+    @property
+    def std(self):
+        """Standard deviation (root mean square about the mean)."""
+        return self.moments.std
+
+    def rebin(self, width):
+        """Return histogram with bins of a larger width.
+
+        Parameters
+        ----------
+        width: float
+            New bin width, a power-of-two multiple of the current width
+
+        Returns
+        -------
+        MergeableHistogram
+        """
+        factor = int(round(width / self.width))
+        if factor == 1:
+            return self
+        if factor < 1 or factor & (factor - 1) != 0:
+            raise ValueError(
+                f"Cannot rebin histogram of bin width {self.width} to bin width "
+                f"{width}."
+            )
+        # Floor division rounds towards negative infinity, as np.floor above
+        indices = (self.offset + np.arange(len(self.counts))) // factor
+        counts = np.bincount(indices - indices[0], weights=self.counts)
+        return MergeableHistogram(
+            width, int(indices[0]), counts.astype(self.counts.dtype), self.moments
+        )
+
+    def merge(self, other, nb_bins=None):
+        """Return histogram of the values of both histograms.
+
+        Parameters
+        ----------
+        other: MergeableHistogram or None
+            Histogram to merge with, None is ignored
+        nb_bins: int, optional
+            Maximum number of bins. The smallest common bin width for which
+            the merged histogram has at most `nb_bins` bins is chosen before
+            any counts are allocated; the result is hence independent of the
+            order in which histograms are merged. (Default: None)
+
+        Returns
+        -------
+        MergeableHistogram
+        """
+        if other is None:
+            return self if nb_bins is None else self.coarsen(nb_bins)
+        width = max(self.width, other.width)
+        # Bin edges are exact multiples of the (power-of-two) widths
+        lower = min(self.bin_edges[0], other.bin_edges[0])
+        upper = max(self.bin_edges[-1], other.bin_edges[-1])
+        while (
+            nb_bins is not None
+            and np.ceil(upper / width) - np.floor(lower / width) > nb_bins
+        ):
+            width *= 2
+        a, b = self.rebin(width), other.rebin(width)
+        offset = min(a.offset, b.offset)
+        counts = np.zeros(
+            max(a.offset + len(a.counts), b.offset + len(b.counts)) - offset,
+            dtype=np.result_type(a.counts, b.counts),
+        )
+        counts[a.offset - offset : a.offset - offset + len(a.counts)] += a.counts
+        counts[b.offset - offset : b.offset - offset + len(b.counts)] += b.counts
+        moments = Moments().merge(a.moments).merge(b.moments)
+        return MergeableHistogram(width, offset, counts, moments)
+
+    def coarsen(self, nb_bins):
+        """Return histogram rebinned to at most `nb_bins` bins.
+
+        Parameters
+        ----------
+        nb_bins: int
+            Maximum number of bins
+
+        Returns
+        -------
+        MergeableHistogram
+        """
+        histogram = self
+        while len(histogram.counts) > nb_bins:
+            histogram = histogram.rebin(2 * histogram.width)
+        return histogram
+
+
+def merge_histograms(histograms, nb_bins=None):
+    """Merge histograms by summing their counts.
+
+    Parameters
+    ----------
+    histograms: iterable of MergeableHistogram or None
+        Histograms to merge, None entries are ignored
+    nb_bins: int, optional
+        Maximum number of bins of the merged histogram. (Default: None)
+
+    Returns
+    -------
+    MergeableHistogram or None
+        Merged histogram, or None if there is nothing to merge.
+    """
+    merged = None
+    for histogram in histograms:
+        if histogram is not None:
+            merged = histogram.merge(merged, nb_bins)
+    return merged
@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+from topobank.manager.models import Surface, Topography
+
+from ...cost import estimate_cost
+from ...workflows import statistics_workflows
+
+
+def _topography_metadata():
+    """Yield surface identifier and number of grid points of all topographies
+    with a known number of grid points, without loading any data."""
+    for surface_id, nx, ny in (
+        Topography.objects.filter(resolution_x__isnull=False)
+        .values_list("surface_id", "resolution_x", "resolution_y")
+        .iterator()
+    ):
+        yield surface_id, (nx,) if ny is None else (nx, ny)
+
+
+class Command(BaseCommand):
+    help = """Estimate CPU time and peak memory of recomputing statistics workflows.
+
+    The estimate only uses the metadata (number of grid points, dimension,
+    surface) of the topographies and the cost models in
+    `topobank_statistics.cost`. Topographies without a stored number of grid
+    points (e.g. nonuniform line scans) are not included; their number is
+    reported.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "workflows",
+            nargs="*",
+            help="Names of the workflows (default: all workflows of this plugin "
+            "with a topography implementation).",
+        )
+        parser.add_argument(
+            "--surfaces",
+            action="store_true",
+            help="Also estimate the surface implementations of the workflows.",
+        )
+
+    def handle(self, *args, **options):
+        available = statistics_workflows(Topography)
+        names = options["workflows"] or available
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise CommandError(
+                f"Unknown workflows: {', '.join(unknown)}. Available workflows: "
+                f"{', '.join(available)}"
+            )
+        surface_workflows = statistics_workflows(Surface) if options["surfaces"] else []
+
+        try:
+            estimates = estimate_cost(names, _topography_metadata(), surface_workflows)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            f"{'workflow':>48} {'subject':>10} {'tasks':>8} {'CPU-hours':>10} "
+            f"{'peak (MB)':>10}"
+        )
+        total_cpu_hours = 0
+        peak_memory = 0
+        for name, subjects in estimates.items():
+            for subject, estimate in subjects.items():
+                self.stdout.write(
+                    f"{name:>48} {subject:>10} {estimate.nb_tasks:>8} "
+                    f"{estimate.cpu_hours:>10.2f} {estimate.peak_memory / 1024**2:>10.1f}"
+                )
+                total_cpu_hours += estimate.cpu_hours
+                peak_memory = max(peak_memory, estimate.peak_memory)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Total: {total_cpu_hours:.2f} CPU-hours, peak memory per task "
+                f"{peak_memory / 1024**2:.1f} MB"
+            )
+        )
+        nb_skipped = Topography.objects.filter(resolution_x__isnull=True).count()
+        if nb_skipped > 0:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Skipped {nb_skipped} topographies without a stored number of "
+                    "grid points (e.g. nonuniform line scans); the estimate does "
+                    "not include them."
+                )
+            )
@@ -0,0 +1,224 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Q
+from pydantic import ValidationError
+from topobank.analysis.controller import renew_existing_analysis
+from topobank.analysis.models import Analysis
+from topobank.analysis.registry import get_implementation
+from topobank.manager.models import Surface, Topography
+
+from ...models import RecomputeCheckpoint
+from ...version import __version__
+from ...workflows import statistics_workflows
+
+# Name under which topobank records the version of this plugin in the
+# configuration of an analysis
+PLUGIN_IMPORT_NAME = "topobank_statistics"
+
+# Task states of analyses that are not queued or running
+FINISHED_TASK_STATES = ["su", "fa"]
+
+
+def _plugin_version(analysis):
+    """Version of this plugin recorded for an analysis, or None."""
+    configuration = analysis.configuration
+    if configuration is None:
+        return None
+    for version in configuration.versions.all():
+        if version.dependency.import_name == PLUGIN_IMPORT_NAME:
+            return version.number_as_string()
+    return None
+
+
+def _current_kwargs(implementation, kwargs):
+    """Parameters of an analysis as the current workflow stores them, i.e.
+    with parameters added since the analysis was computed set to their
+    defaults.
+
+    Raises
+    ------
+    pydantic.ValidationError
+        If the parameters are not valid for the current workflow
+    """
+    parameters = implementation.Parameters(**(kwargs or {})).model_dump()
+    # Stored parameters went through JSON
+    return json.loads(json.dumps(parameters))
+
+
+def _is_outdated(analysis, kwargs):
+    """An analysis is outdated if it was computed by another version of this
+    plugin, or if its parameters differ from the current parameters
+    `kwargs`."""
+    return _plugin_version(analysis) != __version__ or analysis.kwargs != kwargs
+
+
+def _renew(analysis):
+    """Renew an analysis with its own (current) parameters. Return None or the
+    exception raised."""
+    try:
+        renew_existing_analysis(analysis, use_default_kwargs=False)
+    except Exception as exc:
+        return exc
+    finally:
+        # Worker threads open their own database connections
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = """Renew outdated analyses of statistics workflows.
+
+    Selects the finished analyses of topographies and surfaces that were
+    computed with another version of this plugin, or whose parameters are
+    outdated, and renews them with their own parameters through topobank's
+    analysis API. Analyses are processed in batches in the order of their
+    primary keys; progress is checkpointed in the database after every batch,
+    such that an interrupted run resumes where it stopped when invoked again
+    with the same `--run` name. Checkpoints record the version of the plugin:
+    workflows finished with the current version are up to date and not
+    enumerated again, while runs of other versions start over.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "workflows",
+            nargs="*",
+            help="Names of the workflows to renew (default: all workflows of "
+            "this plugin).",
+        )
+        parser.add_argument(
+            "--run",
+            default="default",
+            help="Name of the run, used to resume from its checkpoints.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Number of analyses between two checkpoints.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Maximum number of analyses renewed concurrently.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Renew all finished analyses, including those that are up to date.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Discard the checkpoints of the run and start from scratch.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1 or options["workers"] < 1:
+            raise CommandError("Batch size and number of workers must be positive.")
+
+        available = list(
+            dict.fromkeys(statistics_workflows(Topography) + statistics_workflows(Surface))
+        )
+        names = options["workflows"] or available
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise CommandError(
+                f"Unknown workflows: {', '.join(unknown)}. Available workflows: "
+                f"{', '.join(available)}"
+            )
+
+        if options["restart"]:
+            RecomputeCheckpoint.objects.filter(
+                run=options["run"], workflow__in=names
+            ).delete()
+
+        for name in names:
+            self._recompute(name, options)
+
+    def _recompute(self, name, options):
+        checkpoint, _ = RecomputeCheckpoint.objects.get_or_create(
+            run=options["run"], workflow=name, defaults=dict(version=__version__)
+        )
+        if checkpoint.version != __version__:
+            self.stdout.write(
+                f"{name}: run '{options['run']}' was started with version "
+                f"{checkpoint.version or 'unknown'}, starting over with version "
+                f"{__version__}."
+            )
+            checkpoint.restart(__version__)
+            checkpoint.save()
+        if checkpoint.finished:
+            self.stdout.write(
+                f"{name}: up to date with version {__version__} in run "
+                f"'{options['run']}'."
+            )
+            return
+        if checkpoint.last_pk > 0:
+            self.stdout.write(f"{name}: resuming after analysis {checkpoint.last_pk}.")
+
+        implementation = get_implementation(name=name)
+        analyses = Analysis.objects.filter(
+            Q(subject_topography__isnull=False) | Q(subject_surface__isnull=False),
+            workflow_name=name,
+            task_state__in=FINISHED_TASK_STATES,
+        )
+        # Renewed analyses are new records; only enumerate those that existed
+        # when the run (re)started
+        last_pk = analyses.aggregate(last_pk=Max("pk"))["last_pk"] or 0
+        nb_processed = 0
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            while True:
+                batch = list(
+                    analyses.filter(pk__gt=checkpoint.last_pk, pk__lte=last_pk)
+                    .select_related("configuration")
+                    .prefetch_related("configuration__versions__dependency")
+                    .order_by("pk")[: options["batch_size"]]
+                )
+                if not batch:
+                    break
+                outdated = []
+                for analysis in batch:
+                    try:
+                        kwargs = _current_kwargs(implementation, analysis.kwargs)
+                    except ValidationError as exc:
+                        self._failed(checkpoint, name, analysis, exc)
+                        continue
+                    if options["force"] or _is_outdated(analysis, kwargs):
+                        # Renewal uses the parameters of the analysis
+                        analysis.kwargs = kwargs
+                        outdated.append(analysis)
+                    else:
+                        checkpoint.nb_skipped += 1
+                for analysis, outcome in zip(outdated, executor.map(_renew, outdated)):
+                    if outcome is None:
+                        checkpoint.nb_computed += 1
+                    else:
+                        self._failed(checkpoint, name, analysis, outcome)
+                checkpoint.last_pk = batch[-1].pk
+                checkpoint.save()
+
+                nb_processed += len(batch)
+                elapsed = time.monotonic() - start
+                self.stdout.write(
+                    f"{name}: {nb_processed} analyses processed, "
+                    f"{nb_processed / elapsed:.2f} analyses/s"
+                )
+
+        checkpoint.finished = True
+        checkpoint.save()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{name}: {checkpoint.nb_computed} renewed, {checkpoint.nb_skipped} "
+                f"up to date, {len(checkpoint.failures)} failed."
+            )
+        )
+
+    def _failed(self, checkpoint, name, analysis, exc):
+        checkpoint.failures.append(dict(pk=analysis.pk, error=str(exc)))
+        self.stderr.write(f"{name}: renewing analysis {analysis.pk} failed: {exc}")
@@ -0,0 +1,253 @@
+"""
+Read-only, memory-mapped height fields for statistics workflows.
+
+The distribution and roughness workflows only ever read the (detrended)
+height field of a topography. When a cache directory is configured via the
+`TOPOBANK_STATISTICS_MEMMAP_CACHE_DIR` setting, the height field is
+materialized once to a NumPy `.npy` file and every subsequent task maps that
+file read-only. Concurrent worker processes on one machine then share the
+operating system's page cache instead of each holding a private copy.
+
+Every use of an entry marks it as recently used. Least recently used entries
+are evicted once the entries exceed `TOPOBANK_STATISTICS_MEMMAP_CACHE_MAX_SIZE`
+(bytes, default 10 GiB); the cache directory is scanned at most every
+`EVICTION_INTERVAL` seconds per process.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+from SurfaceTopography import Topography, UniformLineScan
+
+DEFAULT_MAX_SIZE = 10 * 1024**3  # 10 GiB
+
+# Minimum time between two scans of a cache directory for eviction (per
+# process)
+EVICTION_INTERVAL = 10 * 60
+
+# Time of the last eviction by cache directory
+_last_eviction = {}
+
+# Attributes of the topobank topography model that determine the height field
+# returned by `topography()`. All of them must exist on the model; a missing
+# attribute raises instead of silently dropping out of the key.
+_FINGERPRINT_ATTRIBUTES = [
+    "modification_time",
+    "detrend_mode",
+    "fill_undefined_data_mode",
+    "is_periodic",
+    "unit",
+    "height_scale",
+    "resolution_x",
+    "resolution_y",
+    "size_x",
+    "size_y",
+]
+
+
+def cache_key(subject):
+    """Return the name of the cache entry for a topobank topography model.
+
+    Parameters
+    ----------
+    subject: topobank.manager.models.Topography
+        Topography model whose height field should be cached
+
+    Returns
+    -------
+    str
+        Key that changes whenever the model's height field changes.
+    """
+    fingerprint = [str(subject.pk)] + [
+        str(getattr(subject, name)) for name in _FINGERPRINT_ATTRIBUTES
+    ]
+    digest = hashlib.sha256("\0".join(fingerprint).encode("utf-8")).hexdigest()
+    return f"{subject.pk}-{digest[:16]}"
+
+
+def _atomic_save(path, arr):
+    """Save `arr` to `path` such that readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def materialize(topography, path):
+    """Write the height field and metadata of a uniform topography to disk.
+
+    Parameters
+    ----------
+    topography: SurfaceTopography.Topography or SurfaceTopography.UniformLineScan
+        Topography (usually a pipeline) whose heights should be stored
+    path: str
+        Path prefix of the cache entry; `.npy`, `.mask.npy` and `.json` files
+        are created from it
+
+    Returns
+    -------
+    None
+    """
+    heights = topography.heights()
+    is_masked = np.ma.is_masked(heights)
+    _atomic_save(f"{path}.npy", np.ma.getdata(heights).astype(float, copy=False))
+    if is_masked:
+        _atomic_save(f"{path}.mask.npy", np.ma.getmaskarray(heights))
+    metadata = dict(
+        dim=topography.dim,
+        physical_sizes=list(topography.physical_sizes),
+        periodic=topography.is_periodic,
+        unit=topography.unit,
+        info=topography.info,
+        is_masked=bool(is_masked),
+    )
+    # The metadata file is written last; its presence marks a complete entry.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(metadata, f, default=str)
+        os.replace(tmp_path, f"{path}.json")
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load(path):
+    """Return a topography whose heights are a read-only `np.memmap`.
+
+    Parameters
+    ----------
+    path: str
+        Path prefix of a cache entry written by `materialize`
+
+    Returns
+    -------
+    SurfaceTopography.Topography or SurfaceTopography.UniformLineScan
+    """
+    with open(f"{path}.json") as f:
+        metadata = json.load(f)
+    heights = np.load(f"{path}.npy", mmap_mode="r")
+    if metadata["is_masked"]:
+        mask = np.load(f"{path}.mask.npy", mmap_mode="r")
+        heights = np.ma.masked_array(heights, mask=mask, copy=False)
+    kwargs = dict(
+        periodic=metadata["periodic"], unit=metadata["unit"], info=metadata["info"]
+    )
+    if metadata["dim"] == 1:
+        return UniformLineScan(heights, metadata["physical_sizes"][0], **kwargs)
+    return Topography(heights, tuple(metadata["physical_sizes"]), **kwargs)
+
+
+def evict(cache_dir, max_size):
+    """Remove least recently used entries of a cache directory beyond a total
+    size.
+
+    Parameters
+    ----------
+    cache_dir: str
+        Directory holding the cache entries
+    max_size: int
+        Maximum total size of the entries in bytes
+    """
+    # Size and time of last use by entry
+    entries = {}
+    try:
+        dir_entries = list(os.scandir(cache_dir))
+    except FileNotFoundError:
+        return
+    for dir_entry in dir_entries:
+        name = dir_entry.name
+        if not name.endswith((".npy", ".json")):
+            # Temporary files of entries being written
+            continue
+        try:
+            stat = dir_entry.stat()
+        except FileNotFoundError:
+            continue
+        size, mtime = entries.get(name.split(".", 1)[0], (0, 0))
+        entries[name.split(".", 1)[0]] = (
+            size + stat.st_size,
+            max(mtime, stat.st_mtime),
+        )
+
+    total_size = sum(size for size, _ in entries.values())
+    for prefix, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+        if total_size <= max_size:
+            break
+        # The metadata file goes first, such that the entry is incomplete
+        # before its height field disappears. Processes that mapped the
+        # height field keep their mapping.
+        for suffix in [".json", ".npy", ".mask.npy"]:
+            try:
+                os.unlink(os.path.join(cache_dir, prefix + suffix))
+            except FileNotFoundError:
+                pass
+        total_size -= size
+
+
+def _maybe_evict(cache_dir):
+    now = time.monotonic()
+    last_eviction = _last_eviction.get(cache_dir)
+    if last_eviction is not None and now - last_eviction < EVICTION_INTERVAL:
+        return
+    _last_eviction[cache_dir] = now
+    evict(
+        cache_dir,
+        getattr(settings, "TOPOBANK_STATISTICS_MEMMAP_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE),
+    )
+
+
+def memmapped_topography(subject, cache_dir):
+    """Return the topography of `subject`, backed by a memory-mapped cache.
+
+    Nonuniform line scans are not cached and returned as loaded.
+
+    Parameters
+    ----------
+    subject: topobank.manager.models.Topography
+        Topography model
+    cache_dir: str
+        Directory holding the cache entries
+
+    Returns
+    -------
+    SurfaceTopography topography instance
+    """
+    path = os.path.join(cache_dir, cache_key(subject))
+    try:
+        # Mark as recently used
+        os.utime(f"{path}.json")
+        return load(path)
+    except FileNotFoundError:
+        # Missing or (concurrently) evicted entry
+        pass
+    topography = subject.topography()
+    if not topography.is_uniform:
+        return topography
+    os.makedirs(cache_dir, exist_ok=True)
+    materialize(topography, path)
+    topography = load(path)
+    # The new entry stays mapped even if it is evicted right away
+    _maybe_evict(cache_dir)
+    return topography
+
+
+def read_topography(subject):
+    """Return the low-level topography for a topobank topography model.
+
+    Uses the memory-mapped cache if `TOPOBANK_STATISTICS_MEMMAP_CACHE_DIR` is
+    set, and loads the topography into process memory otherwise.
+    """
+    cache_dir = getattr(settings, "TOPOBANK_STATISTICS_MEMMAP_CACHE_DIR", None)
+    if cache_dir is None:
+        return subject.topography()
+    return memmapped_topography(subject, cache_dir)
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="RecomputeCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("run", models.CharField(max_length=255)),
+                ("workflow", models.CharField(max_length=255)),
+                ("last_pk", models.BigIntegerField(default=0)),
+                ("nb_computed", models.PositiveIntegerField(default=0)),
+                ("nb_skipped", models.PositiveIntegerField(default=0)),
+                ("failures", models.JSONField(default=list)),
+                ("finished", models.BooleanField(default=False)),
+                ("version", models.CharField(blank=True, max_length=64)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("run", "workflow"), name="unique_recompute_checkpoint"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import models
+
+
+class RecomputeCheckpoint(models.Model):
+    """Progress of a bulk recomputation of a workflow (see the
+    `recompute_statistics` management command).
+
+    Analyses are processed in order of their primary key; `last_pk` is the
+    largest primary key of all analyses processed so far. `nb_computed` and
+    `nb_skipped` count renewed and up-to-date analyses. `version` is the
+    version of the plugin of the run; checkpoints of other versions are
+    outdated.
+    """
+
+    run = models.CharField(max_length=255)
+    workflow = models.CharField(max_length=255)
+    last_pk = models.BigIntegerField(default=0)
+    nb_computed = models.PositiveIntegerField(default=0)
+    nb_skipped = models.PositiveIntegerField(default=0)
+    failures = models.JSONField(default=list)
+    finished = models.BooleanField(default=False)
+    version = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["run", "workflow"], name="unique_recompute_checkpoint"
+            )
+        ]
+
+    def restart(self, version):
+        """Discard progress, e.g. after an upgrade of the plugin."""
+        self.last_pk = 0
+        self.nb_computed = 0
+        self.nb_skipped = 0
+        self.failures = []
+        self.finished = False
+        self.version = version
+
+    def __str__(self):
+        return (
+            f"{self.run}: {self.workflow} {self.version} (last pk {self.last_pk})"
+        )
@@ -0,0 +1,224 @@
+"""
+Streaming moments and histograms of (masked) arrays.
+
+`np.ma.compressed` copies all valid values of a masked array into a new
+array before a reduction. The accumulators here instead iterate over blocks
+of consecutive rows of the data (views, no copies) and reduce the valid
+values of each block with `where=` reductions, such that the memory overhead
+of a statistic is bounded by the block size. Moments of blocks are combined
+with the pairwise update of Chan et al., which is numerically stable also
+for data with a large mean.
+"""
+
+import numpy as np
+
+# Number of values per block
+BLOCK_SIZE = 2**20
+
+
+def iter_blocks(arr, block_size=BLOCK_SIZE):
+    """Iterate over blocks of consecutive rows of a (masked) array.
+
+    Parameters
+    ----------
+    arr: np.ndarray or np.ma.MaskedArray
+        Array
+    block_size: int, optional
+        Approximate number of values per block. (Default: `BLOCK_SIZE`)
+
+    Yields
+    ------
+    data: np.ndarray
+        View on the data of the block
+    valid: np.ndarray of bool or None
+        True for valid (unmasked) values, None if all values are valid
+    """
+    data = np.atleast_1d(np.ma.getdata(arr))
+    mask = np.ma.getmask(arr)
+    if mask is not np.ma.nomask:
+        mask = np.atleast_1d(mask)
+    if len(data) == 0:
+        return
+    nb_rows = max(1, block_size // max(1, data[0].size))
+    for start in range(0, len(data), nb_rows):
+        block = data[start : start + nb_rows]
+        if mask is np.ma.nomask:
+            yield block, None
+        else:
+            yield block, ~mask[start : start + nb_rows]
+
+
+class Moments:
+    """Number, mean, variance and range of the valid values of arrays,
+    accumulated in double precision."""
+
+    def __init__(self):
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @classmethod
+    def from_array(cls, arr, block_size=BLOCK_SIZE):
+        """Return moments of the valid values of `arr`."""
+        return cls().update(arr, block_size=block_size)
+
+    @classmethod
+    def from_statistics(cls, count, mean, variance, min, max):
+        """Return moments with the given statistics, e.g. of weighted values.
+
+        Parameters
+        ----------
+        count: int
+            Number of values
+        mean: float
+            Mean
+        variance: float
+            Mean square about the mean
+        min: float
+            Smallest value
+        max: float
+            Largest value
+
+        Returns
+        -------
+        Moments
+        """
+        moments = cls()
+        if count > 0:
+            moments._combine(count, mean, count * variance)
+            moments.min = min
+            moments.max = max
+        return moments
+
+    def update(self, arr, block_size=BLOCK_SIZE):
+        """Add the valid values of `arr`.
+
+        Parameters
+        ----------
+        arr: np.ndarray or np.ma.MaskedArray
+            Values
+        block_size: int, optional
+            Approximate number of values per block. (Default: `BLOCK_SIZE`)
+
+        Returns
+        -------
+        Moments
+            This accumulator
+        """
+        for block, valid in iter_blocks(arr, block_size):
+            self._update_block(block, valid)
+        return self
+
+    def _update_block(self, block, valid):
+        if valid is None:
+            count = block.size
+            where = True
+        else:
+            count = int(np.count_nonzero(valid))
+            where = valid
+        if count == 0:
+            return
+        block_sum = np.add.reduce(block, axis=None, dtype=np.float64, where=where)
+        block_mean = block_sum / count
+        deviation = np.subtract(block, block_mean, dtype=np.float64)
+        np.square(deviation, out=deviation)
+        block_m2 = np.add.reduce(deviation, axis=None, where=where)
+        self._combine(count, block_mean, block_m2)
+        # NaNs propagate to the range
+        self.min = np.minimum(
+            self.min, np.minimum.reduce(block, axis=None, where=where, initial=np.inf)
+        )
+        self.max = np.maximum(
+            self.max, np.maximum.reduce(block, axis=None, where=where, initial=-np.inf)
+        )
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self._mean
+        self._mean += delta * count / total
+        self._m2 += m2 + delta**2 * self.count * count / total
+        self.count = total
+
+    def merge(self, other):
+        """Add the values accumulated in another `Moments` instance.
+
+        Returns
+        -------
+        Moments
+            This accumulator
+        """
+        if other.count > 0:
+            self._combine(other.count, other._mean, other._m2)
+            self.min = np.minimum(self.min, other.min)
+            self.max = np.maximum(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self._mean if self.count > 0 else np.nan
+
+    @property
+    def std(self):
+        """Standard deviation (root mean square about the mean)."""
+        return np.sqrt(self._m2 / self.count) if self.count > 0 else np.nan
+
+    @property
+    def rms(self):
+        """Root mean square (about zero)."""
+        return np.sqrt(self.mean**2 + self.std**2)
+
+
+def histogram(arr, bins, range=None, density=True, block_size=BLOCK_SIZE):
+    """Same as `np.histogram` of the valid values of `arr`, but without
+    copying all valid values.
+
+    Bin edges are determined once for all valid values before the blocks are
+    counted. Bin width estimators (`bins` given as a string, e.g. 'auto')
+    need all valid values and hence copy them.
+
+    Parameters
+    ----------
+    arr: np.ndarray or np.ma.MaskedArray
+        Values
+    bins: int or str or np.ndarray
+        Number of bins, bin width estimator or bin edges
+    range: tuple of float, optional
+        Lower and upper range of the bins. (Default: range of the valid
+        values)
+    density: bool, optional
+        Return probability density instead of counts. (Default: True)
+    block_size: int, optional
+        Approximate number of values per block. (Default: `BLOCK_SIZE`)
+
+    Returns
+    -------
+    hist: np.ndarray
+        Counts or probability density
+    bin_edges: np.ndarray
+        Bin edges
+    """
+    if isinstance(bins, str):
+        values = np.ma.compressed(arr)
+    elif range is None:
+        # Only the range of the valid values determines the edges
+        moments = Moments.from_array(arr, block_size=block_size)
+        values = np.array([moments.min, moments.max]) if moments.count else []
+    else:
+        values = []
+    bin_edges = np.histogram_bin_edges(values, bins=bins, range=range)
+    if np.ndim(bins) == 0 and not isinstance(bins, str):
+        # Equal-width bins are counted with the fast path of `np.histogram`
+        block_bins, block_range = len(bin_edges) - 1, (bin_edges[0], bin_edges[-1])
+    else:
+        block_bins, block_range = bin_edges, None
+
+    counts = np.zeros(len(bin_edges) - 1, dtype=np.intp)
+    for block, valid in iter_blocks(arr, block_size):
+        values = block if valid is None else block[valid]
+        counts += np.histogram(values, bins=block_bins, range=block_range)[0]
+    if not density:
+        return counts, bin_edges
+    # Same order of operations as `np.histogram`
+    return counts / np.diff(bin_edges).astype(float) / counts.sum(), bin_edges
@@ -0,0 +1,357 @@
+"""
+Length-weighted distributions of nonuniform line scans.
+
+The data points of nonuniform line scans are not equally spaced, and
+histograms and moments of the heights or derivatives at the data points
+overrepresent densely sampled regions. Here, every value is instead weighted
+by the length of the line scan that it represents, with weights computed by
+`np.diff` from the positions:
+
+* Heights are evaluated on the (linearly interpolated) segments between
+  neighboring data points. The heights of a segment are uniformly
+  distributed between the heights at its ends, and its length is spread over
+  the bins of the histogram in proportion to the overlap of this height
+  interval with each bin; mean and variance are the exact moments of the
+  piecewise linear profile.
+* Slopes are constant on each segment and weighted by its length.
+* Curvatures are evaluated at the interior data points (with the stencil of
+  SurfaceTopography) and weighted by half the length of the two adjacent
+  segments.
+
+All quantities are computed in a single vectorized pass over positions and
+heights, without interpolation onto a uniform grid.
+"""
+
+import numpy as np
+from SurfaceTopography.Exceptions import ReentrantDataError
+
+from .binning import ROBUST_QUANTILES, robust_bins
+from .moments import Moments
+
+
+def _check_not_reentrant(dx, quantity):
+    if np.any(dx <= 0):
+        raise ReentrantDataError(
+            f"Cannot calculate {quantity} distribution for reentrant measurements."
+        )
+
+
+def height_values(x, h):
+    """Length-weighted heights of a nonuniform line scan.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        Positions of the data points
+    h: np.ndarray
+        Heights of the data points
+
+    Returns
+    -------
+    lower: np.ndarray
+        Smaller of the heights at the ends of each segment
+    upper: np.ndarray
+        Larger of the heights at the ends of each segment
+    weights: np.ndarray
+        Lengths of the segments
+    moments: moments.Moments
+        Moments of the piecewise linear profile
+    """
+    dx = np.diff(x)
+    length = np.sum(dx)
+    if len(h) == 0 or not length > 0:
+        # Degenerate line scan; every height is a segment of unit weight
+        return h, h, np.ones_like(h, dtype=float), Moments.from_array(h)
+    # Moments about the mean of the data points, which avoids cancellation
+    # for heights with a large offset
+    offset = np.mean(h, dtype=np.float64)
+    left = h[:-1] - offset
+    right = h[1:] - offset
+    mean = np.sum(dx * (left + right)) / (2 * length)
+    mean_square = np.sum(dx * (left**2 + left * right + right**2)) / (3 * length)
+    moments = Moments.from_statistics(
+        len(h), offset + mean, max(mean_square - mean**2, 0), np.min(h), np.max(h)
+    )
+    left, right = h[:-1], h[1:]
+    return np.minimum(left, right), np.maximum(left, right), dx, moments
+
+
+def slope_values(x, h):
+    """Length-weighted slopes of a nonuniform line scan.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        Positions of the data points
+    h: np.ndarray
+        Heights of the data points
+
+    Returns
+    -------
+    values: np.ndarray
+        Slopes of the segments, as `derivative(n=1)`
+    weights: np.ndarray
+        Lengths of the segments
+    """
+    dx = np.diff(x)
+    _check_not_reentrant(dx, "slope")
+    return np.diff(h) / dx, dx
+
+
+def curvature_values(x, h):
+    """Length-weighted curvatures of a nonuniform line scan.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        Positions of the data points
+    h: np.ndarray
+        Heights of the data points
+
+    Returns
+    -------
+    values: np.ndarray
+        Curvatures at the interior data points, as `derivative(n=2)`
+    weights: np.ndarray
+        Half the lengths of the two segments adjacent to each interior point
+    """
+    dx = np.diff(x)
+    _check_not_reentrant(dx, "curvature")
+    dh = np.diff(h)
+    dxm, dxp = dx[:-1], dx[1:]
+    weights = dxm + dxp
+    return 2 * (dh[1:] / dxp - dh[:-1] / dxm) / weights, weights / 2
+
+
+def weighted_moments(values, weights):
+    """Moments of weighted values.
+
+    Parameters
+    ----------
+    values: np.ndarray
+        Values
+    weights: np.ndarray
+        Weights of the values
+
+    Returns
+    -------
+    moments.Moments
+        Moments with weighted mean and variance; `count` is the number of
+        values
+    """
+    total_weight = np.sum(weights, dtype=np.float64)
+    if len(values) == 0 or not total_weight > 0:
+        return Moments.from_array(values)
+    mean = np.sum(weights * values, dtype=np.float64) / total_weight
+    variance = np.sum(weights * (values - mean) ** 2, dtype=np.float64) / total_weight
+    # NaNs propagate to the range, as in `Moments`
+    return Moments.from_statistics(
+        len(values), mean, variance, np.min(values), np.max(values)
+    )
+
+
+def weighted_histogram(values, weights, bins, range):
+    """Probability density of weighted values, as `np.histogram` with
+    `density=True`.
+
+    Parameters
+    ----------
+    values: np.ndarray
+        Values
+    weights: np.ndarray
+        Weights of the values
+    bins: int or np.ndarray
+        Number of bins or bin edges
+    range: tuple of float
+        Lower and upper range of the bins
+
+    Returns
+    -------
+    hist: np.ndarray
+        Probability density
+    bin_edges: np.ndarray
+        Bin edges
+    """
+    return np.histogram(values, bins=bins, range=range, weights=weights, density=True)
+
+
+def segment_counts(lower, upper, weights, bin_edges):
+    """Weights of segments in the bins, with the weight of each segment
+    distributed uniformly between `lower` and `upper`. Segments with
+    `lower == upper` are counted as values, as in `np.histogram`."""
+    nb_bins = len(bin_edges) - 1
+    first_edge, last_edge = bin_edges[0], bin_edges[-1]
+    flat = lower == upper
+    counts = np.histogram(
+        lower[flat], bins=bin_edges, weights=weights[flat].astype(float)
+    )[0]
+
+    inside = ~flat & (upper > first_edge) & (lower < last_edge)
+    density = weights[inside] / (upper[inside] - lower[inside])
+    lower = np.maximum(lower[inside], first_edge)
+    upper = np.minimum(upper[inside], last_edge)
+    # Bins containing the ends of the (clipped) segments
+    first = np.clip(np.searchsorted(bin_edges, lower, side="right") - 1, 0, nb_bins - 1)
+    last = np.clip(np.searchsorted(bin_edges, upper, side="left") - 1, 0, nb_bins - 1)
+    counts += np.bincount(
+        first,
+        density * (np.minimum(upper, bin_edges[first + 1]) - lower),
+        minlength=nb_bins,
+    )
+    spanning = last > first
+    counts += np.bincount(
+        last[spanning],
+        density[spanning] * (upper[spanning] - bin_edges[last[spanning]]),
+        minlength=nb_bins,
+    )
+    # Bins between the first and the last bin are covered completely. Only
+    # segments covering a bin have entries, which bounds their densities by
+    # weight over bin width and avoids cancellation in the cumulative sum.
+    covering = last > first + 1
+    covered = np.bincount(
+        first[covering] + 1, density[covering], minlength=nb_bins
+    ) - np.bincount(last[covering], density[covering], minlength=nb_bins)
+    counts += np.cumsum(covered) * np.diff(bin_edges)
+    return counts
+
+
+def segment_histogram(lower, upper, weights, bins, range):
+    """Probability density of weighted segments, whose weights are
+    distributed uniformly over the bins between `lower` and `upper`, as
+    `np.histogram` with `density=True`.
+
+    Parameters
+    ----------
+    lower: np.ndarray
+        Lower ends of the segments
+    upper: np.ndarray
+        Upper ends of the segments
+    weights: np.ndarray
+        Weights of the segments
+    bins: int or np.ndarray
+        Number of bins or bin edges
+    range: tuple of float
+        Lower and upper range of the bins
+
+    Returns
+    -------
+    hist: np.ndarray
+        Probability density
+    bin_edges: np.ndarray
+        Bin edges
+    """
+    bin_edges = np.histogram_bin_edges(lower, bins=bins, range=range)
+    counts = segment_counts(lower, upper, weights, bin_edges)
+    # Same order of operations as `np.histogram`
+    return counts / np.diff(bin_edges) / counts.sum(), bin_edges
+
+
+def _segment_quantiles(lower, upper, weights, quantiles):
+    """Quantiles of weighted segments. The cumulative weight is piecewise
+    linear between the ends of the segments, where it is evaluated exactly."""
+    ends = np.unique(np.concatenate([lower, upper]))
+    if len(ends) == 1:
+        return np.full(len(quantiles), ends[0])
+    cumulative = np.concatenate(
+        [[0], np.cumsum(segment_counts(lower, upper, weights, ends))]
+    )
+    return np.interp(quantiles, cumulative / cumulative[-1], ends)
+
+
+def _weighted_quantiles(values, weights, quantiles):
+    """Quantiles of weighted values from their cumulative weights."""
+    order = np.argsort(values)
+    values = values[order]
+    cumulative = np.cumsum(weights[order], dtype=np.float64)
+    # Cumulative weight at the center of each value
+    centers = (cumulative - weights[order] / 2) / cumulative[-1]
+    return np.interp(quantiles, centers, values)
+
+
+def robust_weighted_histogram(values, weights, moments, max_nb_bins):
+    """Histogram of weighted values on a robust range, see
+    `binning.robust_histogram`.
+
+    Parameters
+    ----------
+    values: np.ndarray
+        Values
+    weights: np.ndarray
+        Weights of the values
+    moments: moments.Moments
+        Moments of the values
+    max_nb_bins: int
+        Maximum number of bins
+
+    Returns
+    -------
+    hist: np.ndarray
+        Probability density, normalized by the total weight of all values
+        (including those outside of the range)
+    bin_edges: np.ndarray
+        Bin edges
+    nb_below: int
+        Number of values below the range
+    nb_above: int
+        Number of values above the range
+    """
+    lower, upper, nb_bins = robust_bins(
+        _weighted_quantiles(values, weights, ROBUST_QUANTILES), moments, max_nb_bins
+    )
+    counts, bin_edges = np.histogram(
+        values, bins=nb_bins, range=(lower, upper), weights=weights
+    )
+    hist = counts / (np.sum(weights, dtype=np.float64) * (upper - lower) / nb_bins)
+    return (
+        hist,
+        bin_edges,
+        int(np.count_nonzero(values < lower)),
+        int(np.count_nonzero(values > upper)),
+    )
+
+
+def robust_segment_histogram(lower, upper, weights, moments, max_nb_bins):
+    """Histogram of weighted segments (see `segment_histogram`) on a robust
+    range, see `binning.robust_histogram`.
+
+    Parameters
+    ----------
+    lower: np.ndarray
+        Lower ends of the segments
+    upper: np.ndarray
+        Upper ends of the segments
+    weights: np.ndarray
+        Weights of the segments
+    moments: moments.Moments
+        Moments of the segments
+    max_nb_bins: int
+        Maximum number of bins
+
+    Returns
+    -------
+    hist: np.ndarray
+        Probability density, normalized by the total weight of all segments
+        (including the parts outside of the range)
+    bin_edges: np.ndarray
+        Bin edges
+    nb_below: int
+        Number of segments extending below the range
+    nb_above: int
+        Number of segments extending above the range
+    """
+    range_lower, range_upper, nb_bins = robust_bins(
+        _segment_quantiles(lower, upper, weights, ROBUST_QUANTILES),
+        moments,
+        max_nb_bins,
+    )
+    bin_edges = np.linspace(range_lower, range_upper, nb_bins + 1)
+    counts = segment_counts(lower, upper, weights, bin_edges)
+    hist = counts / (
+        np.sum(weights, dtype=np.float64) * (range_upper - range_lower) / nb_bins
+    )
+    return (
+        hist,
+        bin_edges,
+        int(np.count_nonzero(lower < range_lower)),
+        int(np.count_nonzero(upper > range_upper)),
+    )
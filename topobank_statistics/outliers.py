@@ -0,0 +1,184 @@
+"""
+Robust outlier statistics of several quantities at once.
+
+Extreme local slopes or curvatures, typically stemming from overhangs or
+other measurement artifacts, can dominate RMS values. Outliers are detected
+with Chauvenet's criterion on a robust scale: a value is an outlier if it
+lies more than `z_c` robust standard deviations from the median, where the
+robust standard deviation is estimated from the median absolute deviation
+(MAD) and `z_c = Phi^{-1}(1 - 1 / (4 N))` is the deviation beyond which fewer
+than half an observation is expected among `N` normal samples.
+
+`outlier_statistics` evaluates medians, MADs, thresholds, outlier masks and
+(trimmed) RMS values of a stack of quantities (e.g. the slopes in x- and
+y-direction) with vectorized reductions along the samples, such that
+additional quantities cost little extra.
+"""
+
+import numpy as np
+from scipy.special import erfcinv
+
+# Rescales the MAD to a standard-deviation estimate for normal data
+MAD_TO_STD = 1.4826
+
+# Minimum number of values for which outliers are defined
+MIN_NB_VALUES = 3
+
+
+def stack_samples(arrays):
+    """Stack the (valid) values of several arrays into a masked array of
+    shape (number of arrays, number of samples).
+
+    Parameters
+    ----------
+    arrays: list of np.ndarray or np.ma.MaskedArray
+        Arrays of any shape, masked entries are ignored
+
+    Returns
+    -------
+    np.ndarray or np.ma.MaskedArray
+        Stacked values; rows of arrays with fewer values are padded with
+        masked entries
+    """
+    rows = [np.ma.ravel(arr) for arr in arrays]
+    nb_samples = max(len(row) for row in rows)
+    if all(len(row) == nb_samples for row in rows):
+        if all(np.ma.getmask(row) is np.ma.nomask for row in rows):
+            return np.stack([np.ma.getdata(row) for row in rows])
+        return np.ma.stack(rows)
+    stack = np.ma.masked_all(
+        (len(rows), nb_samples), dtype=np.result_type(*[row.dtype for row in rows])
+    )
+    for i, row in enumerate(rows):
+        stack[i, : len(row)] = row
+    return stack
+
+
+class OutlierStatistics:
+    """Chauvenet outlier statistics of the rows of a stack of quantities.
+
+    All attributes are arrays with one entry per row.
+
+    Attributes
+    ----------
+    count: np.ndarray of int
+        Number of valid values
+    median: np.ndarray
+        Median
+    mad: np.ndarray
+        Median absolute deviation from the median
+    z_c: np.ndarray
+        Chauvenet threshold in robust standard deviations, NaN if no outlier
+        can be defined (fewer than `MIN_NB_VALUES` values or zero or
+        non-finite MAD)
+    mask: np.ndarray of bool
+        True for outliers, of shape (number of rows, number of samples)
+    nb_outliers: np.ndarray of int
+        Number of outliers
+    rms_full: np.ndarray
+        Root mean square of all valid values
+    rms_trimmed: np.ndarray
+        Root mean square of the valid values that are not outliers, NaN if
+        all values are outliers
+    """
+
+    def __init__(self, count, median, mad, z_c, mask, rms_full, rms_trimmed):
+        self.count = count
+        self.median = median
+        self.mad = mad
+        self.z_c = z_c
+        self.mask = mask
+        self.nb_outliers = np.count_nonzero(mask, axis=1)
+        self.rms_full = rms_full
+        self.rms_trimmed = rms_trimmed
+
+    def report(self, row):
+        """Summary of the outliers of a row.
+
+        Parameters
+        ----------
+        row: int
+            Index of the row
+
+        Returns
+        -------
+        dict or None
+            Dictionary with `n_outliers`, `z_c`, `rms_full` and `rms_trimmed`,
+            or None if there are no outliers
+        """
+        if self.nb_outliers[row] == 0:
+            return None
+        return {
+            "n_outliers": int(self.nb_outliers[row]),
+            "z_c": self.z_c[row],
+            "rms_full": float(self.rms_full[row]),
+            "rms_trimmed": float(self.rms_trimmed[row]),
+        }
+
+
+def _rms(values, where=None):
+    """Root mean square of the values (where `where` is True) along the last
+    axis, accumulated in float64; NaN for rows without values."""
+    if where is None:
+        count = np.full(values.shape[:-1], values.shape[-1])
+        where = True
+    else:
+        count = np.count_nonzero(where, axis=-1)
+    sum_of_squares = np.add.reduce(
+        np.square(values), axis=-1, dtype=np.float64, where=where
+    )
+    return np.where(
+        count > 0, np.sqrt(sum_of_squares / np.maximum(count, 1)), np.nan
+    )
+
+
+def outlier_statistics(values):
+    """Chauvenet outliers of each row of a stack of quantities.
+
+    Parameters
+    ----------
+    values: np.ndarray or np.ma.MaskedArray or list of arrays
+        Stack with one quantity (e.g. a direction) per row and samples along
+        the remaining axes. Masked entries are ignored. Lists of arrays are
+        stacked with `stack_samples`.
+
+    Returns
+    -------
+    OutlierStatistics
+    """
+    if isinstance(values, (list, tuple)):
+        values = stack_samples(values)
+    values = np.ma.asarray(values)
+    nb_rows = values.shape[0]
+    data = np.ma.getdata(values).reshape(nb_rows, -1)
+    if np.ma.getmask(values) is np.ma.nomask:
+        valid = None
+        count = np.full(nb_rows, data.shape[1])
+        median = np.median(data, axis=1)
+        deviation = np.abs(data - median[:, np.newaxis])
+        mad = np.median(deviation, axis=1)
+    else:
+        valid = ~np.ma.getmaskarray(values).reshape(nb_rows, -1)
+        count = np.count_nonzero(valid, axis=1)
+        with np.errstate(invalid="ignore"):
+            median = np.nanmedian(np.where(valid, data, np.nan), axis=1)
+            deviation = np.abs(data - median[:, np.newaxis])
+            mad = np.nanmedian(np.where(valid, deviation, np.nan), axis=1)
+
+    robust_sigma = MAD_TO_STD * mad
+    defined = (count >= MIN_NB_VALUES) & np.isfinite(robust_sigma) & (robust_sigma > 0)
+    # Chauvenet: flag when N * P(|Z| > z_c) < 1/2. With P(|Z| > z) = erfc(z/sqrt2)
+    # this gives z_c = sqrt(2) * erfcinv(1 / (2 N)).
+    z_c = np.where(
+        defined, np.sqrt(2) * erfcinv(1.0 / (2 * np.maximum(count, 1))), np.nan
+    )
+    with np.errstate(invalid="ignore"):
+        mask = deviation > (z_c * robust_sigma)[:, np.newaxis]
+    mask &= defined[:, np.newaxis]
+    if valid is not None:
+        mask &= valid
+
+    inliers = ~mask if valid is None else valid & ~mask
+    return OutlierStatistics(
+        count, median, mad, z_c, mask, _rms(data, valid), _rms(data, inliers)
+    )
@@ -0,0 +1,176 @@
+"""
+Multithreaded evaluation over the topographies of a surface.
+
+The topographies of a surface are evaluated concurrently by a pool of
+threads of the calling process. Unlike worker processes, threads can be
+started from any process, including the daemonic children of Celery's
+prefork pool (the default execution model of topobank's workers), and they
+share the height fields with the calling thread, such that nothing is
+copied or pickled. The vectorized NumPy operations and FFTs that dominate
+the workflows release the GIL, such that the threads run in parallel.
+
+Topographies are loaded (and converted to the requested unit) by the
+calling thread, which also reports progress; at most `2 * workers` loaded
+topographies are held at a time.
+
+The number of threads is set by the `TOPOBANK_STATISTICS_SURFACE_WORKERS`
+setting (Default: 1, i.e. sequential evaluation in the calling thread).
+"""
+
+import functools
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from SurfaceTopography.Exceptions import (NoReliableDataError,
+                                          UndefinedDataError)
+
+# Parameters of `log_average` that are not passed on to the property
+_LOG_AVERAGE_PARAMETERS = ["nb_points_per_decade", "reliable"]
+
+
+def surface_workers():
+    """Number of threads for the topographies of a surface."""
+    return getattr(settings, "TOPOBANK_STATISTICS_SURFACE_WORKERS", 1)
+
+
+def map_topographies(func, topographies, unit=None, workers=None, progress_callback=None):
+    """Apply a function to all topographies of a container.
+
+    Parameters
+    ----------
+    func: callable
+        Function taking a topography. With more than one worker, `func` is
+        called concurrently from several threads (for different
+        topographies).
+    topographies: SurfaceContainer or list
+        Topographies
+    unit: str, optional
+        Convert topographies to this unit before calling `func`.
+        (Default: None)
+    workers: int, optional
+        Number of threads. (Default: `surface_workers()`)
+    progress_callback: callable, optional
+        Function called with the number of topographies processed and the
+        total number of topographies. (Default: None)
+
+    Returns
+    -------
+    list
+        Return values of `func`, in the order of `topographies`
+    """
+    if workers is None:
+        workers = surface_workers()
+    nb_topographies = len(topographies)
+
+    def report(i):
+        if progress_callback is not None:
+            progress_callback(i, nb_topographies)
+
+    def prepare(topography):
+        return topography if unit is None else topography.to_unit(unit)
+
+    if workers <= 1:
+        results = []
+        for i, topography in enumerate(topographies):
+            report(i)
+            results.append(func(prepare(topography)))
+        report(nb_topographies)
+        return results
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            pending = set()
+            for topography in topographies:
+                # Bound the number of loaded topographies
+                while len(pending) >= 2 * workers:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    report(len(futures) - len(pending))
+                future = executor.submit(func, prepare(topography))
+                futures.append(future)
+                pending.add(future)
+            while pending:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                report(len(futures) - len(pending))
+            return [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+class _PrecomputedProperty:
+    """Stand-in for a topography in `log_average` whose property has already
+    been computed."""
+
+    def __init__(self, function_name, result):
+        self._function_name = function_name
+        self._result = result
+
+    def to_unit(self, unit):
+        return self
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name != self._function_name:
+            raise AttributeError(name)
+        return self._property
+
+    def _property(self, **kwargs):
+        if isinstance(self._result, Exception):
+            raise self._result
+        return self._result
+
+
+def _compute_property(topography, function_name, reliable, kwargs):
+    try:
+        return getattr(topography, function_name)(
+            reliable=reliable, resampling_method=None, **kwargs
+        )
+    except (NoReliableDataError, UndefinedDataError) as exc:
+        return exc
+
+
+def precompute_for_average(
+    topographies, function_name, unit, workers=None, progress_callback=None, **kwargs
+):
+    """Compute a property of all topographies in worker threads.
+
+    Parameters
+    ----------
+    topographies: SurfaceContainer
+        Topographies
+    function_name: str
+        Name of the property, e.g. 'power_spectrum_from_profile'
+    unit: str
+        Unit of the topographies
+    workers: int, optional
+        Number of threads. (Default: `surface_workers()`)
+    progress_callback: callable, optional
+        Progress callback, see `map_topographies`. (Default: None)
+    **kwargs
+        Keyword arguments of `log_average`
+
+    Returns
+    -------
+    list
+        Stand-ins for the topographies that can be passed to `log_average`
+        with the same arguments instead of the topographies
+    """
+    reliable = kwargs.get("reliable", True)
+    kwargs = {
+        key: value
+        for key, value in kwargs.items()
+        if key not in _LOG_AVERAGE_PARAMETERS
+    }
+    results = map_topographies(
+        functools.partial(
+            _compute_property,
+            function_name=function_name,
+            reliable=reliable,
+            kwargs=kwargs,
+        ),
+        topographies,
+        unit=unit,
+        workers=workers,
+        progress_callback=progress_callback,
+    )
+    return [_PrecomputedProperty(function_name, result) for result in results]
@@ -0,0 +1,280 @@
+"""
+Reduced-precision (float32) evaluation of distribution and roughness
+workflows.
+
+Many instruments deliver heights with 16 or 32 bits of precision, while
+SurfaceTopography converts heights and their derivatives to float64. With
+reduced precision, the height field and its finite-difference derivatives
+are kept in float32, which halves memory footprint and bandwidth, while all
+sums (means, RMS values) are accumulated in float64.
+
+The precision is selected per analysis by the `precision` parameter of the
+workflows ('float32' or None) or globally with the setting
+`TOPOBANK_STATISTICS_PRECISION` ('float64', the default, or 'float32').
+Topographies with undefined data are always evaluated in float64.
+
+The reduced-precision height field does not keep a reference to the float64
+topography it is converted from, such that the workflows can release the
+float64 heights, and RMS values are evaluated without float64 temporaries of
+the size of the height field.
+"""
+
+import numpy as np
+from django.conf import settings
+
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+
+
+def compute_dtype(precision=None):
+    """Return the floating-point type for a precision.
+
+    Parameters
+    ----------
+    precision: str, optional
+        'float64' or 'float32'. (Default: `TOPOBANK_STATISTICS_PRECISION`
+        setting or 'float64')
+
+    Returns
+    -------
+    type
+        `np.float64` or `np.float32`
+    """
+    if precision is None:
+        precision = getattr(settings, "TOPOBANK_STATISTICS_PRECISION", "float64")
+    try:
+        return PRECISIONS[precision]
+    except KeyError:
+        raise ValueError(
+            f"Unknown precision '{precision}'. Available precisions: "
+            f"{', '.join(PRECISIONS)}"
+        )
+
+
+def mean(arr):
+    """Mean of (possibly masked) values, accumulated in float64."""
+    return np.ma.mean(arr, dtype=np.float64)
+
+
+def rms(arr):
+    """Root mean square of (possibly masked) values, accumulated in float64."""
+    return np.sqrt(np.ma.mean(np.square(arr), dtype=np.float64))
+
+
+def std(arr):
+    """Standard deviation of (possibly masked) values, accumulated in
+    float64."""
+    return np.ma.std(arr, dtype=np.float64)
+
+
+def rms_about_mean(arr, axis=None):
+    """Root mean square of the deviations of `arr` from its mean along
+    `axis`, accumulated in float64 with temporaries in the precision of
+    `arr`.
+
+    Parameters
+    ----------
+    arr: np.ndarray
+        Values without undefined data
+    axis: int, optional
+        Axis along which means are subtracted; None subtracts the mean of all
+        values. (Default: None)
+
+    Returns
+    -------
+    float
+    """
+    center = np.mean(arr, axis=axis, dtype=np.float64, keepdims=True)
+    deviation = arr - center.astype(arr.dtype)
+    # Mean of the deviations left by rounding the mean to the precision of
+    # `arr`; subtracted exactly from the mean square
+    offset = np.mean(deviation, axis=axis, dtype=np.float64)
+    np.square(deviation, out=deviation)
+    mean_square = np.mean(deviation, dtype=np.float64) - np.mean(np.square(offset))
+    return np.sqrt(max(mean_square, 0))
+
+
+def _difference(heights, n, axis, periodic):
+    """Finite difference of order `n` along `axis` with the stencils of
+    SurfaceTopography's default derivative operators."""
+    if periodic:
+        if n == 1:
+            # Upwind differences
+            return np.roll(heights, -1, axis=axis) - heights
+        # Central differences
+        return (
+            np.roll(heights, -1, axis=axis)
+            - 2 * heights
+            + np.roll(heights, 1, axis=axis)
+        )
+    return np.diff(heights, n=n, axis=axis)
+
+
+def _trim(arr, n, axis):
+    """Trim `arr` in direction `axis` as the (2D) stencil of order `n`
+    extends in the direction perpendicular to the derivative."""
+    index = [slice(None)] * arr.ndim
+    index[axis] = slice(None, -1) if n == 1 else slice(1, -1)
+    return arr[tuple(index)]
+
+
+class ReducedPrecisionTopography:
+    """Height field of a uniform topography or line scan in reduced
+    precision.
+
+    Implements the subset of the SurfaceTopography interface used by the
+    distribution and roughness workflows (metadata, default finite-difference
+    derivatives and RMS parameters) on heights of type `dtype`.
+    Derivatives are computed once and kept. Only metadata of `topography`
+    is kept, not the topography itself.
+
+    Parameters
+    ----------
+    topography: SurfaceTopography.Topography or SurfaceTopography.UniformLineScan
+        Uniform topography without undefined data
+    dtype: type, optional
+        Floating-point type of heights and derivatives. (Default: np.float32)
+    """
+
+    is_uniform = True
+    has_undefined_data = False
+
+    def __init__(self, topography, dtype=np.float32, _heights=None):
+        if _heights is None:
+            _heights = np.asarray(topography.heights(), dtype=dtype)
+        self._heights = _heights
+        self._physical_sizes = tuple(np.atleast_1d(topography.physical_sizes))
+        self._is_periodic = topography.is_periodic
+        self._unit = topography.unit
+        self._info = topography.info
+        self._derivatives = {}
+
+    @property
+    def dim(self):
+        return self._heights.ndim
+
+    @property
+    def is_periodic(self):
+        return self._is_periodic
+
+    @property
+    def unit(self):
+        return self._unit
+
+    @property
+    def info(self):
+        return self._info
+
+    @property
+    def nb_grid_pts(self):
+        return self._heights.shape
+
+    @property
+    def physical_sizes(self):
+        return self._physical_sizes
+
+    @property
+    def pixel_size(self):
+        return tuple(s / n for s, n in zip(self.physical_sizes, self.nb_grid_pts))
+
+    def heights(self):
+        return self._heights
+
+    def bandwidth(self):
+        """Lower and upper bound of the bandwidth, as `bandwidth()` of
+        SurfaceTopography."""
+        return np.mean(self.pixel_size), np.mean(self.physical_sizes)
+
+    def transpose(self):
+        """Return a transposed instance sharing the height array."""
+        transposed = ReducedPrecisionTopography(self, _heights=self._heights.T)
+        transposed._physical_sizes = self._physical_sizes[::-1]
+        return transposed
+
+    def derivative(self, n):
+        """First or second derivative with the same stencils and trimming as
+        `derivative(n)` of SurfaceTopography.
+
+        Parameters
+        ----------
+        n: int
+            Order of derivative, 1 or 2
+
+        Returns
+        -------
+        np.ndarray or tuple of np.ndarray
+            Derivative for line scans, derivatives in x- and y-direction for
+            maps
+        """
+        if n not in (1, 2):
+            raise ValueError(f"Don't know how to compute derivative of order {n}.")
+        try:
+            return self._derivatives[n]
+        except KeyError:
+            pass
+        periodic = self.is_periodic
+        derivatives = []
+        for axis, pixel_size in enumerate(self.pixel_size):
+            # Scale in the (reduced) precision of the heights
+            scale = self._heights.dtype.type(1 / pixel_size**n)
+            d = _difference(self._heights, n, axis, periodic)
+            d *= scale
+            if self.dim == 2 and not periodic:
+                d = _trim(d, n, 1 - axis)
+            derivatives.append(d)
+        self._derivatives[n] = derivatives[0] if self.dim == 1 else tuple(derivatives)
+        return self._derivatives[n]
+
+    def _profile_derivative(self, n):
+        return self.derivative(n) if self.dim == 1 else self.derivative(n)[0]
+
+    def rms_height_from_profile(self):
+        return rms_about_mean(self._heights, axis=0)
+
+    def rms_height_from_area(self):
+        return rms_about_mean(self._heights)
+
+    def rms_slope_from_profile(self):
+        return rms(self._profile_derivative(1))
+
+    def rms_curvature_from_profile(self):
+        return rms(self._profile_derivative(2))
+
+    def rms_gradient(self):
+        dx, dy = self.derivative(1)
+        return np.sqrt(
+            np.mean(np.square(dx), dtype=np.float64)
+            + np.mean(np.square(dy), dtype=np.float64)
+        )
+
+    def rms_laplacian(self):
+        cx, cy = self.derivative(2)
+        return rms(cx + cy)
+
+    def rms_curvature_from_area(self):
+        return self.rms_laplacian() / 2
+
+
+def reduced_precision(topography, precision=None):
+    """Return `topography` or a reduced-precision version of it.
+
+    Parameters
+    ----------
+    topography: SurfaceTopography topography instance
+        Topography or line scan
+    precision: str, optional
+        'float64' or 'float32', see `compute_dtype`. (Default: None)
+
+    Returns
+    -------
+    SurfaceTopography topography instance or ReducedPrecisionTopography
+        `topography` itself for float64 precision, nonuniform line scans
+        and topographies with undefined data.
+    """
+    dtype = compute_dtype(precision)
+    if (
+        dtype is np.float64
+        or not topography.is_uniform
+        or topography.has_undefined_data
+    ):
+        return topography
+    return ReducedPrecisionTopography(topography, dtype=dtype)
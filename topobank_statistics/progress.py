@@ -0,0 +1,250 @@
+"""
+Push-based progress reporting for statistics analyses.
+
+Workers publish progress to the Django cache (cheap, no database write) and
+only forward it to the task's progress recorder (a database write) at a
+much lower rate. The progress stream view reads the published values and
+pushes them to the client as server-sent events.
+"""
+
+import contextlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+PROGRESS_CACHE_KEY = "topobank_statistics:progress:{}"
+
+# Published progress expires if a worker dies without finishing
+PROGRESS_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def publish_progress(analysis_id, current, total):
+    """Publish progress of an analysis to the cache."""
+    cache.set(
+        PROGRESS_CACHE_KEY.format(analysis_id),
+        dict(current=current, total=total),
+        PROGRESS_CACHE_TIMEOUT,
+    )
+
+
+def get_progress(analysis_id):
+    """Return published progress of an analysis as dict or None."""
+    return cache.get(PROGRESS_CACHE_KEY.format(analysis_id))
+
+
+def get_progress_many(analysis_ids):
+    """Return published progress of several analyses with a single cache
+    lookup, as dict mapping analysis ids to progress dicts. Analyses without
+    published progress are missing."""
+    keys = {
+        PROGRESS_CACHE_KEY.format(analysis_id): analysis_id
+        for analysis_id in analysis_ids
+    }
+    return {
+        keys[key]: progress for key, progress in cache.get_many(list(keys)).items()
+    }
+
+
+class ProgressRelay:
+    """Progress recorder that throttles publishing and database writes.
+
+    Has the same `set_progress(current, total)` interface as the progress
+    recorder handed to workflow implementations and can hence be used as a
+    drop-in replacement. Progress is published to the cache at most every
+    `TOPOBANK_STATISTICS_PROGRESS_PUBLISH_INTERVAL` seconds and forwarded to
+    the wrapped progress recorder at most every
+    `TOPOBANK_STATISTICS_PROGRESS_DB_INTERVAL` seconds, and in both cases
+    only if it advanced by at least the fraction
+    `TOPOBANK_STATISTICS_PROGRESS_MIN_DELTA` of the total since it was last
+    published or forwarded. Progress that completes the task is always
+    published and forwarded; `flush` publishes and forwards progress held
+    back by the throttling.
+
+    Parameters
+    ----------
+    analysis_id: int or None
+        Id of the analysis; nothing is published if None
+    progress_recorder: ProgressRecorder or None
+        Recorder that stores progress in the database
+    """
+
+    def __init__(self, analysis_id, progress_recorder=None):
+        self._analysis_id = analysis_id
+        self._progress_recorder = progress_recorder
+        self._publish_interval = getattr(
+            settings, "TOPOBANK_STATISTICS_PROGRESS_PUBLISH_INTERVAL", 0.2
+        )
+        self._db_interval = getattr(
+            settings, "TOPOBANK_STATISTICS_PROGRESS_DB_INTERVAL", 5.0
+        )
+        self._min_delta = getattr(
+            settings, "TOPOBANK_STATISTICS_PROGRESS_MIN_DELTA", 0.01
+        )
+        self._last_publish = None
+        self._last_db_write = None
+        self._published = None
+        self._written = None
+        self._current = None
+
+    @staticmethod
+    def _is_due(now, last_time, interval, last_progress, progress, min_delta):
+        """Whether throttled progress is due to be published or forwarded."""
+        if last_time is None:
+            return True
+        last_current, last_total = last_progress
+        current, total = progress
+        if current >= total or last_total <= 0:
+            return True
+        return (
+            now - last_time >= interval
+            and current / total - last_current / last_total >= min_delta
+        )
+
+    def set_progress(self, current, total):
+        now = time.monotonic()
+        self._current = (current, total)
+        if self._analysis_id is not None and self._is_due(
+            now, self._last_publish, self._publish_interval,
+            self._published, self._current, self._min_delta
+        ):
+            publish_progress(self._analysis_id, current, total)
+            self._last_publish = now
+            self._published = self._current
+        if self._progress_recorder is not None and self._is_due(
+            now, self._last_db_write, self._db_interval,
+            self._written, self._current, self._min_delta
+        ):
+            self._progress_recorder.set_progress(current, total)
+            self._last_db_write = now
+            self._written = self._current
+
+    def flush(self):
+        """Publish and forward the last progress if it was held back."""
+        if self._current is None:
+            return
+        now = time.monotonic()
+        current, total = self._current
+        if self._analysis_id is not None and self._published != self._current:
+            publish_progress(self._analysis_id, current, total)
+            self._last_publish = now
+            self._published = self._current
+        if self._progress_recorder is not None and self._written != self._current:
+            self._progress_recorder.set_progress(current, total)
+            self._last_db_write = now
+            self._written = self._current
+
+
+@contextlib.contextmanager
+def progress_relay(analysis, progress_recorder):
+    """Context manager yielding a `ProgressRelay` for an analysis, or None if
+    not needed. The relay is flushed on exit, such that the last progress
+    held back by the throttling is not lost."""
+    analysis_id = getattr(analysis, "id", None)
+    if analysis_id is None and progress_recorder is None:
+        yield None
+        return
+    relay = ProgressRelay(analysis_id, progress_recorder)
+    try:
+        yield relay
+    finally:
+        relay.flush()
+
+
+class _PhaseMixin:
+    """Splitting of a progress range into consecutive (nested) phases."""
+
+    def phase(self, weight=1, total=1):
+        """Return the next phase of this progress range.
+
+        Phases are laid out consecutively in the order in which they are
+        created. Each phase is a progress callback `(i, n)` (as used by
+        SurfaceTopography) and can itself be split into phases.
+
+        Parameters
+        ----------
+        weight: float
+            Share of this range (in units of its `total`) covered by the phase
+        total: float
+            Number of units into which the phase is subdivided for its own
+            sub-phases
+
+        Returns
+        -------
+        ProgressPhase
+        """
+        start = self._start + self._width * self._next_offset / self._total
+        width = self._width * weight / self._total
+        self._next_offset += weight
+        return ProgressPhase(self._aggregator, start, width, total)
+
+
+class ProgressPhase(_PhaseMixin):
+    """Part of the progress of a `ProgressAggregator`, see `phase`."""
+
+    def __init__(self, aggregator, start, width, total=1):
+        self._aggregator = aggregator
+        self._start = start
+        self._width = width
+        self._total = total
+        self._next_offset = 0
+
+    def __call__(self, i, n):
+        # SurfaceTopography calls with i = 0, ..., n - 1 before each iteration
+        # and with i = n once done; clamp to guard against callers that report
+        # more than n.
+        fraction = 1 if n <= 0 else min(max(i / n, 0), 1)
+        self._aggregator.report(self._start + self._width * fraction)
+
+
+class ProgressAggregator(_PhaseMixin):
+    """Compose nested progress into a single clamped stream.
+
+    Progress reports of all phases are mapped onto the range from 0 to
+    `total` and forwarded to the progress recorder. Reported progress never
+    decreases and never exceeds `total`. Reports are not throttled here;
+    wrap the recorder in a `ProgressRelay` to limit publishing and database
+    writes.
+
+    Parameters
+    ----------
+    progress_recorder: ProgressRecorder or None
+        Recorder with a `set_progress(current, total)` method
+    total: float
+        Total number of units of work
+    """
+
+    def __init__(self, progress_recorder, total=1):
+        self._aggregator = self
+        self._progress_recorder = progress_recorder
+        self._start = 0
+        self._width = total
+        self._total = total
+        self._next_offset = 0
+        self._reported = None
+
+    @property
+    def reported(self):
+        """Last progress value forwarded to the progress recorder."""
+        return self._reported
+
+    def report(self, current):
+        """Report absolute progress (in units of `total`)."""
+        if self._progress_recorder is None:
+            return
+        current = min(max(current, 0), self._total)
+        if self._reported is not None and current <= self._reported:
+            return
+        self._progress_recorder.set_progress(current, self._total)
+        self._reported = current
+
+    def finish(self):
+        """Report completion of the whole range."""
+        self.report(self._total)
+
+    def callback(self):
+        """Return a progress callback for a single phase spanning everything,
+        or None if there is no progress recorder."""
+        if self._progress_recorder is None:
+            return None
+        return self.phase(self._total - self._next_offset)
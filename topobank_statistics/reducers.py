@@ -0,0 +1,123 @@
+"""
+Named reducers for scale-dependent statistics.
+
+A reducer maps the derivative of a topography in x- and (for maps)
+y-direction to a scalar, ``reducer(dx, dy=None) -> float``, as expected by
+`scale_dependent_statistical_property`. Unlike lambdas, the reducers here
+are picklable (e.g. for process pools), compare equal by name and avoid
+allocating full temporaries: mean squares and mean products are computed as
+dot products.
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+def _mean_product(a, b):
+    """Return the mean of the element-wise product of `a` and `b`."""
+    if np.ndim(a) == 0 or np.ndim(b) == 0:
+        # SurfaceTopography feeds NaN scalars for distances without data
+        return float(np.mean(a * b))
+    if np.ma.is_masked(a) or np.ma.is_masked(b):
+        mask = np.ma.getmaskarray(a) | np.ma.getmaskarray(b)
+        a = np.ma.getdata(a)[~mask]
+        b = np.ma.getdata(b)[~mask]
+    else:
+        a = np.ma.getdata(a).ravel()
+        b = np.ma.getdata(b).ravel()
+    if a.size == 0:
+        return np.nan
+    return float(np.vdot(a, b)) / a.size
+
+
+def _mean_squares(x, y):
+    """Return mean of x², y² and x·y over the points where both are defined."""
+    if np.ma.is_masked(x) or np.ma.is_masked(y):
+        mask = np.ma.getmaskarray(x) | np.ma.getmaskarray(y)
+        x = np.ma.masked_array(np.ma.getdata(x), mask=mask)
+        y = np.ma.masked_array(np.ma.getdata(y), mask=mask)
+    return _mean_product(x, x), _mean_product(y, y), _mean_product(x, y)
+
+
+class Reducer(ABC):
+    """Base class of named reducers."""
+
+    name = None
+
+    @abstractmethod
+    def __call__(self, x, y=None):
+        """Reduce the derivatives `x` and `y` to a scalar."""
+
+    def __eq__(self, other):
+        return type(self) is type(other)
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class MeanSquareX(Reducer):
+    """Mean square of the derivative in x-direction."""
+
+    name = "mean_square_x"
+
+    def __call__(self, x, y=None):
+        return _mean_product(x, x)
+
+
+class MeanSquareY(Reducer):
+    """Mean square of the derivative in y-direction."""
+
+    name = "mean_square_y"
+
+    def __call__(self, x, y):
+        return _mean_product(y, y)
+
+
+class Gradient(Reducer):
+    """Mean square of the gradient, i.e. mean of x² + y²."""
+
+    name = "gradient"
+
+    def __call__(self, x, y):
+        xx, yy, _ = _mean_squares(x, y)
+        return xx + yy
+
+
+class HalfLaplacian(Reducer):
+    """Mean square of half the Laplacian, i.e. mean of (x + y)² / 4."""
+
+    name = "half_laplacian"
+
+    def __call__(self, x, y):
+        xx, yy, xy = _mean_squares(x, y)
+        return (xx + yy + 2 * xy) / 4
+
+
+REDUCERS = {
+    reducer.name: reducer
+    for reducer in [MeanSquareX(), MeanSquareY(), Gradient(), HalfLaplacian()]
+}
+
+
+def get_reducer(name):
+    """Return the reducer registered under `name`.
+
+    Parameters
+    ----------
+    name: str
+        Name of the reducer, e.g. 'gradient'
+
+    Returns
+    -------
+    Reducer
+    """
+    try:
+        return REDUCERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown reducer '{name}'. Available reducers: {', '.join(REDUCERS)}"
+        )
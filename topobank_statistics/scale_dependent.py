@@ -0,0 +1,260 @@
+"""
+Scale-dependent statistics of derivatives.
+
+SurfaceTopography computes scale-dependent derivatives of a topography at a
+series of distances and reduces them with a user-supplied function. The
+helpers here evaluate several reductions per distance in a single sweep
+over the derivative fields and apply the reliability cutoff afterwards, so
+that the (expensive) derivatives are computed only once for all statistics
+and for reliable as well as unreliable data.
+
+Optionally, large distances are evaluated on block-averaged (multigrid)
+copies of the topography. A derivative at distance `d` only probes
+wavelengths of order `d`; on a grid coarsened by a factor `f` it costs
+O(N / f^dim) instead of O(N).
+"""
+
+import numpy as np
+from SurfaceTopography import Topography, UniformLineScan
+from SurfaceTopography.Support.Regression import make_grid
+
+# Minimum number of (coarse) pixels spanned by the derivative stencil before
+# a distance is evaluated on a coarser grid
+MULTIGRID_MIN_PIXELS = 16
+
+# Default maximum relative deviation between the results on a coarse grid
+# level and at full resolution
+DEFAULT_MULTIGRID_TOLERANCE = 0.01
+
+
+class _StackedReducer:
+    """Reducer returning the results of several reducers as an array."""
+
+    def __init__(self, funcs):
+        self._funcs = list(funcs)
+
+    def __call__(self, dx, dy=None):
+        if dy is None:
+            return np.array([f(dx) for f in self._funcs])
+        return np.array([f(dx, dy) for f in self._funcs])
+
+
+def coarsen(topography):
+    """Return a copy of a uniform topography block-averaged over 2 (x 2)
+    pixels.
+
+    Parameters
+    ----------
+    topography: SurfaceTopography.Topography or SurfaceTopography.UniformLineScan
+        Topography to coarsen
+
+    Returns
+    -------
+    SurfaceTopography.Topography or SurfaceTopography.UniformLineScan or None
+        Coarsened topography, or None if the number of grid points is odd in
+        some direction.
+    """
+    nb_grid_pts = topography.nb_grid_pts
+    if any(nb % 2 != 0 for nb in nb_grid_pts):
+        return None
+    heights = topography.heights()
+    kwargs = dict(periodic=topography.is_periodic, unit=topography.unit)
+    if topography.dim == 1:
+        (nx,) = nb_grid_pts
+        heights = heights.reshape(nx // 2, 2).mean(axis=1)
+        return UniformLineScan(heights, topography.physical_sizes[0], **kwargs)
+    nx, ny = nb_grid_pts
+    heights = heights.reshape(nx // 2, 2, ny // 2, 2).mean(axis=(1, 3))
+    return Topography(heights, topography.physical_sizes, **kwargs)
+
+
+def _evaluate(topography, reducer, n, distances, progress_callback, **kwargs):
+    _, values = topography.scale_dependent_statistical_property(
+        reducer,
+        n=n,
+        distance=distances,
+        reliable=False,
+        progress_callback=progress_callback,
+        **kwargs,
+    )
+    return np.asarray(values).reshape(len(distances), -1)
+
+
+def _multigrid_evaluate(
+    topography, reducer, n, distances, tolerance, progress_callback, **kwargs
+):
+    """Evaluate `reducer` at `distances`, coarsening the topography for large
+    distances while coarse grid levels agree with full resolution within
+    `tolerance`."""
+    nb_distances = len(distances)
+    values = None
+    offset = 0
+
+    def level_callback(start, stop):
+        if progress_callback is None:
+            return None
+
+        def callback(i, n):
+            fraction = 1 if n <= 0 else i / n
+            progress_callback(start + fraction * (stop - start), nb_distances)
+
+        return callback
+
+    def store(start, stop, v):
+        nonlocal values
+        if values is None:
+            values = np.empty((nb_distances, v.shape[1]))
+        values[start:stop] = v
+
+    pixel_size = max(topography.pixel_size)
+    factor = 1
+    current = topography
+    while offset < nb_distances:
+        coarse = coarsen(current)
+        if coarse is None:
+            stop = nb_distances
+        else:
+            # Distances whose stencil spans enough pixels of the coarser grid
+            threshold = MULTIGRID_MIN_PIXELS * n * 2 * factor * pixel_size
+            stop = max(offset, np.searchsorted(distances, threshold))
+        if stop > offset:
+            store(
+                offset,
+                stop,
+                _evaluate(
+                    current,
+                    reducer,
+                    n,
+                    distances[offset:stop],
+                    level_callback(offset, stop),
+                    **kwargs,
+                ),
+            )
+            offset = stop
+        if offset >= nb_distances:
+            break
+
+        # Compare the coarser level to full resolution at its first distance,
+        # such that deviations do not accumulate over levels
+        d = distances[offset : offset + 1]
+        fine_value = _evaluate(topography, reducer, n, d, None, **kwargs)
+        coarse_value = _evaluate(coarse, reducer, n, d, None, **kwargs)
+        store(offset, offset + 1, fine_value)
+        offset += 1
+        if progress_callback is not None:
+            progress_callback(offset, nb_distances)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            deviation = np.abs(coarse_value - fine_value) / np.abs(fine_value)
+        if not np.all(np.isfinite(deviation) & (deviation <= tolerance)):
+            # Coarsening is too inaccurate; stay on this level
+            if offset < nb_distances:
+                store(
+                    offset,
+                    nb_distances,
+                    _evaluate(
+                        current,
+                        reducer,
+                        n,
+                        distances[offset:],
+                        level_callback(offset, nb_distances),
+                        **kwargs,
+                    ),
+                )
+            break
+        current = coarse
+        factor *= 2
+
+    if progress_callback is not None:
+        progress_callback(nb_distances, nb_distances)
+    return values
+
+
+def scale_dependent_statistics(
+    topography,
+    funcs,
+    n=1,
+    progress_callback=None,
+    multigrid=False,
+    multigrid_tolerance=DEFAULT_MULTIGRID_TOLERANCE,
+    nb_points_per_decade=10,
+    **kwargs,
+):
+    """Evaluate several statistics of scale-dependent derivatives at once.
+
+    Parameters
+    ----------
+    topography: SurfaceTopography topography instance
+        Topography or line scan
+    funcs: list of callables
+        Reductions ``func(dx, dy=None) -> float`` of the derivative in x- and
+        (for maps) y-direction
+    n: int, optional
+        Order of derivative. (Default: 1)
+    progress_callback: callable, optional
+        Progress callback ``(i, n)``. (Default: None)
+    multigrid: bool, optional
+        Evaluate large distances on block-averaged copies of the topography.
+        A distance is moved to a grid coarsened by a factor of two once the
+        derivative stencil spans `MULTIGRID_MIN_PIXELS` coarse pixels, and
+        only if, at the first such distance, all statistics on the coarse
+        grid deviate by at most `multigrid_tolerance` (relative) from those
+        at full resolution. Coarsening stops at odd numbers of grid points.
+        Note that at distances approaching the scan size, where only few
+        independent samples remain, results may fluctuate between levels by
+        more than the tolerance, as they would for a slightly shifted scan.
+        Ignored for nonuniform line scans. (Default: False)
+    multigrid_tolerance: float, optional
+        Maximum relative deviation of a coarse grid level from full
+        resolution.
+        (Default: 0.01)
+    nb_points_per_decade: int, optional
+        Number of distances per decade. (Default: 10)
+    **kwargs
+        Further arguments for `scale_dependent_statistical_property`
+
+    Returns
+    -------
+    distances: np.ndarray
+        Distances at which the statistics were computed (including those
+        with unreliable data)
+    values: list of np.ndarray
+        Values of each reduction in `funcs` at `distances`
+    reliable: np.ndarray of bool
+        True for distances with reliable data
+    """
+    reducer = _StackedReducer(funcs)
+    if multigrid and topography.is_uniform and "distance" not in kwargs:
+        # Same collocation points as `scale_dependent_statistical_property`
+        lower, upper = topography.bandwidth()
+        distances, _ = make_grid(
+            "log", n * lower, upper, nb_points_per_decade=nb_points_per_decade
+        )
+        values = _multigrid_evaluate(
+            topography,
+            reducer,
+            n,
+            distances,
+            multigrid_tolerance,
+            progress_callback,
+            **kwargs,
+        )
+    else:
+        distances, values = topography.scale_dependent_statistical_property(
+            reducer,
+            n=n,
+            reliable=False,
+            progress_callback=progress_callback,
+            nb_points_per_decade=nb_points_per_decade,
+            **kwargs,
+        )
+    distances = np.asarray(distances)
+    values = np.asarray(values).reshape(len(distances), len(funcs))
+
+    # Same criterion as `scale_dependent_statistical_property(reliable=True)`
+    short_cutoff = topography.short_reliability_cutoff()
+    if short_cutoff is None:
+        reliable = np.ones(len(distances), dtype=bool)
+    else:
+        reliable = distances > short_cutoff * n / 2
+
+    return distances, [values[:, i] for i in range(len(funcs))], reliable
@@ -0,0 +1,110 @@
+"""
+Sparse histogram series.
+
+Distributions with many bins (explicit bin edges, or the long tails of slope
+and curvature distributions) are mostly empty. A sparse series only stores
+the nonzero bins: `x` and `y` are the centers and values of these bins,
+`bins` their indices and `edges` an encoding of all bin edges (lower and
+upper edge and number of bins if the edges are uniform, the list of edges
+otherwise). `expand_series` restores the dense series; the distribution
+card view (`views.distribution_card_view`) serves expanded results.
+"""
+
+import numpy as np
+
+
+def encode_bin_edges(bin_edges):
+    """Compact, lossless representation of bin edges.
+
+    Parameters
+    ----------
+    bin_edges: np.ndarray
+        Bin edges
+
+    Returns
+    -------
+    dict or list
+        Lower edge, upper edge and number of bins for uniform bins (if the
+        edges are exactly reproduced by `np.linspace`), list of edges
+        otherwise
+    """
+    bin_edges = np.asarray(bin_edges, dtype=float)
+    lower, upper, nb_bins = float(bin_edges[0]), float(bin_edges[-1]), len(bin_edges) - 1
+    if np.array_equal(np.linspace(lower, upper, nb_bins + 1), bin_edges):
+        return dict(lower=lower, upper=upper, nb_bins=nb_bins)
+    return bin_edges.tolist()
+
+
+def decode_bin_edges(edges):
+    """Bin edges from their representation by `encode_bin_edges`."""
+    if isinstance(edges, dict):
+        return np.linspace(edges["lower"], edges["upper"], edges["nb_bins"] + 1)
+    return np.asarray(edges, dtype=float)
+
+
+def histogram_series(name, bin_edges, hist, sparse=False):
+    """Series of a histogram.
+
+    Parameters
+    ----------
+    name: str
+        Name of the series
+    bin_edges: np.ndarray
+        Bin edges
+    hist: np.ndarray
+        Value (e.g. probability density) of each bin
+    sparse: bool, optional
+        Only store nonzero bins. (Default: False)
+
+    Returns
+    -------
+    dict
+        Series with bin centers as `x` and values as `y`
+    """
+    x = (bin_edges[:-1] + bin_edges[1:]) / 2
+    if not sparse:
+        return dict(name=name, x=x, y=hist)
+    bins = np.flatnonzero(hist)
+    return dict(
+        name=name,
+        x=x[bins],
+        y=np.asarray(hist)[bins],
+        bins=bins,
+        edges=encode_bin_edges(bin_edges),
+    )
+
+
+def is_sparse(series):
+    """True for series returned by `histogram_series(..., sparse=True)`."""
+    return "bins" in series and "edges" in series
+
+
+def expand_series(series):
+    """Dense version of a (possibly sparse) histogram series.
+
+    Parameters
+    ----------
+    series: dict
+        Series
+
+    Returns
+    -------
+    dict
+        Series with one point per bin; dense series are returned unchanged
+    """
+    if not is_sparse(series):
+        return series
+    series = dict(series)
+    bin_edges = decode_bin_edges(series.pop("edges"))
+    bins = np.asarray(series.pop("bins"), dtype=int)
+    y = np.zeros(len(bin_edges) - 1)
+    y[bins] = series["y"]
+    series.update(x=(bin_edges[:-1] + bin_edges[1:]) / 2, y=y)
+    return series
+
+
+def expand_result(result):
+    """Return analysis result with all sparse series expanded."""
+    if not isinstance(result, dict) or "series" not in result:
+        return result
+    return dict(result, series=[expand_series(s) for s in result["series"]])
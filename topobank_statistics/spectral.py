@@ -0,0 +1,351 @@
+"""
+Per-process cache of Fourier spectra for the PSD and ACF workflows.
+
+SurfaceTopography's `power_spectrum_from_*` and `autocorrelation_from_*`
+transform the height field on every call, although the workflows call each
+of them twice (for reliable and for all data) and the PSD and ACF of a
+periodic topography are derived from the same squared Fourier amplitudes.
+The functions here compute the transforms once, keep them in an LRU cache
+keyed by the content of the topography, and only repeat the (cheap)
+resampling. Results are identical to SurfaceTopography's for the
+'bin-average' resampling with 'log' collocation used by the workflows.
+
+Caching is opt-in: `TOPOBANK_STATISTICS_SPECTRAL_CACHE_SIZE` sets the
+maximum total size of the cached transforms in bytes (default 0, i.e.
+disabled). Without the cache, and for topographies the transforms do not
+support (nonuniform or with undefined data), the functions call
+SurfaceTopography's own implementation. The cache lives in every worker process and is not shared, so
+the memory used by a worker grows by up to this size; a few times the size
+of the transform of a typical topography (16 bytes per grid point) suffices
+to reuse the transforms within an analysis.
+"""
+
+import functools
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from SurfaceTopography.Support import fold_fft_half
+from SurfaceTopography.Support.Regression import resample, resample_radial
+
+from .cache import topography_fingerprint
+from .fft_backend import fft_functions
+
+DEFAULT_CACHE_SIZE = 0  # Disabled
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+class SpectralCache:
+    """Thread-safe LRU cache of arrays, bounded by their total size.
+
+    Parameters
+    ----------
+    max_size: int
+        Maximum total size of cached arrays in bytes
+    """
+
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute):
+        """Return value cached under `key`, calling `compute()` on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = compute()
+        # Cached arrays are shared between callers and must not be modified
+        for arr in value if isinstance(value, tuple) else (value,):
+            if isinstance(arr, np.ndarray):
+                arr.flags.writeable = False
+        size = _nbytes(value)
+        if size > self._max_size:
+            return value
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self._size += size
+                while self._size > self._max_size:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= _nbytes(evicted)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+@functools.lru_cache(maxsize=None)
+def _spectral_cache(max_size):
+    return SpectralCache(max_size)
+
+
+def spectral_cache():
+    """Return the configured spectral cache, or None if caching is disabled."""
+    max_size = getattr(
+        settings, "TOPOBANK_STATISTICS_SPECTRAL_CACHE_SIZE", DEFAULT_CACHE_SIZE
+    )
+    if not max_size:
+        return None
+    return _spectral_cache(max_size)
+
+
+# Fingerprints of topography objects, such that repeated calls for the same
+# object do not rehash the height field
+_fingerprints = weakref.WeakKeyDictionary()
+
+
+def _cached(topography, key, compute):
+    cache = spectral_cache()
+    if cache is None:
+        return compute()
+    try:
+        fingerprint = _fingerprints[topography]
+    except KeyError:
+        fingerprint = _fingerprints[topography] = topography_fingerprint(topography)
+    return cache.get_or_compute((fingerprint,) + key, compute)
+
+
+def _effective_window(topography, window):
+    """Window actually applied by SurfaceTopography's window pipeline."""
+    if window is None:
+        return None if topography.is_periodic else "hann"
+    if window == "None":
+        return None
+    return window
+
+
+def _profile_power(topography, window):
+    """Squared amplitudes of the FFT of the (windowed) heights along x."""
+
+    def compute():
+        h = topography.window(window).heights()
+        return np.abs(fft_functions().fft(h, axis=0)) ** 2
+
+    return _cached(
+        topography, ("profile_power", _effective_window(topography, window)), compute
+    )
+
+
+def _area_power(topography, window):
+    """Squared amplitudes of the 2D FFT of the (windowed) heights."""
+
+    def compute():
+        h = topography.window(window=window, direction="radial").heights()
+        return np.abs(fft_functions().fft2(h)) ** 2
+
+    return _cached(
+        topography, ("area_power", _effective_window(topography, window)), compute
+    )
+
+
+def _can_use(topography):
+    """Whether the cached transforms are used for a topography."""
+    return (
+        spectral_cache() is not None
+        and topography.is_uniform
+        and not topography.has_undefined_data
+    )
+
+
+def power_spectrum_from_profile(
+    topography, window=None, reliable=True, nb_points_per_decade=10
+):
+    """Same as `power_spectrum_from_profile` of SurfaceTopography, but
+    reusing cached Fourier transforms."""
+    if not _can_use(topography):
+        return topography.power_spectrum_from_profile(
+            window=window, reliable=reliable, nb_points_per_decade=nb_points_per_decade
+        )
+    nx = topography.nb_grid_pts[0]
+    sx = topography.physical_sizes[0]
+
+    C_all = fold_fft_half(sx / nx**2 * _profile_power(topography, window), nx)
+    q = 2 * np.pi / sx * np.arange(nx // 2)
+
+    if reliable:
+        max_value = 2 * np.pi / topography.short_reliability_cutoff(2 * sx / nx)
+    else:
+        max_value = np.pi * nx / sx
+    # Exclude zero wavevector for log-spaced collocation
+    q = q[1:]
+    C_all = C_all[1:]
+    if topography.dim == 2:
+        q = np.resize(q, (C_all.shape[1], q.shape[0])).T.ravel()
+        C_all = np.ravel(C_all)
+    q, _, C, _ = resample(
+        q,
+        C_all,
+        min_value=np.min(q[q > 0]),
+        max_value=max_value,
+        collocation="log",
+        nb_points=None,
+        nb_points_per_decade=nb_points_per_decade,
+        method="bin-average",
+    )
+    return q, C
+
+
+def power_spectrum_from_area(
+    topography, window=None, reliable=True, nb_points_per_decade=10
+):
+    """Same as `power_spectrum_from_area` of SurfaceTopography, but reusing
+    cached Fourier transforms."""
+    if not _can_use(topography):
+        return topography.power_spectrum_from_area(
+            window=window, reliable=reliable, nb_points_per_decade=nb_points_per_decade
+        )
+    nx, ny = topography.nb_grid_pts
+    sx, sy = topography.physical_sizes
+
+    qmax = np.pi * min(nx / sx, ny / sy)
+    if reliable:
+        short_cutoff = topography.short_reliability_cutoff()
+        if short_cutoff is not None:
+            qmax = 2 * np.pi / short_cutoff
+
+    C_qk = topography.area_per_pt**2 / (sx * sy) * _area_power(topography, window)
+    q, _, C, _ = resample_radial(
+        C_qk,
+        physical_sizes=(2 * np.pi * nx / sx, 2 * np.pi * ny / sy),
+        collocation="log",
+        nb_points=None,
+        nb_points_per_decade=nb_points_per_decade,
+        max_radius=qmax,
+        method="bin-average",
+    )
+    return q, C
+
+
+def _profile_autocorrelation(topography):
+    """Height-difference ACF along x on the grid of the data."""
+
+    def compute():
+        fft = fft_functions()
+        nx = topography.nb_grid_pts[0]
+        sx = topography.physical_sizes[0]
+        if topography.is_periodic:
+            # Same transform as the unwindowed power spectrum
+            A_xy = fft.ifft(_profile_power(topography, None), axis=0).real / nx
+            A_xy = A_xy[0] - A_xy
+            A = fold_fft_half(A_xy, nx)
+            r = sx * np.arange(nx // 2) / nx
+        else:
+            p = topography.heights()
+            A_xy = fft.ifft(
+                np.abs(fft.fft(p, n=2 * nx - 1, axis=0)) ** 2, axis=0
+            ).real
+            p_sq = p**2
+            A0_xy = (p_sq.cumsum(axis=0)[::-1] + p_sq[::-1].cumsum(axis=0)[::-1]) / 2
+            A = ((A0_xy - A_xy[:nx]).T / (nx - np.arange(nx))).T
+            r = sx * np.arange(nx) / nx
+        return r, A
+
+    return _cached(topography, ("profile_acf",), compute)
+
+
+def _area_autocorrelation(topography):
+    """Height-difference ACF map."""
+
+    def compute():
+        fft = fft_functions()
+        nx, ny = topography.nb_grid_pts
+        if topography.is_periodic:
+            # Same transform as the unwindowed power spectrum
+            A_xy = fft.ifft2(_area_power(topography, None)).real / (nx * ny)
+            return A_xy[0, 0] - A_xy
+        p = topography.heights()
+        A_xy = fft.ifft2(
+            np.abs(fft.fft2(p, s=(2 * nx - 1, 2 * ny - 1))) ** 2
+        ).real
+        p_sq = p**2
+        A0_xy = (
+            p_sq.cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+            + p_sq[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+        ) / 2
+        return (A0_xy - A_xy[:nx, :ny]) / (
+            (nx - np.arange(nx)).reshape(-1, 1) * (ny - np.arange(ny)).reshape(1, -1)
+        )
+
+    return _cached(topography, ("area_acf",), compute)
+
+
+def autocorrelation_from_profile(topography, reliable=True, nb_points_per_decade=10):
+    """Same as `autocorrelation_from_profile` of SurfaceTopography, but
+    reusing cached Fourier transforms."""
+    if not _can_use(topography):
+        return topography.autocorrelation_from_profile(
+            reliable=reliable, nb_points_per_decade=nb_points_per_decade
+        )
+    nx = topography.nb_grid_pts[0]
+    sx = topography.physical_sizes[0]
+
+    r, A = _profile_autocorrelation(topography)
+    max_distance = sx / 2 if topography.is_periodic else sx
+    if reliable:
+        short_cutoff = topography.short_reliability_cutoff(2 * sx / nx)
+    else:
+        short_cutoff = 2 * sx / nx
+    # Exclude zero distance for log-spaced collocation
+    r = r[1:]
+    A = A[1:]
+    if topography.dim == 2:
+        r = np.resize(r, (A.shape[1], r.shape[0])).T.ravel()
+        A = np.ravel(A)
+    r, _, A, _ = resample(
+        r,
+        A,
+        min_value=short_cutoff / 2,
+        max_value=max_distance,
+        collocation="log",
+        nb_points=None,
+        nb_points_per_decade=nb_points_per_decade,
+        method="bin-average",
+    )
+    return r, A
+
+
+def autocorrelation_from_area(topography, reliable=True, nb_points_per_decade=5):
+    """Same as `autocorrelation_from_area` of SurfaceTopography, but reusing
+    cached Fourier transforms."""
+    if not _can_use(topography):
+        return topography.autocorrelation_from_area(
+            reliable=reliable, nb_points_per_decade=nb_points_per_decade
+        )
+    sx, sy = topography.physical_sizes
+    pixel_size = np.mean(topography.pixel_size)
+
+    if reliable:
+        short_cutoff = topography.short_reliability_cutoff(2 * pixel_size)
+    else:
+        short_cutoff = 2 * pixel_size
+    kwargs = dict(
+        physical_sizes=(sx, sy),
+        collocation="log",
+        nb_points=None,
+        nb_points_per_decade=nb_points_per_decade,
+        min_radius=short_cutoff / 2,
+        method="bin-average",
+    )
+    if topography.is_periodic:
+        kwargs.update(max_radius=(sx + sy) / 4)
+    else:
+        kwargs.update(max_radius=(sx + sy) / 2, full=False)
+    r, _, A, _ = resample_radial(_area_autocorrelation(topography), **kwargs)
+    return r, A
@@ -0,0 +1,229 @@
+"""
+Synthetic test subjects for benchmarks and load tests.
+
+All generators are deterministic for a given `seed` and leave the global
+state of `np.random` untouched. Self-affine height fields are generated by
+Fourier synthesis with a given Hurst exponent.
+"""
+
+import numpy as np
+from SurfaceTopography import NonuniformLineScan
+from SurfaceTopography.Generation import fourier_synthesis
+from topobank.testing.utils import FakeTopographyModel
+
+
+def _seeded(func, seed):
+    """Call `func` with `np.random` seeded, restoring its state afterwards."""
+    state = np.random.get_state()
+    try:
+        np.random.seed(seed)
+        return func()
+    finally:
+        np.random.set_state(state)
+
+
+def self_affine_topography(
+    nb_grid_pts,
+    physical_sizes=None,
+    hurst=0.8,
+    rms_height=1e-9,
+    unit="m",
+    periodic=False,
+    seed=0,
+):
+    """Self-affine line scan or map.
+
+    Parameters
+    ----------
+    nb_grid_pts: tuple of int
+        Number of grid points; a tuple of length one for line scans
+    physical_sizes: tuple of float, optional
+        Physical sizes. (Default: 1 nm per grid point)
+    hurst: float, optional
+        Hurst exponent. (Default: 0.8)
+    rms_height: float, optional
+        RMS height. (Default: 1e-9)
+    unit: str, optional
+        Length unit. (Default: 'm')
+    periodic: bool, optional
+        Periodic topography. (Default: False)
+    seed: int, optional
+        Seed of the random numbers. (Default: 0)
+
+    Returns
+    -------
+    SurfaceTopography.UniformLineScan or SurfaceTopography.Topography
+    """
+    nb_grid_pts = tuple(nb_grid_pts)
+    if physical_sizes is None:
+        physical_sizes = tuple(1e-9 * n for n in nb_grid_pts)
+    return _seeded(
+        lambda: fourier_synthesis(
+            nb_grid_pts,
+            tuple(physical_sizes),
+            hurst=hurst,
+            rms_height=rms_height,
+            unit=unit,
+            periodic=periodic,
+        ),
+        seed,
+    )
+
+
+def masked_topography(nb_grid_pts, fraction=0.05, **kwargs):
+    """Self-affine topography with undefined data points at its highest
+    peaks.
+
+    Parameters
+    ----------
+    nb_grid_pts: tuple of int
+        Number of grid points
+    fraction: float, optional
+        Fraction of masked (undefined) data points. (Default: 0.05)
+    **kwargs
+        Further arguments of `self_affine_topography`
+
+    Returns
+    -------
+    SurfaceTopography.UniformLineScan or SurfaceTopography.Topography
+    """
+    topography = self_affine_topography(nb_grid_pts, **kwargs)
+    heights = topography.heights()
+    mask = heights > np.percentile(heights, 100 * (1 - fraction))
+    return topography.__class__(
+        np.ma.masked_array(heights, mask=mask),
+        topography.physical_sizes,
+        periodic=topography.is_periodic,
+        unit=topography.unit,
+    )
+
+
+def nonuniform_line_scan(nb_points, length=None, hurst=0.8, rms_height=1e-9, unit="m", seed=0):
+    """Self-affine line scan sampled at random positions.
+
+    Parameters
+    ----------
+    nb_points: int
+        Number of data points
+    length: float, optional
+        Length of the line scan. (Default: 1 nm per data point)
+    hurst: float, optional
+        Hurst exponent. (Default: 0.8)
+    rms_height: float, optional
+        RMS height. (Default: 1e-9)
+    unit: str, optional
+        Length unit. (Default: 'm')
+    seed: int, optional
+        Seed of the random numbers. (Default: 0)
+
+    Returns
+    -------
+    SurfaceTopography.NonuniformLineScan
+    """
+    if length is None:
+        length = 1e-9 * nb_points
+    # Interpolate a uniform line scan of four times the resolution whose last
+    # grid point is at `length`
+    nb_uniform = 4 * nb_points
+    uniform = self_affine_topography(
+        (nb_uniform,),
+        (length * nb_uniform / (nb_uniform - 1),),
+        hurst=hurst,
+        rms_height=rms_height,
+        unit=unit,
+        seed=seed,
+    )
+    x_uniform, h_uniform = uniform.positions_and_heights()
+    x = np.sort(
+        _seeded(lambda: np.random.uniform(0, length, size=nb_points - 2), seed)
+    )
+    x = np.concatenate([[0], x, [length]])
+    return NonuniformLineScan(x, np.interp(x, x_uniform, h_uniform), unit=unit)
+
+
+def reentrant_line_scan(nb_points, nb_steps=3, **kwargs):
+    """Nonuniform line scan with vertical steps (repeated positions), as
+    obtained for measurements of overhangs.
+
+    Parameters
+    ----------
+    nb_points: int
+        Number of data points (without the steps)
+    nb_steps: int, optional
+        Number of vertical steps. (Default: 3)
+    **kwargs
+        Further arguments of `nonuniform_line_scan`
+
+    Returns
+    -------
+    SurfaceTopography.NonuniformLineScan
+    """
+    line_scan = nonuniform_line_scan(nb_points, **kwargs)
+    x, h = line_scan.positions_and_heights()
+    indices = np.linspace(0, len(x) - 1, nb_steps + 2).astype(int)[1:-1]
+    step_height = 3 * np.std(h)
+    x = np.insert(x, indices, x[indices])
+    h = np.insert(h, indices, h[indices] + step_height)
+    return NonuniformLineScan(x, h, unit=line_scan.unit)
+
+
+class _TopographySet:
+    def __init__(self, topographies):
+        self._topographies = topographies
+
+    def all(self):
+        return self._topographies
+
+    def count(self):
+        return len(self._topographies)
+
+
+class FakeSurface:
+    """Stand-in for a topobank surface model.
+
+    Parameters
+    ----------
+    topographies: list of SurfaceTopography topographies
+        Topographies of the surface
+    name: str, optional
+        Name of the surface. (Default: 'synthetic surface')
+    """
+
+    def __init__(self, topographies, name="synthetic surface"):
+        self.name = name
+        self.topography_set = _TopographySet(
+            [
+                FakeTopographyModel(t, name=f"{name} #{i}")
+                for i, t in enumerate(topographies)
+            ]
+        )
+
+
+def synthetic_surface(nb_topographies, nb_grid_pts, name="synthetic surface", seed=0, **kwargs):
+    """Surface with self-affine topographies of the same statistics.
+
+    Parameters
+    ----------
+    nb_topographies: int
+        Number of topographies
+    nb_grid_pts: tuple of int
+        Number of grid points of each topography
+    name: str, optional
+        Name of the surface. (Default: 'synthetic surface')
+    seed: int, optional
+        Seed of the first topography; topography `i` uses `seed + i`.
+        (Default: 0)
+    **kwargs
+        Further arguments of `self_affine_topography`
+
+    Returns
+    -------
+    FakeSurface
+    """
+    return FakeSurface(
+        [
+            self_affine_topography(nb_grid_pts, seed=seed + i, **kwargs)
+            for i in range(nb_topographies)
+        ],
+        name=name,
+    )
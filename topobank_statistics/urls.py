@@ -1,7 +1,9 @@
 from django.urls import path
 
 from .workflows import APP_NAME, VIZ_ROUGHNESS_PARAMETERS
-from .views import roughness_parameters_card_view
+from .views import (distribution_card_view, progress_stream_view,
+                    roughness_parameters_card_view,
+                    roughness_parameters_card_view_async)
 
 # App name determines the internal name space
 app_name = APP_NAME
@@ -16,4 +18,25 @@ urlpatterns = [
         view=roughness_parameters_card_view,
         name=f'card-{VIZ_ROUGHNESS_PARAMETERS}'
     ),
+    # GET
+    # * Same as above, but served asynchronously (for ASGI deployments)
+    path(
+        f'card/{VIZ_ROUGHNESS_PARAMETERS}-async/<str:workflow>',
+        view=roughness_parameters_card_view_async,
+        name=f'card-{VIZ_ROUGHNESS_PARAMETERS}-async'
+    ),
+    # GET
+    # * Return results of distributions with sparse histograms expanded
+    path(
+        'card/distribution/<str:workflow>',
+        view=distribution_card_view,
+        name='card-distribution'
+    ),
+    # GET
+    # * Stream progress of analyses as server-sent events
+    path(
+        'progress/<str:workflow>',
+        view=progress_stream_view,
+        name='progress'
+    ),
 ]
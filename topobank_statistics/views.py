@@ -1,71 +1,76 @@
+import asyncio
+import dataclasses
+import functools
+import json
 import math
+import time
 
+from asgiref.sync import sync_to_async
 from django.urls import reverse
 
-from django.db import transaction
+from django.db import connection, transaction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from drf_spectacular.utils import OpenApiTypes, extend_schema
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from topobank_rest_api.analysis.v1.controller import AnalysisController
 
+from .progress import get_progress_many
+from .sparse import expand_result
 from .utils import round_to_significant_digits
 
 NUM_SIGNIFICANT_DIGITS_RMS_VALUES = 5
 
+# Task states after which an analysis does not change anymore
+FINAL_TASK_STATES = ['su', 'fa']
 
-@extend_schema(
-    description="Get roughness parameters card view data",
-    request=None,
-    responses=OpenApiTypes.OBJECT,
-)
-@api_view(['GET'])
-@transaction.non_atomic_requests
-def roughness_parameters_card_view(request, **kwargs):
-    def _convert_value(v):
-        if v is not None:
-            if math.isnan(v):
-                v = None  # will be interpreted as null in JS, replace there with NaN!
-                # It's not easy to pass NaN as JSON:
-                # https://stackoverflow.com/questions/15228651/how-to-parse-json-string-containing-nan-in-node-js
-            elif math.isinf(v):
-                return 'infinity'
-            else:
-                # convert float32 to float, round to fixed number of significant digits
-                v = round_to_significant_digits(float(v), NUM_SIGNIFICANT_DIGITS_RMS_VALUES)
-        return v
 
-    controller = AnalysisController.from_request(request, **kwargs)
+def _convert_value(v):
+    if v is not None:
+        if math.isnan(v):
+            v = None  # will be interpreted as null in JS, replace there with NaN!
+            # It's not easy to pass NaN as JSON:
+            # https://stackoverflow.com/questions/15228651/how-to-parse-json-string-containing-nan-in-node-js
+        elif math.isinf(v):
+            return 'infinity'
+        else:
+            # convert float32 to float, round to fixed number of significant digits
+            v = round_to_significant_digits(float(v), NUM_SIGNIFICANT_DIGITS_RMS_VALUES)
+    return v
 
-    #
-    # Filter only successful ones
-    #
-    analyses_success = controller.get(['su'], True)
 
-    #
-    # Basic context data
-    #
-    context = controller.get_context(request=request)
+def _analysis_rows(analysis):
+    """Return the table rows for a single (successful) analysis."""
+    analysis_result = analysis.result
 
-    data = []
-    for analysis in analyses_success:
-        analysis_result = analysis.result
+    for d in analysis_result:
+        d['value'] = _convert_value(d['value'])
 
-        for d in analysis_result:
-            d['value'] = _convert_value(d['value'])
+        if not d['direction']:
+            d['direction'] = ''
+        if not d['from']:
+            d['from'] = ''
+        if not d['symbol']:
+            d['symbol'] = ''
 
-            if not d['direction']:
-                d['direction'] = ''
-            if not d['from']:
-                d['from'] = ''
-            if not d['symbol']:
-                d['symbol'] = ''
+        # put topography in every line
+        topo = analysis.subject
+        d.update(dict(topography_name=topo.name,
+                      topography_url=reverse("manager:topography-api-detail", kwargs={"pk": topo.pk})))
 
-            # put topography in every line
-            topo = analysis.subject
-            d.update(dict(topography_name=topo.name,
-                          topography_url=reverse("manager:topography-api-detail", kwargs={"pk": topo.pk})))
+    return analysis_result
 
-        data.extend(analysis_result)
+
+def _table_data(rows_per_analysis):
+    """Merge rows of all analyses into a table where every row has all keys."""
+    data = []
+    for rows in rows_per_analysis:
+        data.extend(rows)
 
     #
     # find out all existing keys while keeping order
@@ -83,12 +88,267 @@ def roughness_parameters_card_view(request, **kwargs):
         for d in data:
             d.setdefault(k)
 
+    return data
+
+
+@extend_schema(
+    description="Get roughness parameters card view data",
+    request=None,
+    responses=OpenApiTypes.OBJECT,
+)
+@api_view(['GET'])
+@transaction.non_atomic_requests
+def roughness_parameters_card_view(request, **kwargs):
+    controller = AnalysisController.from_request(request, **kwargs)
+
+    #
+    # Filter only successful ones
+    #
+    analyses_success = controller.get(['su'], True)
+
+    #
+    # Basic context data
+    #
+    context = controller.get_context(request=request)
+
     #
     # create table
     #
-    context['tableData'] = data
+    context['tableData'] = _table_data(_analysis_rows(analysis) for analysis in analyses_success)
 
     #
     # Return context
     #
     return Response(context)
+
+
+def _dense_result(analysis):
+    """Return the result of a single (successful) distribution analysis with
+    sparse histogram series expanded and the name of its subject."""
+    return dict(expand_result(analysis.result), subject_name=analysis.subject.name)
+
+
+@extend_schema(
+    description="Get distribution card view data with dense histogram series",
+    request=None,
+    responses=OpenApiTypes.OBJECT,
+)
+@api_view(['GET'])
+@transaction.non_atomic_requests
+def distribution_card_view(request, **kwargs):
+    """Results of height, slope and curvature distributions.
+
+    Distributions computed with `sparse=True` only store their nonzero bins;
+    they are expanded here, such that clients always receive one point per
+    bin.
+    """
+    controller = AnalysisController.from_request(request, **kwargs)
+
+    #
+    # Filter only successful ones
+    #
+    analyses_success = controller.get(['su'], True)
+
+    #
+    # Basic context data
+    #
+    context = controller.get_context(request=request)
+    context['results'] = [_dense_result(analysis) for analysis in analyses_success]
+
+    return Response(context)
+
+
+@dataclasses.dataclass
+class _RequestedAnalyses:
+    """Analyses requested from an async view, or the response reporting why
+    they cannot be accessed."""
+
+    view: APIView = None
+    request: Request = None
+    controller: AnalysisController = None
+    analyses: list = None
+    response: HttpResponse = None
+
+
+def _requested_analyses(request, get_args=(), load_subjects=False, **kwargs):
+    """Run the checks of a DRF `api_view` for GET requests (method,
+    authentication, permissions and throttling) and return the requested
+    analyses.
+
+    Parameters
+    ----------
+    request: django.http.HttpRequest
+        Request
+    get_args: tuple, optional
+        Arguments of `AnalysisController.get`. (Default: ())
+    load_subjects: bool, optional
+        Load the subjects of the analyses, such that later accesses do not
+        query the database. (Default: False)
+    **kwargs
+        Arguments of the view
+
+    Returns
+    -------
+    _RequestedAnalyses
+    """
+    view = APIView()
+    view.args, view.kwargs = (), kwargs
+    drf_request = view.initialize_request(request, **kwargs)
+    view.request = drf_request
+    view.headers = view.default_response_headers
+    try:
+        view.initial(drf_request, **kwargs)
+        if drf_request.method != 'GET':
+            raise MethodNotAllowed(drf_request.method)
+        controller = AnalysisController.from_request(drf_request, **kwargs)
+        analyses = list(controller.get(*get_args))
+        if load_subjects:
+            for analysis in analyses:
+                analysis.subject
+    except Exception as exc:
+        response = view.finalize_response(drf_request, view.handle_exception(exc))
+        return _RequestedAnalyses(response=response.render())
+    return _RequestedAnalyses(view, drf_request, controller, analyses)
+
+
+def _analysis_rows_in_thread(analysis):
+    """`_analysis_rows` for threads outside of Django's thread-sensitive
+    executor, which close their database connection when done."""
+    try:
+        return _analysis_rows(analysis)
+    finally:
+        connection.close()
+
+
+@transaction.non_atomic_requests
+async def roughness_parameters_card_view_async(request, **kwargs):
+    """ASGI-compatible variant of `roughness_parameters_card_view`.
+
+    Authentication, permissions and the query of the analyses run in
+    Django's thread-sensitive executor. The context of the card and the
+    results of all analyses, which are read from the result storage, are
+    then fetched concurrently: the context in the thread-sensitive executor,
+    the results in a pool of threads. The event loop is not blocked while
+    waiting on the database or the storage. The response has the same
+    content as the synchronous view.
+    """
+    requested = await sync_to_async(_requested_analyses)(
+        request, get_args=(['su'], True), load_subjects=True, **kwargs
+    )
+    if requested.response is not None:
+        return requested.response
+
+    context, *rows_per_analysis = await asyncio.gather(
+        sync_to_async(requested.controller.get_context)(request=requested.request),
+        *(
+            sync_to_async(_analysis_rows_in_thread, thread_sensitive=False)(analysis)
+            for analysis in requested.analyses
+        ),
+    )
+    context['tableData'] = _table_data(rows_per_analysis)
+    response = requested.view.finalize_response(requested.request, Response(context))
+    return response.render()
+
+
+def _fetch_task_states(model, ids):
+    """Return the task states of the analyses `ids` of `model` with a single
+    query."""
+    return dict(model._default_manager.filter(id__in=ids).values_list('id', 'task_state'))
+
+
+def _snapshot(task_states):
+    """Return the states of the analyses as reported by the progress stream."""
+    progress = get_progress_many(list(task_states))
+    return [
+        dict(id=analysis_id, task_state=task_state, progress=progress.get(analysis_id))
+        for analysis_id, task_state in task_states.items()
+    ]
+
+
+async def _progress_events(task_states, fetch_task_states, max_duration=None):
+    """Yield server-sent events with the progress of analyses.
+
+    Parameters
+    ----------
+    task_states: dict
+        Task states of the analyses by id
+    fetch_task_states: callable
+        Function returning the current task states (by id) of a list of ids
+    max_duration: float, optional
+        Duration of the stream in seconds. (Default:
+        `TOPOBANK_STATISTICS_PROGRESS_STREAM_DURATION` setting or 300)
+    """
+    poll_interval = getattr(settings, 'TOPOBANK_STATISTICS_PROGRESS_POLL_INTERVAL', 0.5)
+    state_interval = getattr(settings, 'TOPOBANK_STATISTICS_PROGRESS_STATE_INTERVAL', 5.0)
+    if max_duration is None:
+        max_duration = getattr(settings, 'TOPOBANK_STATISTICS_PROGRESS_STREAM_DURATION', 300.0)
+    keep_alive_interval = 15.0
+
+    task_states = dict(task_states)
+    start = last_state_refresh = last_event = time.monotonic()
+    last_states = None
+    while True:
+        now = time.monotonic()
+        # Task states live in the database; refresh them much less often than
+        # the progress, which is read from the cache.
+        if now - last_state_refresh >= state_interval:
+            pending = [
+                analysis_id
+                for analysis_id, task_state in task_states.items()
+                if task_state not in FINAL_TASK_STATES
+            ]
+            if pending:
+                task_states.update(await sync_to_async(fetch_task_states)(pending))
+            last_state_refresh = now
+
+        states = await sync_to_async(_snapshot)(task_states)
+        if states != last_states:
+            yield f'data: {json.dumps(states)}\n\n'
+            last_states = states
+            last_event = now
+        elif now - last_event >= keep_alive_interval:
+            yield ': keep-alive\n\n'
+            last_event = now
+
+        if all(state['task_state'] in FINAL_TASK_STATES for state in states):
+            yield 'event: done\ndata: {}\n\n'
+            return
+        if now - start >= max_duration:
+            # The client (EventSource) reconnects automatically
+            return
+        await asyncio.sleep(poll_interval)
+
+
+@transaction.non_atomic_requests
+async def progress_stream_view(request, **kwargs):
+    """Stream the progress of analyses as server-sent events.
+
+    Takes the same query parameters as the card views. Every event carries a
+    list with the id, task state and progress of each analysis. The stream
+    ends with a `done` event once all analyses have finished, or after
+    `TOPOBANK_STATISTICS_PROGRESS_STREAM_DURATION` seconds.
+
+    Streaming requires an ASGI server. Under WSGI, a long-lived stream would
+    occupy a worker for its whole duration; the view hence sends only the
+    current states and closes the stream, and the client (EventSource)
+    polls by reconnecting.
+    """
+    requested = await sync_to_async(_requested_analyses)(request, **kwargs)
+    if requested.response is not None:
+        return requested.response
+
+    analyses = requested.analyses
+    # Model used by the stream to refresh the task states
+    analysis_model = type(analyses[0]) if analyses else None
+    response = StreamingHttpResponse(
+        _progress_events(
+            {analysis.id: analysis.task_state for analysis in analyses},
+            functools.partial(_fetch_task_states, analysis_model),
+            max_duration=None if isinstance(request, ASGIRequest) else 0,
+        ),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Disable proxy buffering (nginx), which would otherwise delay the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
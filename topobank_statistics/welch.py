@@ -0,0 +1,150 @@
+"""
+Segmented (Welch) power spectral density of long profiles.
+
+The power spectrum of a profile is usually computed from a single FFT over
+the full length of the profile, requiring memory proportional to the full
+length. For very long line scans, the profile is here split into
+overlapping, windowed segments of fixed length whose power spectra are
+averaged. Segments are processed in chunks of bounded size, optionally in
+parallel threads (NumPy's FFT releases the GIL). The result is resampled
+onto the same log-spaced grid as `power_spectrum_from_profile`.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.signal import get_window
+from SurfaceTopography.Exceptions import UndefinedDataError
+from SurfaceTopography.Support.Regression import resample
+
+# Maximum number of values processed at once per worker
+CHUNK_SIZE = 2**22
+
+
+def _segment_starts(nb_grid_pts, segment_length, overlap):
+    """Return first grid index of each segment."""
+    if segment_length < 2:
+        raise ValueError("Segments need to contain at least two grid points.")
+    if not 0 <= overlap < 1:
+        raise ValueError("Overlap of segments must be in the interval [0, 1).")
+    step = max(1, int(round(segment_length * (1 - overlap))))
+    return np.arange(0, nb_grid_pts - segment_length + 1, step)
+
+
+def welch_power_spectrum(
+    topography,
+    segment_length,
+    overlap=0.5,
+    window=None,
+    reliable=True,
+    nb_points_per_decade=10,
+    workers=1,
+    fft=np.fft,
+):
+    """Compute power spectrum of a uniform topography or line scan from
+    averaged periodograms of overlapping segments in x-direction.
+
+    Parameters
+    ----------
+    topography: SurfaceTopography.UniformLineScan or SurfaceTopography.Topography
+        Topography or line scan; for maps, segments of all profiles in
+        x-direction are averaged
+    segment_length: int
+        Number of grid points per segment. Topographies with no more grid
+        points than this (and nonuniform line scans) are passed on to
+        `power_spectrum_from_profile`.
+    overlap: float, optional
+        Fraction by which consecutive segments overlap. (Default: 0.5)
+    window: str, optional
+        Window applied to each segment, see scipy.signal.get_window.
+        (Default: 'hann')
+    reliable: bool, optional
+        Only return data deemed reliable. (Default: True)
+    nb_points_per_decade: int, optional
+        Number of points per decade for log-spaced collocation points.
+        (Default: 10)
+    workers: int, optional
+        Number of threads processing chunks of segments. (Default: 1)
+    fft: module or types.SimpleNamespace, optional
+        FFT functions with the signatures of `numpy.fft`, see
+        `fft_backend.fft_functions`. (Default: `numpy.fft`)
+
+    Returns
+    -------
+    q: np.ndarray
+        Reciprocal space vectors. (Units: 1/length)
+    C: np.ndarray
+        Power spectrum. (Units: length³)
+    """
+    if not topography.is_uniform or topography.nb_grid_pts[0] <= segment_length:
+        return topography.power_spectrum_from_profile(
+            window=window, reliable=reliable, nb_points_per_decade=nb_points_per_decade
+        )
+    if topography.has_undefined_data:
+        raise UndefinedDataError(
+            "This topography has undefined data (missing data points). "
+            "Power-spectrum cannot be computed for topographies with missing "
+            "data points."
+        )
+
+    nx = topography.nb_grid_pts[0]
+    pixel_size = topography.physical_sizes[0] / nx
+    heights = topography.heights()
+    starts = _segment_starts(nx, segment_length, overlap)
+
+    if window is None or window == "None":
+        window = "hann"
+    win = get_window(window, segment_length)
+    # Same normalization as SurfaceTopography's window pipeline
+    win *= np.sqrt(segment_length / (win**2).sum())
+    if heights.ndim == 2:
+        win = win[:, np.newaxis]
+
+    # Number of segments per chunk
+    values_per_segment = segment_length * (heights.size // nx)
+    chunk = max(1, CHUNK_SIZE // values_per_segment)
+
+    def periodogram_sum(chunk_starts):
+        total = 0
+        for start in chunk_starts:
+            segment = np.asarray(heights[start : start + segment_length])
+            segment = (segment - segment.mean(axis=0)) * win
+            total = total + np.abs(fft.rfft(segment, axis=0)) ** 2
+        return total
+
+    chunks = [starts[i : i + chunk] for i in range(0, len(starts), chunk)]
+    if workers > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            total = sum(executor.map(periodogram_sum, chunks))
+    else:
+        total = sum(periodogram_sum(c) for c in chunks)
+
+    # Normalization of `power_spectrum_from_profile` for a segment of size
+    # segment_length * pixel_size: |s/n FFT|² / s = pixel_size |FFT|² / n
+    C_raw = pixel_size * total / (segment_length * len(starts))
+    # For real heights, |FFT|² is symmetric and the folded spectrum (see
+    # `fold_fft_half`) is the first half of the one-sided spectrum
+    C_all = C_raw[: segment_length // 2]
+
+    segment_size = segment_length * pixel_size
+    q = 2 * np.pi / segment_size * np.arange(segment_length // 2)
+    if reliable:
+        max_value = 2 * np.pi / topography.short_reliability_cutoff(2 * pixel_size)
+    else:
+        max_value = np.pi / pixel_size
+    # Exclude zero wavevector for log-spaced collocation
+    q = q[1:]
+    C_all = C_all[1:]
+    if C_all.ndim == 2:
+        q = np.resize(q, (C_all.shape[1], q.shape[0])).T.ravel()
+        C_all = np.ravel(C_all)
+    q, _, C, _ = resample(
+        q,
+        C_all,
+        min_value=np.min(q),
+        max_value=max_value,
+        collocation="log",
+        nb_points_per_decade=nb_points_per_decade,
+        method="bin-average",
+    )
+    return q, C
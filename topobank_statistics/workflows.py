@@ -1,15 +1,17 @@
-from typing import Union
+import functools
+from typing import Literal, Union
 
 import numpy as np
+from django.conf import settings
 from muTimer import Timer
-from scipy.special import erfcinv
 from SurfaceTopography.Container.Averaging import log_average
 from SurfaceTopography.Container.common import suggest_length_unit
 from SurfaceTopography.Container.ScaleDependentStatistics import \
     scale_dependent_statistical_property
 from SurfaceTopography.Exceptions import (CannotPerformAnalysisError,
                                           ReentrantDataError)
-from topobank.analysis.registry import register_implementation
+from topobank.analysis.registry import (get_implementation, get_workflow_names,
+                                        register_implementation)
 from topobank.analysis.workflows import (ContainerProxy,
                                          WorkflowImplementation,
                                          make_alert_entry,
@@ -17,6 +19,28 @@ from topobank.analysis.workflows import (ContainerProxy,
 from topobank.files.models import ManifestSet
 from topobank.manager.models import Surface, Topography
 
+from . import spectral
+from .binning import check_binning, robust_histogram
+from .cache import cached_result
+from .fft_backend import fft_functions
+from .heights import static_topography, transposed_topography
+from .histograms import MergeableHistogram
+from .memmap import read_topography
+from .moments import Moments, histogram
+from .nonuniform import (curvature_values, height_values,
+                         robust_segment_histogram, robust_weighted_histogram,
+                         segment_histogram, slope_values, weighted_histogram,
+                         weighted_moments)
+from .outliers import outlier_statistics
+from .parallel import map_topographies, precompute_for_average, surface_workers
+from .precision import reduced_precision
+from .progress import ProgressAggregator, progress_relay
+from .reducers import Gradient, HalfLaplacian, MeanSquareX, MeanSquareY
+from .scale_dependent import (DEFAULT_MULTIGRID_TOLERANCE,
+                              scale_dependent_statistics)
+from .sparse import histogram_series
+from .welch import welch_power_spectrum
+
 APP_NAME = "topobank_statistics"
 VIZ_ROUGHNESS_PARAMETERS = "roughness-parameters"
 
@@ -26,6 +50,9 @@ CE_PAPER_URL = "https://iopscience.iop.org/article/10.1088/2051-672X/ac860a"
 
 GAUSSIAN_FIT_SERIES_NAME = "Gaussian fit"
 
+# Maximum number of bins of distributions for surfaces
+DEFAULT_SURFACE_HISTOGRAM_BINS = 100
+
 
 class HeightDistribution(WorkflowImplementation):
     class Meta:
@@ -40,12 +67,17 @@ class HeightDistribution(WorkflowImplementation):
 
         implementations = {
             Topography: "topography_implementation",
+            Surface: "surface_implementation",
         }
 
     class Parameters(WorkflowImplementation.Parameters):
         bins: Union[int, None] = None
         wfac: int = 5
+        binning: Literal["uniform", "robust"] = "uniform"
+        sparse: bool = False
+        precision: Literal["float32", None] = None
 
+    @cached_result
     def topography_implementation(
         self, analysis, folder: ManifestSet = None, progress_recorder=None, timer=None
     ):
@@ -54,7 +86,7 @@ class HeightDistribution(WorkflowImplementation):
 
         # Get low level topography from SurfaceTopography model
         with timer("read topography"):
-            topography = analysis.subject.topography()
+            topography = read_topography(analysis.subject)
 
         # Get parameters
         bins = self.kwargs.bins
@@ -62,21 +94,45 @@ class HeightDistribution(WorkflowImplementation):
         if bins is None:
             bins = reasonable_bins_argument(topography)
 
-        profile = topography.heights()
-
-        compressed_profile = np.ma.compressed(profile)
-        mean_height = np.mean(profile)
+        # Only the (reduced-precision) field keeps the heights
+        topography = field = reduced_precision(topography, self.kwargs.precision)
+        if topography.is_uniform:
+            profile = field.heights()
+            segments = None
+            moments = Moments.from_array(profile)
+        else:
+            # Length-weighted segments of nonuniform line scans
+            *segments, moments = height_values(*topography.positions_and_heights())
+        mean_height = moments.mean
         rms_height = (
-            topography.rms_height_from_area()
+            field.rms_height_from_area()
             if topography.dim == 2
-            else topography.rms_height_from_profile()
+            else field.rms_height_from_profile()
         )
         # Standard deviation about the mean, used as the width of the Gaussian
         # fit (see GH statistics#38); RMS about zero would be too wide when the
         # heights have a nonzero mean.
-        std_height = compressed_profile.std()
-
-        hist, bin_edges = np.histogram(compressed_profile, bins=bins, density=True)
+        std_height = moments.std
+
+        check_binning(self.kwargs.binning)
+        outside = None
+        if self.kwargs.binning == "robust":
+            if segments is None:
+                hist, bin_edges, *outside = robust_histogram(profile, moments, bins)
+            else:
+                hist, bin_edges, *outside = robust_segment_histogram(
+                    *segments, moments, bins
+                )
+        else:
+            # Same range as `np.histogram` chooses for the valid heights
+            if moments.min < moments.max:
+                hist_range = (moments.min, moments.max)
+            else:
+                hist_range = (moments.min - 0.5, moments.max + 0.5)
+            if segments is None:
+                hist, bin_edges = histogram(profile, bins, hist_range)
+            else:
+                hist, bin_edges = segment_histogram(*segments, bins, hist_range)
 
         try:
             unit = topography.unit
@@ -84,10 +140,8 @@ class HeightDistribution(WorkflowImplementation):
             unit = None
 
         series = [
-            dict(
-                name="Height distribution",
-                x=(bin_edges[:-1] + bin_edges[1:]) / 2,
-                y=hist,
+            histogram_series(
+                "Height distribution", bin_edges, hist, sparse=self.kwargs.sparse
             ),
         ]
 
@@ -109,6 +163,7 @@ class HeightDistribution(WorkflowImplementation):
             scalars={
                 "Mean Height": dict(value=mean_height, unit=unit),
                 "RMS Height": dict(value=rms_height, unit=unit),
+                **_outside_range_scalars(outside),
             },
             xlabel="Height",
             ylabel="Probability density",
@@ -117,8 +172,26 @@ class HeightDistribution(WorkflowImplementation):
             series=wrap_series(series),
         )
 
+    def surface_implementation(self, analysis, progress_recorder=None, timer=None):
+        """Calculate height distribution over all topographies of a surface."""
+        with progress_relay(analysis, progress_recorder) as relay:
+            return _distribution_for_surface(
+                analysis.subject,
+                relay,
+                _height_histograms,
+                "Height distribution",
+                "height",
+                "{}",
+                "{}⁻¹",
+                bins=self.kwargs.bins,
+                wfac=self.kwargs.wfac,
+                rms_about_mean=True,
+                sparse=self.kwargs.sparse,
+                timer=timer,
+            )
+
 
-def _reasonable_histogram_range(arr):
+def _reasonable_histogram_range(arr_min, arr_max):
     """Return 'range' argument for np.histogram
 
     Fixes problem with too small default ranges
@@ -127,8 +200,10 @@ def _reasonable_histogram_range(arr):
 
     Parameters
     ----------
-    arr: array
-        array to calculate histogram for
+    arr_min: float
+        smallest value of the array to calculate histogram for
+    arr_max: float
+        largest value of the array to calculate histogram for
 
     Returns
     -------
@@ -136,9 +211,6 @@ def _reasonable_histogram_range(arr):
     The lower and upper range of the bins.
 
     """
-    arr_min = arr.min()
-    arr_max = arr.max()
-
     if arr_max - arr_min < 5e-8:
         hist_range = (arr_min - 1e-3, arr_max + 1e-3)
     else:
@@ -146,26 +218,47 @@ def _reasonable_histogram_range(arr):
     return hist_range
 
 
-def _histogram_with_reentrant_guard(arr, bins, quantity):
+def _histogram_with_reentrant_guard(
+    arr, bins, quantity, moments=None, binning="uniform", weights=None
+):
     """``np.histogram(density=True)`` with a finite-range guard.
 
     Raises :class:`ReentrantDataError` when the data is empty or its
     histogram range is not finite (NaN/Inf, e.g. from reentrant/multivalued
     measurements) instead of letting ``np.histogram`` raise a bare
-    ``ValueError`` (see GH statistics#30). ``arr`` is expected to already be
-    compressed (no masked entries).
+    ``ValueError`` (see GH statistics#30). Masked entries of ``arr`` are
+    ignored; ``moments`` of ``arr`` are computed if not given.
+
+    With 'robust' ``binning`` and a number of ``bins``, the histogram spans a
+    quantile range with at most ``bins`` bins (see `binning`). Returns
+    histogram, bin edges and the numbers of values below and above the range
+    of the bins (None for 'uniform' binning).
+
+    With ``weights`` (e.g. of nonuniform line scans, see `nonuniform`), the
+    histogram is weighted; ``moments`` must then be the weighted moments.
     """
-    arr = np.asarray(arr)
-    # `or` short-circuits so arr.min()/max() are not evaluated for an empty
-    # array (which would itself raise).
-    if arr.size == 0 or not np.all(np.isfinite([arr.min(), arr.max()])):
+    check_binning(binning)
+    if moments is None:
+        moments = Moments.from_array(arr)
+    if moments.count == 0 or not np.all(np.isfinite([moments.min, moments.max])):
         raise ReentrantDataError(
             f"Cannot calculate {quantity} distribution for reentrant measurements."
         )
+    if binning == "robust" and not np.iterable(bins):
+        if weights is None:
+            hist, bin_edges, nb_below, nb_above = robust_histogram(arr, moments, bins)
+        else:
+            hist, bin_edges, nb_below, nb_above = robust_weighted_histogram(
+                arr, weights, moments, bins
+            )
+        return hist, bin_edges, (nb_below, nb_above)
+    hist_range = _reasonable_histogram_range(moments.min, moments.max)
     try:
-        return np.histogram(
-            arr, bins=bins, density=True, range=_reasonable_histogram_range(arr)
-        )
+        if weights is None:
+            hist, bin_edges = histogram(arr, bins, hist_range)
+        else:
+            hist, bin_edges = weighted_histogram(arr, weights, bins, hist_range)
+        return hist, bin_edges, None
     except (ValueError, RuntimeError) as exc:
         # Fallback for range/finiteness errors raised from deeper in the stack.
         if exc.args and (
@@ -178,16 +271,8 @@ def _histogram_with_reentrant_guard(arr, bins, quantity):
 
 
 def _chauvenet_outlier_mask(arr):
-    """Boolean mask of Chauvenet outliers in ``arr`` using a robust scale.
-
-    The scale is estimated from the median absolute deviation (MAD) rather than
-    the standard deviation, so the extreme values being detected do not inflate
-    the scale used to detect them (for the RMS slope this masking is precisely
-    the failure mode we guard against). A value is flagged when it lies more
-    than ``z_c`` robust standard deviations from the median, where
-    ``z_c = Phi^{-1}(1 - 1 / (4 N))`` is Chauvenet's criterion -- the deviation
-    beyond which fewer than half an observation is expected among ``N`` normal
-    samples (``~ sqrt(2 ln N)`` for large ``N``).
+    """Boolean mask of Chauvenet outliers in ``arr`` using a robust scale
+    (see `outliers`).
 
     Returns
     -------
@@ -198,20 +283,8 @@ def _chauvenet_outlier_mask(arr):
         The threshold in robust standard deviations (NaN when not computed).
     """
     arr = np.asarray(arr)
-    n = arr.size
-    mask = np.zeros(n, dtype=bool)
-    if n < 3:
-        return mask, np.nan
-    median = np.median(arr)
-    # 1.4826 rescales the MAD to a standard-deviation estimate for normal data.
-    robust_sigma = 1.4826 * np.median(np.abs(arr - median))
-    if not np.isfinite(robust_sigma) or robust_sigma <= 0:
-        return mask, np.nan
-    # Chauvenet: flag when N * P(|Z| > z_c) < 1/2. With P(|Z| > z) = erfc(z/sqrt2)
-    # this gives z_c = sqrt(2) * erfcinv(1 / (2 N)).
-    z_c = np.sqrt(2) * erfcinv(1.0 / (2 * n))
-    mask = np.abs(arr - median) > z_c * robust_sigma
-    return mask, z_c
+    stats = outlier_statistics(arr.reshape(1, -1))
+    return stats.mask[0].reshape(arr.shape), stats.z_c[0]
 
 
 def _slope_outlier_stats(slopes):
@@ -220,22 +293,10 @@ def _slope_outlier_stats(slopes):
     ``slopes`` are the (unmasked) slope values for one direction. When
     Chauvenet outliers are present, returns a dict with ``n_outliers``,
     ``z_c``, ``rms_full`` and ``rms_trimmed`` (the RMS slope with the outliers
-    removed); otherwise returns ``None``.
+    removed); otherwise returns ``None``. Use `outliers.outlier_statistics`
+    for several directions at once.
     """
-    slopes = np.asarray(slopes)
-    mask, z_c = _chauvenet_outlier_mask(slopes)
-    n_outliers = int(np.count_nonzero(mask))
-    if n_outliers == 0:
-        return None
-    inliers = slopes[~mask]
-    return {
-        "n_outliers": n_outliers,
-        "z_c": z_c,
-        "rms_full": float(np.sqrt(np.mean(slopes**2))),
-        "rms_trimmed": (
-            float(np.sqrt(np.mean(inliers**2))) if inliers.size else float("nan")
-        ),
-    }
+    return outlier_statistics(np.asarray(slopes).reshape(1, -1)).report(0)
 
 
 def _slope_outlier_report(slopes, label, topography_name):
@@ -246,7 +307,14 @@ def _slope_outlier_report(slopes, label, topography_name):
     values removed) is reported alongside a warning; otherwise ``({}, None)`` is
     returned so the RMS slope is presented without embellishment.
     """
-    stats = _slope_outlier_stats(slopes)
+    return _slope_outlier_report_from_stats(
+        _slope_outlier_stats(slopes), label, topography_name
+    )
+
+
+def _slope_outlier_report_from_stats(stats, label, topography_name):
+    """Same as `_slope_outlier_report`, but for the outlier statistics
+    ``stats`` of a direction as returned by `OutlierStatistics.report`."""
     if stats is None:
         return {}, None
 
@@ -268,8 +336,30 @@ def _slope_outlier_report(slopes, label, topography_name):
     return extra_scalars, alert
 
 
+def _outside_range_scalars(outside, suffix=""):
+    """Scalars reporting the numbers of values below and above the range of
+    a robust histogram."""
+    if outside is None:
+        return {}
+    nb_below, nb_above = outside
+    return {
+        f"Values below histogram range{suffix}": dict(value=nb_below, unit=None),
+        f"Values above histogram range{suffix}": dict(value=nb_above, unit=None),
+    }
+
+
 def _moments_histogram_gaussian(
-    arr, bins, topography, wfac, quantity, label, unit, gaussian=True
+    arr,
+    bins,
+    topography,
+    wfac,
+    quantity,
+    label,
+    unit,
+    gaussian=True,
+    binning="uniform",
+    sparse=False,
+    weights=None,
 ):
     """Return moments, histogram and gaussian for an array.
     :param arr: array, array to calculate moments and histogram for
@@ -280,6 +370,9 @@ def _moments_histogram_gaussian(
     :param label: str, how these results should be extra labeled (e.g. 'x direction')
     :param unit: str, unit of the quantity (e.g. '1/nm')
     :param gaussian: bool, if True, add gaussian
+    :param binning: str, 'uniform' or 'robust' binning of the histogram
+    :param sparse: bool, if True, only store nonzero bins of the histogram
+    :param weights: array, optional weights of the values (e.g. of nonuniform line scans)
     :return: scalars, series
 
     The result can be used to extend the result dict of the analysis functions, e.g.
@@ -288,31 +381,38 @@ def _moments_histogram_gaussian(
     result['series'].extend(series)
     """
 
-    # Compress the (possibly) masked array to drop masked entries before
-    # histogramming. np.histogram would otherwise strip the mask via
-    # np.asarray and bin the fill values. This also keeps mean/rms consistent
-    # with the histogrammed data. For non-masked inputs this simply flattens.
-    arr = np.ma.compressed(arr)
-
-    mean = arr.mean()
-    rms = np.sqrt((arr**2).mean())
+    # Moments and histogram of the valid entries of the (possibly) masked
+    # array, accumulated blockwise without compressing it; np.histogram would
+    # otherwise strip the mask via np.asarray and bin the fill values.
+    # Moments are accumulated in double precision also for reduced-precision
+    # input.
+    if weights is None:
+        moments = Moments.from_array(arr)
+    else:
+        moments = weighted_moments(arr, weights)
+    mean = moments.mean
+    rms = moments.rms
     # Standard deviation about the mean, used as the width of the Gaussian fit
     # (see GH statistics#38). RMS (about zero) overestimates the width whenever
     # the data has a nonzero mean.
-    std = arr.std()
+    std = moments.std
 
-    hist, bin_edges = _histogram_with_reentrant_guard(arr, bins, quantity)
+    hist, bin_edges, outside = _histogram_with_reentrant_guard(
+        arr, bins, quantity, moments, binning, weights
+    )
 
     scalars = {
         f"Mean {quantity.capitalize()} ({label})": dict(value=mean, unit=unit),
         f"RMS {quantity.capitalize()} ({label})": dict(value=rms, unit=unit),
+        **_outside_range_scalars(outside, f" ({label})"),
     }
 
     series = [
-        dict(
-            name=f"{quantity.capitalize()} distribution ({label})",
-            x=(bin_edges[:-1] + bin_edges[1:]) / 2,
-            y=hist,
+        histogram_series(
+            f"{quantity.capitalize()} distribution ({label})",
+            bin_edges,
+            hist,
+            sparse=sparse,
         )
     ]
 
@@ -333,6 +433,237 @@ def _moments_histogram_gaussian(
     return scalars, series
 
 
+def _surface_nb_bins(bins):
+    """Maximum number of bins of a surface distribution for the `bins`
+    parameter of the distribution workflows."""
+    if bins is None:
+        return DEFAULT_SURFACE_HISTOGRAM_BINS
+    if isinstance(bins, int):
+        return bins
+    # Histograms of surfaces are merged on power-of-two aligned bins
+    raise ValueError(
+        "Explicit bin edges are not supported for distributions of surfaces; "
+        "pass the number of bins instead."
+    )
+
+
+def _distribution_for_surface(
+    surface,
+    progress_recorder,
+    histograms_func,
+    name,
+    quantity,
+    xunit,
+    yunit,
+    bins,
+    wfac,
+    rms_about_mean=False,
+    sparse=False,
+    timer=None,
+):
+    """Distribution of a quantity over all topographies of a surface.
+
+    Each topography is histogrammed on power-of-two aligned bins (see
+    `histograms`), and the histograms are merged by summing counts.
+
+    Parameters
+    ----------
+    surface: topobank.manager.models.Surface
+        Surface
+    progress_recorder: ProgressRecorder or None
+        Progress recorder
+    histograms_func: callable
+        Function `(topography, nb_bins, quantity)` returning the histograms
+        of the values of a topography (in the length unit of the surface) as
+        a dictionary mapping a label (e.g. 'x direction' or None) to a
+        `MergeableHistogram`
+    name: str
+        Name of the analysis
+    quantity: str
+        What kind of quantity this is (e.g. 'slope')
+    xunit: str
+        Unit of the quantity, with '{}' replaced by the length unit
+    yunit: str
+        Unit of the probability density, with '{}' replaced by the length unit
+    bins: int or None
+        `bins` parameter of the workflow; explicit bin edges raise ValueError
+    wfac: numeric
+        Width factor of the Gaussian fit
+    rms_about_mean: bool, optional
+        Report the RMS value about the mean instead of about zero.
+        (Default: False)
+    sparse: bool, optional
+        Only store nonzero bins of the histograms, see `sparse`.
+        (Default: False)
+    timer: muTimer.Timer, optional
+        Timer. (Default: None)
+    """
+    if timer is None:
+        timer = Timer()
+
+    topographies = ContainerProxy(surface.topography_set.all())
+    unit = suggest_length_unit(topographies, "linear")
+    nb_bins = _surface_nb_bins(bins)
+
+    histograms = {}
+    alerts = []
+
+    progress = ProgressAggregator(progress_recorder)
+    with timer("compute"):
+        # Topographies are histogrammed in parallel if configured (see
+        # `parallel`); the histograms are merged in the order of the
+        # topographies
+        results = map_topographies(
+            functools.partial(
+                _topography_histograms,
+                histograms_func=histograms_func,
+                nb_bins=nb_bins,
+                quantity=quantity,
+            ),
+            topographies,
+            unit=unit,
+            progress_callback=progress.callback(),
+        )
+        progress.finish()
+    for result in results:
+        if isinstance(result, Exception):
+            alerts.append(make_alert_entry("warning", surface.name, name, str(result)))
+            continue
+        for label, histogram in result.items():
+            histograms[label] = histogram.merge(histograms.get(label), nb_bins)
+
+    xunit = xunit.format(unit)
+    scalars = {}
+    series = []
+    for label, histogram in histograms.items():
+        suffix = "" if label is None else f" ({label})"
+        mean = histogram.mean
+        std = histogram.std
+        scalars.update(
+            {
+                f"Mean {quantity.capitalize()}{suffix}": dict(value=mean, unit=xunit),
+                f"RMS {quantity.capitalize()}{suffix}": dict(
+                    value=std if rms_about_mean else histogram.rms, unit=xunit
+                ),
+            }
+        )
+        series.append(
+            histogram_series(
+                f"{quantity.capitalize()} distribution{suffix}",
+                histogram.bin_edges,
+                histogram.density,
+                sparse=sparse,
+            )
+        )
+        # Only add the Gaussian fit when the width is well defined
+        if std > 0 and np.isfinite(std):
+            x_gauss = np.linspace(mean - wfac * std, mean + wfac * std, 1001)
+            y_gauss = np.exp(-((x_gauss - mean) ** 2) / (2 * std**2)) / (
+                np.sqrt(2 * np.pi) * std
+            )
+            series.append(
+                dict(name=GAUSSIAN_FIT_SERIES_NAME + suffix, x=x_gauss, y=y_gauss)
+            )
+
+    return dict(
+        name=name,
+        scalars=scalars,
+        xlabel=quantity.capitalize(),
+        ylabel="Probability density",
+        xunit=xunit,
+        yunit=yunit.format(unit),
+        series=wrap_series(series),
+        alerts=alerts,
+    )
+
+
+def _topography_histograms(topography, histograms_func, nb_bins, quantity):
+    """Histograms of the values of a topography, or the exception if they
+    cannot be computed. Runs in worker threads."""
+    try:
+        return histograms_func(topography, nb_bins, quantity)
+    except (CannotPerformAnalysisError, ReentrantDataError) as exc:
+        return exc
+
+
+def _normalized(weights, count):
+    """Weights scaled to a total of `count`, such that a nonuniform line scan
+    enters a surface distribution with the same weight as a uniform
+    topography with as many values."""
+    total = np.sum(weights, dtype=np.float64)
+    return weights * (count / total) if total > 0 else weights
+
+
+def _height_histograms(topography, nb_bins, quantity):
+    if topography.is_uniform:
+        return {
+            None: MergeableHistogram.from_values(
+                topography.heights(), nb_bins=nb_bins, quantity=quantity
+            )
+        }
+    # Length-weighted segments of nonuniform line scans
+    lower, upper, weights, moments = height_values(
+        *topography.positions_and_heights()
+    )
+    return {
+        None: MergeableHistogram.from_segments(
+            lower,
+            upper,
+            _normalized(weights, moments.count),
+            moments,
+            nb_bins=nb_bins,
+            quantity=quantity,
+        )
+    }
+
+
+def _slope_histograms(topography, nb_bins, quantity):
+    if topography.is_uniform:
+        if topography.dim == 2:
+            dh_dx, dh_dy = topography.derivative(n=1)
+            values = {"x direction": dh_dx, "y direction": dh_dy}
+        else:
+            values = {"x direction": topography.derivative(n=1)}
+        return {
+            label: MergeableHistogram.from_values(
+                arr, nb_bins=nb_bins, quantity=quantity
+            )
+            for label, arr in values.items()
+        }
+    # Length-weighted slopes of the segments
+    dh_dx, weights = slope_values(*topography.positions_and_heights())
+    return {"x direction": _weighted_values_histogram(dh_dx, weights, nb_bins, quantity)}
+
+
+def _curvature_histograms(topography, nb_bins, quantity):
+    if topography.is_uniform:
+        if topography.dim == 2:
+            curv_x, curv_y = topography.derivative(n=2)
+            curv = (curv_x + curv_y) / 2
+        else:
+            curv = topography.derivative(n=2)
+        return {
+            None: MergeableHistogram.from_values(
+                curv, nb_bins=nb_bins, quantity=quantity
+            )
+        }
+    # Length-weighted curvatures at the interior data points
+    curv, weights = curvature_values(*topography.positions_and_heights())
+    return {None: _weighted_values_histogram(curv, weights, nb_bins, quantity)}
+
+
+def _weighted_values_histogram(values, weights, nb_bins, quantity):
+    """Histogram of the weighted values of a nonuniform line scan."""
+    weights = _normalized(weights, len(values))
+    return MergeableHistogram.from_weighted_values(
+        values,
+        weights,
+        weighted_moments(values, weights),
+        nb_bins=nb_bins,
+        quantity=quantity,
+    )
+
+
 class SlopeDistribution(WorkflowImplementation):
     class Meta:
         name = "topobank_statistics.slope_distribution"
@@ -346,12 +677,17 @@ class SlopeDistribution(WorkflowImplementation):
 
         implementations = {
             Topography: "topography_implementation",
+            Surface: "surface_implementation",
         }
 
     class Parameters(WorkflowImplementation.Parameters):
         bins: Union[int, None] = None
         wfac: int = 5
+        binning: Literal["uniform", "robust"] = "uniform"
+        sparse: bool = False
+        precision: Literal["float32", None] = None
 
+    @cached_result
     def topography_implementation(self, analysis, progress_recorder=None, timer=None):
         """Calculates slope distribution for given topography."""
         if timer is None:
@@ -359,7 +695,7 @@ class SlopeDistribution(WorkflowImplementation):
 
         # Get low level topography from SurfaceTopography model
         with timer("read topography"):
-            topography = analysis.subject.topography()
+            topography = read_topography(analysis.subject)
 
         # Get parameters
         bins = self.kwargs.bins
@@ -371,10 +707,14 @@ class SlopeDistribution(WorkflowImplementation):
         series = []
         alerts = []
         topography_name = analysis.subject.name
+        # Only the (reduced-precision) field keeps the heights
+        topography = field = reduced_precision(topography, self.kwargs.precision)
         # .. will be completed below..
 
         if topography.dim == 2:
-            dh_dx, dh_dy = topography.derivative(n=1)
+            dh_dx, dh_dy = field.derivative(n=1)
+            # Outliers of both directions at once
+            outliers = outlier_statistics([dh_dx, dh_dy])
 
             #
             # Results for x direction
@@ -387,11 +727,13 @@ class SlopeDistribution(WorkflowImplementation):
                 quantity="slope",
                 unit="1",
                 label="x direction",
+                binning=self.kwargs.binning,
+                sparse=self.kwargs.sparse,
             )
             scalars.update(scalars_slope_x)
             series.extend(series_slope_x)
-            extra_x, alert_x = _slope_outlier_report(
-                np.ma.compressed(dh_dx), "x direction", topography_name
+            extra_x, alert_x = _slope_outlier_report_from_stats(
+                outliers.report(0), "x direction", topography_name
             )
             scalars.update(extra_x)
             if alert_x is not None:
@@ -408,11 +750,13 @@ class SlopeDistribution(WorkflowImplementation):
                 quantity="slope",
                 unit="1",
                 label="y direction",
+                binning=self.kwargs.binning,
+                sparse=self.kwargs.sparse,
             )
             scalars.update(scalars_slope_y)
             series.extend(series_slope_y)
-            extra_y, alert_y = _slope_outlier_report(
-                np.ma.compressed(dh_dy), "y direction", topography_name
+            extra_y, alert_y = _slope_outlier_report_from_stats(
+                outliers.report(1), "y direction", topography_name
             )
             scalars.update(extra_y)
             if alert_y is not None:
@@ -432,7 +776,13 @@ class SlopeDistribution(WorkflowImplementation):
             # result['series'].extend(series_grad)
 
         elif topography.dim == 1:
-            dh_dx = topography.derivative(n=1)
+            if topography.is_uniform:
+                dh_dx = field.derivative(n=1)
+                weights = None
+            else:
+                # Length-weighted slopes of the segments
+                dh_dx, weights = slope_values(*topography.positions_and_heights())
+            outliers = outlier_statistics([dh_dx])
             scalars_slope_x, series_slope_x = _moments_histogram_gaussian(
                 dh_dx,
                 bins=bins,
@@ -441,11 +791,14 @@ class SlopeDistribution(WorkflowImplementation):
                 quantity="slope",
                 unit="1",
                 label="x direction",
+                binning=self.kwargs.binning,
+                sparse=self.kwargs.sparse,
+                weights=weights,
             )
             scalars.update(scalars_slope_x)
             series.extend(series_slope_x)
-            extra_x, alert_x = _slope_outlier_report(
-                np.ma.compressed(dh_dx), "x direction", topography_name
+            extra_x, alert_x = _slope_outlier_report_from_stats(
+                outliers.report(0), "x direction", topography_name
             )
             scalars.update(extra_x)
             if alert_x is not None:
@@ -466,6 +819,23 @@ class SlopeDistribution(WorkflowImplementation):
             alerts=alerts,
         )
 
+    def surface_implementation(self, analysis, progress_recorder=None, timer=None):
+        """Calculate slope distribution over all topographies of a surface."""
+        with progress_relay(analysis, progress_recorder) as relay:
+            return _distribution_for_surface(
+                analysis.subject,
+                relay,
+                _slope_histograms,
+                "Slope distribution",
+                "slope",
+                "1",
+                "1",
+                bins=self.kwargs.bins,
+                wfac=self.kwargs.wfac,
+                sparse=self.kwargs.sparse,
+                timer=timer,
+            )
+
 
 class CurvatureDistribution(WorkflowImplementation):
     class Meta:
@@ -480,19 +850,24 @@ class CurvatureDistribution(WorkflowImplementation):
 
         implementations = {
             Topography: "topography_implementation",
+            Surface: "surface_implementation",
         }
 
     class Parameters(WorkflowImplementation.Parameters):
         bins: Union[list[float], int, None] = None
         wfac: int = 5
+        binning: Literal["uniform", "robust"] = "uniform"
+        sparse: bool = False
+        precision: Literal["float32", None] = None
 
+    @cached_result
     def topography_implementation(self, analysis, progress_recorder=None, timer=None):
         if timer is None:
             timer = Timer()
 
         # Get low level topography from SurfaceTopography model
         with timer("read topography"):
-            topography = analysis.subject.topography()
+            topography = read_topography(analysis.subject)
 
         bins = self.kwargs.bins
         wfac = self.kwargs.wfac
@@ -502,34 +877,43 @@ class CurvatureDistribution(WorkflowImplementation):
         #
         # Calculate the Laplacian
         #
+        # Only the (reduced-precision) field keeps the heights
+        topography = field = reduced_precision(topography, self.kwargs.precision)
+        weights = None
         if topography.dim == 2:
-            curv_x, curv_y = topography.derivative(n=2)
+            curv_x, curv_y = field.derivative(n=2)
             curv = (curv_x + curv_y) / 2
+        elif topography.is_uniform:
+            curv = field.derivative(n=2)
         else:
-            curv = topography.derivative(n=2)
+            # Length-weighted curvatures at the interior data points
+            curv, weights = curvature_values(*topography.positions_and_heights())
 
-        mean_curv = np.mean(curv)
+        if weights is None:
+            moments = Moments.from_array(curv)
+        else:
+            moments = weighted_moments(curv, weights)
+        mean_curv = moments.mean
         rms_curv = (
-            topography.rms_curvature_from_area()
+            field.rms_curvature_from_area()
             if topography.dim == 2
-            else topography.rms_curvature_from_profile()
+            else field.rms_curvature_from_profile()
         )
 
-        hist_arr = np.ma.compressed(curv)
         # Standard deviation about the mean, used as the width of the Gaussian
         # fit (see GH statistics#38).
-        std_curv = hist_arr.std() if hist_arr.size > 0 else 0.0
+        std_curv = moments.std if moments.count > 0 else 0.0
 
-        hist, bin_edges = _histogram_with_reentrant_guard(hist_arr, bins, "curvature")
+        hist, bin_edges, outside = _histogram_with_reentrant_guard(
+            curv, bins, "curvature", moments, self.kwargs.binning, weights
+        )
 
         unit = topography.unit
         inverse_unit = "{}⁻¹".format(unit)
 
         series = [
-            dict(
-                name="Curvature distribution",
-                x=(bin_edges[:-1] + bin_edges[1:]) / 2,
-                y=hist,
+            histogram_series(
+                "Curvature distribution", bin_edges, hist, sparse=self.kwargs.sparse
             ),
         ]
 
@@ -551,6 +935,7 @@ class CurvatureDistribution(WorkflowImplementation):
             scalars={
                 "Mean Curvature": dict(value=mean_curv, unit=inverse_unit),
                 "RMS Curvature": dict(value=rms_curv, unit=inverse_unit),
+                **_outside_range_scalars(outside),
             },
             xlabel="Curvature",
             ylabel="Probability density",
@@ -559,6 +944,24 @@ class CurvatureDistribution(WorkflowImplementation):
             series=wrap_series(series),
         )
 
+    def surface_implementation(self, analysis, progress_recorder=None, timer=None):
+        """Calculate curvature distribution over all topographies of a
+        surface."""
+        with progress_relay(analysis, progress_recorder) as relay:
+            return _distribution_for_surface(
+                analysis.subject,
+                relay,
+                _curvature_histograms,
+                "Curvature distribution",
+                "curvature",
+                "{}⁻¹",
+                "{}",
+                bins=self.kwargs.bins,
+                wfac=self.kwargs.wfac,
+                sparse=self.kwargs.sparse,
+                timer=timer,
+            )
+
 
 class PowerSpectralDensity(WorkflowImplementation):
     class Meta:
@@ -580,9 +983,23 @@ class PowerSpectralDensity(WorkflowImplementation):
     class Parameters(WorkflowImplementation.Parameters):
         window: Union[str, None] = None
         nb_points_per_decade: int = 10
+        # Number of grid points per segment for averaged (Welch) spectra of
+        # long profiles; None computes a single FFT over the full profile
+        segment_length: Union[int, None] = None
+        segment_overlap: float = 0.5
 
+    @cached_result
     def topography_implementation(self, analysis, progress_recorder=None, timer=None):
         """Calculate Power Spectrum for given topography."""
+        profile_func = spectral.power_spectrum_from_profile
+        if self.kwargs.segment_length is not None:
+            profile_func = functools.partial(
+                welch_power_spectrum,
+                segment_length=self.kwargs.segment_length,
+                overlap=self.kwargs.segment_overlap,
+                workers=getattr(settings, "TOPOBANK_STATISTICS_WELCH_WORKERS", 1),
+                fft=fft_functions(),
+            )
         # Get low level topography from SurfaceTopography model
         return _workflow(
             analysis.subject,
@@ -598,6 +1015,8 @@ class PowerSpectralDensity(WorkflowImplementation):
             "{}³",
             conv_2d_fac=1 / np.pi,
             conv_2d_exponent=1,
+            profile_func=profile_func,
+            area_func=spectral.power_spectrum_from_area,
             window=self.kwargs.window,
             nb_points_per_decade=self.kwargs.nb_points_per_decade,
             folder=analysis.folder,
@@ -608,21 +1027,22 @@ class PowerSpectralDensity(WorkflowImplementation):
         """Calculate Power Spectrum for given topography."""
         # Get low level topography from SurfaceTopography model
 
-        return _workflow_for_surface(
-            analysis.subject,
-            progress_recorder,
-            "power_spectrum_from_profile",
-            "Power-spectral density (PSD)",
-            "Wavevector",
-            "PSD",
-            "1D PSD along x",
-            "{}⁻¹",
-            "{}³",
-            window=self.kwargs.window,
-            nb_points_per_decade=self.kwargs.nb_points_per_decade,
-            folder=analysis.folder,
-            timer=timer,
-        )
+        with progress_relay(analysis, progress_recorder) as relay:
+            return _workflow_for_surface(
+                analysis.subject,
+                relay,
+                "power_spectrum_from_profile",
+                "Power-spectral density (PSD)",
+                "Wavevector",
+                "PSD",
+                "1D PSD along x",
+                "{}⁻¹",
+                "{}³",
+                window=self.kwargs.window,
+                nb_points_per_decade=self.kwargs.nb_points_per_decade,
+                folder=analysis.folder,
+                timer=timer,
+            )
 
 
 class Autocorrelation(WorkflowImplementation):
@@ -644,6 +1064,7 @@ class Autocorrelation(WorkflowImplementation):
     class Parameters(WorkflowImplementation.Parameters):
         nb_points_per_decade: int = 10
 
+    @cached_result
     def topography_implementation(self, analysis, progress_recorder=None, timer=None):
         return _workflow(
             analysis.subject,
@@ -657,26 +1078,29 @@ class Autocorrelation(WorkflowImplementation):
             "Radial average",
             "{}",
             "{}²",
+            profile_func=spectral.autocorrelation_from_profile,
+            area_func=spectral.autocorrelation_from_area,
             nb_points_per_decade=self.kwargs.nb_points_per_decade,
             folder=analysis.folder,
             timer=timer,
         )
 
     def surface_implementation(self, analysis, progress_recorder=None, timer=None):
-        return _workflow_for_surface(
-            analysis.subject,
-            progress_recorder,
-            "autocorrelation_from_profile",
-            "Height-difference autocorrelation function (ACF)",
-            "Distance",
-            "ACF",
-            "Along x",
-            "{}",
-            "{}²",
-            nb_points_per_decade=self.kwargs.nb_points_per_decade,
-            folder=analysis.folder,
-            timer=timer,
-        )
+        with progress_relay(analysis, progress_recorder) as relay:
+            return _workflow_for_surface(
+                analysis.subject,
+                relay,
+                "autocorrelation_from_profile",
+                "Height-difference autocorrelation function (ACF)",
+                "Distance",
+                "ACF",
+                "Along x",
+                "{}",
+                "{}²",
+                nb_points_per_decade=self.kwargs.nb_points_per_decade,
+                folder=analysis.folder,
+                timer=timer,
+            )
 
 
 class VariableBandwidth(WorkflowImplementation):
@@ -695,6 +1119,7 @@ class VariableBandwidth(WorkflowImplementation):
             Surface: "surface_implementation",
         }
 
+    @cached_result
     def topography_implementation(self, analysis, progress_recorder=None, timer=None):
         return _workflow(
             analysis.subject,
@@ -716,20 +1141,21 @@ class VariableBandwidth(WorkflowImplementation):
         # Resampling not possible for topographies, but all function for same name must
         # have identical signatures. We hence simply fix `nb_points_per_decade` here.
         nb_points_per_decade = 10
-        return _workflow_for_surface(
-            analysis.subject,
-            progress_recorder,
-            "variable_bandwidth_from_profile",
-            "Variable-bandwidth analysis",
-            "Bandwidth",
-            "RMS height",
-            "Profile decomposition along x",
-            "{}",
-            "{}",
-            nb_points_per_decade=nb_points_per_decade,
-            folder=analysis.folder,
-            timer=timer,
-        )
+        with progress_relay(analysis, progress_recorder) as relay:
+            return _workflow_for_surface(
+                analysis.subject,
+                relay,
+                "variable_bandwidth_from_profile",
+                "Variable-bandwidth analysis",
+                "Bandwidth",
+                "RMS height",
+                "Profile decomposition along x",
+                "{}",
+                "{}",
+                nb_points_per_decade=nb_points_per_decade,
+                folder=analysis.folder,
+                timer=timer,
+            )
 
 
 def scale_dependent_roughness_parameter(
@@ -740,7 +1166,7 @@ def scale_dependent_roughness_parameter(
     ylabel,
     xname,
     yname,
-    xyfunc,
+    xyreducer,
     xyname,
     yunit,
     folder=None,
@@ -753,68 +1179,49 @@ def scale_dependent_roughness_parameter(
     topography_name = topography.name
 
     with timer("read topography"):
-        topography = topography.topography()
+        topography = static_topography(topography.topography())
 
     series = []
     alerts = []
 
-    if topography.dim == 2:
-        nb_analyses = (
-            6  # x-direction, y-direction, xy-direction (reliable + unreliable)
-        )
-    else:
-        nb_analyses = 2  # Just x-direction (reliable + unreliable)
-    progress_offset = 0
-    progress_callback = (
-        None
-        if progress_recorder is None
-        else lambda i, n: progress_recorder.set_progress(
-            progress_offset + i / n, nb_analyses
-        )
-    )
+    progress = ProgressAggregator(progress_recorder)
 
-    def process_series_reliable_unreliable(
-        series_name, func_kwargs, is_reliable_visible=False
-    ):
-        """Add series for reliable and unreliable data.
+    # All statistics are evaluated in a single sweep over the scale-dependent
+    # derivatives; reliable data is a subset of the distances.
+    reducers = [(xname, MeanSquareX(), True)]
+    if topography.dim == 2:
+        reducers += [
+            (yname, MeanSquareY(), False),
+            (xyname, xyreducer, False),
+        ]
 
-        Series with reliable data is only added if there is some reliable data.
-        Series are added to `series` from out scope.
+    distances, values, reliable = scale_dependent_statistics(
+        topography,
+        [func for _, func, _ in reducers],
+        n=order_of_derivative,
+        progress_callback=progress.callback(),
+        **kwargs,
+    )
 
-        Parameters
-        ----------
-        series_name: str
-            name of the series
-        func_kwargs: dict
-            arguments for `topography.scale_dependent_statistical_property`
-        is_reliable_visible: bool
-            If True, the series for 'reliable=True' should be visible in the UI.
-            Default is False.
-        """
-        nonlocal series, progress_offset
-        try:
-            distances, rms_values_sq = topography.scale_dependent_statistical_property(
-                **func_kwargs
-            )
+    for (series_name, _, is_reliable_visible), rms_values_sq in zip(reducers, values):
+        if np.any(reliable):
             series += [
                 dict(
                     name=series_name,
-                    x=distances,
-                    y=np.sqrt(rms_values_sq),
+                    x=distances[reliable],
+                    y=np.sqrt(rms_values_sq[reliable]),
                     visible=is_reliable_visible,
                 )
             ]
-        except CannotPerformAnalysisError as exc:
+        else:
             alerts.append(
                 make_alert_entry(
-                    "warning", topography_name, series_name, str(exc)
+                    "warning",
+                    topography_name,
+                    series_name,
+                    "Dataset contains no reliable data.",
                 )
             )
-        progress_offset += 1
-
-        distances, rms_values_sq = topography.scale_dependent_statistical_property(
-            reliable=False, **func_kwargs
-        )
         series += [
             dict(
                 name=series_name + " (incl. unreliable data)",
@@ -823,35 +1230,8 @@ def scale_dependent_roughness_parameter(
                 visible=False,
             ),
         ]
-        progress_offset += 1
-
-    x_kwargs = dict(
-        func=lambda x, y=None: np.mean(x * x),
-        n=order_of_derivative,
-        progress_callback=progress_callback,
-        **kwargs,
-    )
-
-    process_series_reliable_unreliable(xname, x_kwargs, is_reliable_visible=True)
-
-    if topography.dim == 2:
-        y_kwargs = dict(
-            func=lambda x, y: np.mean(y * y),
-            n=order_of_derivative,
-            progress_callback=progress_callback,
-            **kwargs,
-        )
 
-        process_series_reliable_unreliable(yname, y_kwargs)
-
-        xy_kwargs = dict(
-            func=lambda x, y: np.mean(xyfunc(x, y)),
-            n=order_of_derivative,
-            progress_callback=progress_callback,
-            **kwargs,
-        )
-
-        process_series_reliable_unreliable(xyname, xy_kwargs)
+    progress.finish()
 
     unit = topography.unit
     return dict(
@@ -888,23 +1268,16 @@ def scale_dependent_roughness_parameter_for_surface(
     series = []
     alerts = []
 
-    # Factor of two for curvature
-    # TODO: set_progress(i + 1, n) can report progress > 100% (e.g. on the
-    # final step where i + 1 can exceed n); clamp the reported value to n.
-    progress_callback = (
-        None
-        if progress_recorder is None
-        else lambda i, n: progress_recorder.set_progress(i + 1, n)
-    )
+    progress = ProgressAggregator(progress_recorder)
 
     try:
         with timer("compute"):
             distances, rms_values_sq = scale_dependent_statistical_property(
                 topographies,
-                lambda x, y=None: np.mean(x * x),
+                MeanSquareX(),
                 n=order_of_derivative,
                 unit=unit,
-                progress_callback=progress_callback,
+                progress_callback=progress.callback(),
                 **kwargs,
             )
         series = [
@@ -952,37 +1325,44 @@ class ScaleDependentSlope(WorkflowImplementation):
 
     class Parameters(WorkflowImplementation.Parameters):
         nb_points_per_decade: int = 10
+        multigrid: bool = False
+        multigrid_tolerance: float = DEFAULT_MULTIGRID_TOLERANCE
 
+    @cached_result
     def topography_implementation(self, analysis, progress_recorder=None, timer=None):
-        return scale_dependent_roughness_parameter(
-            analysis.subject,
-            progress_recorder,
-            1,
-            "Scale-dependent slope",
-            "Slope",
-            "Slope in x-direction",
-            "Slope in y-direction",
-            lambda x, y: x * x + y * y,
-            "Gradient",
-            "1",
-            nb_points_per_decade=self.kwargs.nb_points_per_decade,
-            folder=analysis.folder,
-            timer=timer,
-        )
+        with progress_relay(analysis, progress_recorder) as relay:
+            return scale_dependent_roughness_parameter(
+                analysis.subject,
+                relay,
+                1,
+                "Scale-dependent slope",
+                "Slope",
+                "Slope in x-direction",
+                "Slope in y-direction",
+                Gradient(),
+                "Gradient",
+                "1",
+                nb_points_per_decade=self.kwargs.nb_points_per_decade,
+                multigrid=self.kwargs.multigrid,
+                multigrid_tolerance=self.kwargs.multigrid_tolerance,
+                folder=analysis.folder,
+                timer=timer,
+            )
 
     def surface_implementation(self, analysis, progress_recorder=None, timer=None):
-        return scale_dependent_roughness_parameter_for_surface(
-            analysis.subject,
-            progress_recorder,
-            1,
-            "Scale-dependent slope",
-            "Slope",
-            "Slope in x-direction",
-            "1",
-            nb_points_per_decade=self.kwargs.nb_points_per_decade,
-            folder=analysis.folder,
-            timer=timer,
-        )
+        with progress_relay(analysis, progress_recorder) as relay:
+            return scale_dependent_roughness_parameter_for_surface(
+                analysis.subject,
+                relay,
+                1,
+                "Scale-dependent slope",
+                "Slope",
+                "Slope in x-direction",
+                "1",
+                nb_points_per_decade=self.kwargs.nb_points_per_decade,
+                folder=analysis.folder,
+                timer=timer,
+            )
 
 
 class ScaleDependentCurvature(WorkflowImplementation):
@@ -1003,37 +1383,44 @@ class ScaleDependentCurvature(WorkflowImplementation):
 
     class Parameters(WorkflowImplementation.Parameters):
         nb_points_per_decade: int = 10
+        multigrid: bool = False
+        multigrid_tolerance: float = DEFAULT_MULTIGRID_TOLERANCE
 
+    @cached_result
     def topography_implementation(self, analysis, progress_recorder=None, timer=None):
-        return scale_dependent_roughness_parameter(
-            analysis.subject,
-            progress_recorder,
-            2,
-            "Scale-dependent curvature",
-            "Curvature",
-            "Curvature in x-direction",
-            "Curvature in y-direction",
-            lambda x, y: (x + y) ** 2 / 4,
-            "1/2 Laplacian",
-            "{}⁻¹",
-            nb_points_per_decade=self.kwargs.nb_points_per_decade,
-            folder=analysis.folder,
-            timer=timer,
-        )
+        with progress_relay(analysis, progress_recorder) as relay:
+            return scale_dependent_roughness_parameter(
+                analysis.subject,
+                relay,
+                2,
+                "Scale-dependent curvature",
+                "Curvature",
+                "Curvature in x-direction",
+                "Curvature in y-direction",
+                HalfLaplacian(),
+                "1/2 Laplacian",
+                "{}⁻¹",
+                nb_points_per_decade=self.kwargs.nb_points_per_decade,
+                multigrid=self.kwargs.multigrid,
+                multigrid_tolerance=self.kwargs.multigrid_tolerance,
+                folder=analysis.folder,
+                timer=timer,
+            )
 
     def surface_implementation(self, analysis, progress_recorder=None, timer=None):
-        return scale_dependent_roughness_parameter_for_surface(
-            analysis.subject,
-            progress_recorder,
-            2,
-            "Scale-dependent curvature",
-            "Curvature",
-            "Curvature in x-direction",
-            "{}⁻¹",
-            nb_points_per_decade=self.kwargs.nb_points_per_decade,
-            folder=analysis.folder,
-            timer=timer,
-        )
+        with progress_relay(analysis, progress_recorder) as relay:
+            return scale_dependent_roughness_parameter_for_surface(
+                analysis.subject,
+                relay,
+                2,
+                "Scale-dependent curvature",
+                "Curvature",
+                "Curvature in x-direction",
+                "{}⁻¹",
+                nb_points_per_decade=self.kwargs.nb_points_per_decade,
+                folder=analysis.folder,
+                timer=timer,
+            )
 
 
 class RoughnessParameters(WorkflowImplementation):
@@ -1053,6 +1440,10 @@ class RoughnessParameters(WorkflowImplementation):
             Topography: "topography_implementation",
         }
 
+    class Parameters(WorkflowImplementation.Parameters):
+        precision: Literal["float32", None] = None
+
+    @cached_result
     def topography_implementation(self, analysis, progress_recorder=None, timer=None):
         """Calculate roughness parameters for given topography.
 
@@ -1079,7 +1470,8 @@ class RoughnessParameters(WorkflowImplementation):
 
         # Get low level topography from SurfaceTopography model
         with timer("read topography"):
-            topography = analysis.subject.topography()
+            # Evaluate the pipeline once; y-direction statistics use a view
+            topography = static_topography(read_topography(analysis.subject))
 
         # noinspection PyBroadException
         try:
@@ -1098,6 +1490,15 @@ class RoughnessParameters(WorkflowImplementation):
         FROM_1D = "profile (1D)"
         FROM_2D = "area (2D)"
 
+        field = reduced_precision(topography, self.kwargs.precision)
+        if is_2D:
+            if field is topography:
+                transposed = transposed_topography(topography)
+            else:
+                transposed = field.transpose()
+        # Only the (reduced-precision) field keeps the heights
+        topography = field
+
         #
         # RMS height
         #
@@ -1107,7 +1508,7 @@ class RoughnessParameters(WorkflowImplementation):
                 "from": FROM_1D,
                 "symbol": "Rq",
                 "direction": "x",
-                "value": topography.rms_height_from_profile(),
+                "value": field.rms_height_from_profile(),
                 "unit": unit,
             }
         ]
@@ -1119,7 +1520,7 @@ class RoughnessParameters(WorkflowImplementation):
                         "from": FROM_1D,
                         "symbol": "Rq",
                         "direction": "y",
-                        "value": topography.transpose().rms_height_from_profile(),
+                        "value": transposed.rms_height_from_profile(),
                         "unit": unit,
                     },
                     {
@@ -1127,7 +1528,7 @@ class RoughnessParameters(WorkflowImplementation):
                         "from": FROM_2D,
                         "symbol": "Sq",
                         "direction": None,
-                        "value": topography.rms_height_from_area(),
+                        "value": field.rms_height_from_area(),
                         "unit": unit,
                     },
                 ]
@@ -1143,7 +1544,7 @@ class RoughnessParameters(WorkflowImplementation):
                         "from": FROM_1D,
                         "symbol": "",
                         "direction": "y",
-                        "value": topography.transpose().rms_curvature_from_profile(),
+                        "value": transposed.rms_curvature_from_profile(),
                         "unit": inverse_unit,
                     },
                     {
@@ -1151,7 +1552,7 @@ class RoughnessParameters(WorkflowImplementation):
                         "from": FROM_2D,
                         "symbol": "",
                         "direction": None,
-                        "value": topography.rms_curvature_from_area(),
+                        "value": field.rms_curvature_from_area(),
                         "unit": inverse_unit,
                     },
                 ]
@@ -1164,7 +1565,7 @@ class RoughnessParameters(WorkflowImplementation):
                 "from": FROM_1D,
                 "symbol": "",
                 "direction": "x",
-                "value": topography.rms_curvature_from_profile(),
+                "value": field.rms_curvature_from_profile(),
                 "unit": inverse_unit,
             }
         )
@@ -1179,7 +1580,7 @@ class RoughnessParameters(WorkflowImplementation):
                     "from": FROM_1D,
                     "symbol": "R&Delta;q",
                     "direction": "x",
-                    "value": topography.rms_slope_from_profile(),  # x direction
+                    "value": field.rms_slope_from_profile(),  # x direction
                     "unit": 1,
                 }
             ]
@@ -1192,7 +1593,7 @@ class RoughnessParameters(WorkflowImplementation):
                         "from": FROM_1D,
                         "symbol": "R&Delta;q",  # HTML
                         "direction": "y",
-                        "value": topography.transpose().rms_slope_from_profile(),  # y direction
+                        "value": transposed.rms_slope_from_profile(),  # y direction
                         "unit": 1,
                     },
                     {
@@ -1200,7 +1601,7 @@ class RoughnessParameters(WorkflowImplementation):
                         "from": FROM_2D,
                         "symbol": "",
                         "direction": None,
-                        "value": topography.rms_gradient(),
+                        "value": field.rms_gradient(),
                         "unit": 1,
                     },
                 ]
@@ -1216,12 +1617,13 @@ class RoughnessParameters(WorkflowImplementation):
         # one. Nothing is added when the slopes are clean.
         #
         if is_2D:
-            dh_dx, dh_dy = topography.derivative(n=1)
-            slopes_by_direction = [("x", dh_dx), ("y", dh_dy)]
+            directions = ["x", "y"]
+            outliers = outlier_statistics(list(field.derivative(n=1)))
         else:
-            slopes_by_direction = [("x", topography.derivative(n=1))]
-        for direction, slopes in slopes_by_direction:
-            stats = _slope_outlier_stats(np.ma.compressed(slopes))
+            directions = ["x"]
+            outliers = outlier_statistics([field.derivative(n=1)])
+        for row, direction in enumerate(directions):
+            stats = outliers.report(row)
             if stats is not None:
                 result.append(
                     {
@@ -1276,10 +1678,18 @@ def _workflow(
     yunit,
     conv_2d_fac=1.0,
     conv_2d_exponent=0,
+    profile_func=None,
+    area_func=None,
     folder=None,
     timer=None,
     **kwargs,
 ):
+    """Compute a spectral statistic from profiles and, for maps, the area.
+
+    `profile_func(topography, reliable=..., **kwargs)` and `area_func`, if
+    given, replace the `funcname_profile` and `funcname_area` methods of the
+    topography.
+    """
     if timer is None:
         timer = Timer()
 
@@ -1287,12 +1697,20 @@ def _workflow(
 
     # Switch to low level topography from SurfaceTopography model
     with timer("read topography"):
-        topography = topography.topography()
+        topography = static_topography(topography.topography())
 
     alerts = []  # list of dicts with keys 'alert_class', 'message'
     series = []  # list of dicts with series data, keys: 'name', 'x', 'y', 'visible'
 
-    func = getattr(topography, funcname_profile)
+    def bind(t, funcname, func):
+        if func is None:
+            return getattr(t, funcname)
+        return functools.partial(func, t)
+
+    def profile(t):
+        return bind(t, funcname_profile, profile_func)
+
+    func = profile(topography)
 
     try:
         r, A = func(**kwargs)
@@ -1323,8 +1741,8 @@ def _workflow(
 
     if topography.dim == 2:
 
-        transpose_func = getattr(topography.transpose(), funcname_profile)
-        areal_func = getattr(topography, funcname_area)
+        transpose_func = profile(transposed_topography(topography))
+        areal_func = bind(topography, funcname_area, area_func)
 
         try:
             r_T, A_T = transpose_func(**kwargs)
@@ -1451,21 +1869,25 @@ def _workflow_for_surface(
     series = []
     alerts = []
 
-    # TODO: set_progress(i + 1, n) can report progress > 100% (e.g. on the
-    # final step where i + 1 can exceed n); clamp the reported value to n.
-    progress_callback = (
-        None
-        if progress_recorder is None
-        else lambda i, n: progress_recorder.set_progress(i + 1, n)
-    )
+    progress = ProgressAggregator(progress_recorder)
 
     try:
         with timer("compute"):
+            if surface_workers() > 1:
+                # Compute the property of the topographies in worker
+                # threads; `log_average` then only averages the results
+                topographies = precompute_for_average(
+                    topographies,
+                    funcname_profile,
+                    unit,
+                    progress_callback=progress.phase(0.9),
+                    **kwargs,
+                )
             r, A = log_average(
                 topographies,
                 funcname_profile,
                 unit,
-                progress_callback=progress_callback,
+                progress_callback=progress.callback(),
                 **kwargs,
             )
 
@@ -1515,3 +1937,14 @@ register_implementation(VariableBandwidth)
 register_implementation(ScaleDependentSlope)
 register_implementation(ScaleDependentCurvature)
 register_implementation(RoughnessParameters)
+
+
+def statistics_workflows(subject_type=Topography):
+    """Return the names of all workflows of this plugin with an
+    implementation for subjects of the given type."""
+    return [
+        name
+        for name in get_workflow_names()
+        if name.startswith(f"{APP_NAME}.")
+        and subject_type in get_implementation(name=name).Meta.implementations
+    ]